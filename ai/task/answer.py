@@ -1,49 +1,75 @@
 from utils import decode_json
-import openai
+import logging
 from time import sleep
+from concurrent.futures import ThreadPoolExecutor
 from answer_format import AnswerFormat
-from typing import Optional, Union, Dict, Any, Type
-from anthropic import APITimeoutError, AuthenticationError, RateLimitError, APIError
+from errors import (
+  Attempt, AITaskError, RateLimited, Overloaded, Timeout, InvalidOutput,
+  QuotaExhausted, AuthenticationFailed, APIFailure, status_code_of, error_code_of
+)
+from typing import Optional, Union, Dict, Any, Type, List, Callable
 import json
-from google.genai import types
-from google import genai
+import re
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+
+# Nombre maximum de requêtes de continuation pour une réponse JSON tronquée par max_tokens
+MAX_CONTINUATIONS = 3
+CONTINUATION_PROMPT = "Ta réponse a été tronquée. Continue exactement là où tu t'es arrêté, sans répéter ce qui précède ni ajouter de commentaire."
+# Chevauchement minimal pour considérer qu'une continuation répète la fin de la réponse partielle
+MIN_CONTINUATION_OVERLAP = 20
+
+# Codes d'erreur structurés signalant un crédit ou un quota épuisé
+QUOTA_ERROR_CODES = {"insufficient_quota", "billing_error", "failed_precondition"}
+RATE_LIMIT_ERROR_CODES = {"rate_limit_error", "rate_limit_exceeded", "resource_exhausted"}
+OVERLOADED_ERROR_CODES = {"overloaded_error", "api_error", "unavailable", "internal"}
+# Modules des SDK et clients HTTP dont les exceptions sont des erreurs d'appel API
+API_ERROR_MODULES = {"openai", "anthropic", "google", "httpx", "httpcore", "requests", "urllib3", "aiohttp"}
 
 def get_ai_task_answer(
-  _client, task, model="gpt-4o-mini", 
+  _client, task, model="gpt-4o-mini",
   system_prompt: str = "Tu es un assistant IA",
-  answer_format: Optional[Type[AnswerFormat]] = None, 
+  answer_format: Optional[Type[AnswerFormat]] = None,
   provider: str = 'openai',
   max_tokens: Optional[int] = None
 ) -> Union[Dict[str, Any], str, AnswerFormat]:
   """
   Obtient une réponse d'un modèle d'IA selon le format spécifié.
-  
+
   Args:
-      _client: Client API (OpenAI, Perplexity, Anthropic ou Google GenAI)
+      _client: Client API (OpenAI, Perplexity, Anthropic, Google GenAI ou serveur local
+        compatible OpenAI, éventuellement enveloppé dans local.LocalBatchingClient)
       task: La tâche ou question à envoyer au modèle
       model: Le nom du modèle à utiliser
       json_output: Si True, demande une réponse au format JSON
       system_prompt: Le prompt système à utiliser
       answer_format: Classe Pydantic définissant le format de réponse attendu
-      provider: Le fournisseur de l'API ('openai', 'perplexity', 'anthropic' ou 'google')
+      provider: Le fournisseur de l'API ('openai', 'perplexity', 'anthropic', 'google' ou 'local')
       max_tokens: Nombre maximum de tokens pour la réponse
-  
+
   Returns:
       La réponse du modèle selon le format spécifié
+
+  Raises:
+      AITaskError: Une sous-classe typée (RateLimited, Overloaded, QuotaExhausted,
+        InvalidOutput, Timeout, AuthenticationFailed, APIFailure) portant le texte
+        brut et l'historique des tentatives
   """
   # Préparer le prompt avec le format demandé si nécessaire
   format_prompt = ""
   if answer_format and not isinstance(answer_format, str):
     format_prompt = answer_format.generate_prompt()
     task = f"{task}\n\n{format_prompt}"
-  
+
   if answer_format:
     json_output = True
   else:
     json_output = False
-  
+
   # Configuration et appel API en fonction du provider
-  if provider in ['openai', 'perplexity']:
+  if provider in ['openai', 'perplexity', 'local']:
     return _handle_openai_request(_client, task, model, json_output, system_prompt, answer_format, provider, max_tokens)
   elif provider == 'anthropic':
     return _handle_anthropic_request(_client, task, model, json_output, system_prompt, answer_format, max_tokens)
@@ -52,6 +78,141 @@ def get_ai_task_answer(
   else:
     raise ValueError(f"Provider non pris en charge: {provider}")
 
+def get_ai_task_answers(
+  _client, tasks: List[str], max_workers: int = 4,
+  return_exceptions: bool = False, **kwargs
+) -> List[Union[Dict[str, Any], str, AnswerFormat, AITaskError]]:
+  """
+  Obtient les réponses à une liste de tâches en parallèle.
+
+  Args:
+      _client: Client API partagé entre les tâches
+      tasks: Liste des tâches à envoyer au modèle
+      max_workers: Nombre de requêtes simultanées
+      return_exceptions: Si True, les erreurs AITaskError sont renvoyées à la place
+        du résultat correspondant au lieu d'être levées, ce qui permet de ne
+        relancer que les éléments en échec (voir AITaskError.retryable)
+      **kwargs: Paramètres transmis à get_ai_task_answer
+
+  Returns:
+      Les réponses, dans l'ordre des tâches
+  """
+  def run(task):
+    try:
+      return get_ai_task_answer(_client, task, **kwargs)
+    except AITaskError as e:
+      if return_exceptions:
+        return e
+      raise
+
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    return list(executor.map(run, tasks))
+
+def _is_timeout(e: Exception) -> bool:
+  return isinstance(e, TimeoutError) or "timeout" in type(e).__name__.lower()
+
+def _retry_after_header(e: Exception) -> Optional[float]:
+  headers = getattr(getattr(e, "response", None), "headers", None)
+  if not headers:
+    return None
+  try:
+    return float(headers.get("retry-after"))
+  except (TypeError, ValueError):
+    return None
+
+def _is_api_error(e: Exception) -> bool:
+  """Exception levée par un SDK, un client HTTP ou le réseau (et non par un bug du code appelant)"""
+  if isinstance(e, OSError) or status_code_of(e) is not None:
+    return True
+  return any(cls.__module__.split(".")[0] in API_ERROR_MODULES for cls in type(e).__mro__)
+
+def _classify_error(e: Exception, provider: str) -> Optional[AITaskError]:
+  """
+  Convertit une exception de SDK en erreur typée à partir du code HTTP et du code d'erreur
+
+  Retourne None pour une exception étrangère à l'API (TypeError, KeyError...),
+  qui doit remonter telle quelle sans nouvelle tentative
+  """
+  if isinstance(e, AITaskError):
+    return e
+  if not _is_api_error(e):
+    return None
+
+  status_code = status_code_of(e)
+  error_code = error_code_of(e)
+  kwargs = {
+    "provider": provider,
+    "status_code": status_code,
+    "retry_after": _retry_after_header(e)
+  }
+  message = f"{type(e).__name__}: {e}"
+
+  if _is_timeout(e):
+    return Timeout(message, **kwargs)
+  if status_code in (401, 403):
+    return AuthenticationFailed(message, **kwargs)
+  if error_code in QUOTA_ERROR_CODES or status_code == 402:
+    return QuotaExhausted(message, **kwargs)
+  # Anthropic signale le crédit insuffisant par une simple erreur 400
+  if provider == 'anthropic' and status_code == 400 and "credit balance" in str(e).lower():
+    return QuotaExhausted(message, **kwargs)
+  if status_code == 429 or error_code in RATE_LIMIT_ERROR_CODES:
+    return RateLimited(message, **kwargs)
+  if (status_code is not None and status_code >= 500) or error_code in OVERLOADED_ERROR_CODES:
+    return Overloaded(message, **kwargs)
+  if status_code is None:
+    # Erreur de connexion
+    kwargs["retry_after"] = kwargs["retry_after"] or 1
+  return APIFailure(message, **kwargs)
+
+def _with_retries(provider: str, attempt: Callable[[], Any]):
+  """Exécute une tentative d'appel jusqu'à MAX_ATTEMPTS fois selon le type d'erreur"""
+  attempts: List[Attempt] = []
+  for number in range(1, MAX_ATTEMPTS + 1):
+    try:
+      return attempt()
+    except Exception as e:
+      error = _classify_error(e, provider)
+      if error is None:
+        raise
+      attempts.append(Attempt(
+        number=number,
+        error_type=type(error).__name__,
+        message=str(error),
+        status_code=error.status_code,
+        raw_text=error.raw_text
+      ))
+      error.attempts = list(attempts)
+      if not error.retryable or number == MAX_ATTEMPTS:
+        if error is e:
+          raise
+        raise error from e
+      logger.warning("Tentative %d/%d échouée (%s), nouvelle tentative dans %ss", number, MAX_ATTEMPTS, error, error.retry_after)
+      if error.retry_after:
+        sleep(error.retry_after)
+
+def _stitch(partial: str, continuation: str) -> str:
+  """Raccorde une continuation à la réponse partielle en retirant une éventuelle répétition"""
+  continuation = re.sub(r'^\s*```(?:json)?\s*', '', continuation)
+  for size in range(min(len(partial), len(continuation), 500), MIN_CONTINUATION_OVERLAP - 1, -1):
+    if partial.endswith(continuation[:size]):
+      return partial + continuation[size:]
+  return partial + continuation
+
+def _parse_content(content, json_output, answer_format, provider):
+  """Décode la réponse du modèle, lève InvalidOutput si elle ne respecte pas le format"""
+  if not json_output:
+    return content
+
+  try:
+    json_data = decode_json(content, answer_format)
+    if answer_format and not isinstance(answer_format, str):
+      return answer_format.from_json(json_data)
+    else:
+      return json_data
+  except Exception as e:
+    raise InvalidOutput(f"Réponse ne respecte pas le format JSON attendu: {e}", provider=provider, raw_text=content) from e
+
 def _handle_openai_request(
   client, task, model, json_output, system_prompt, answer_format, provider, max_tokens
 ):
@@ -59,189 +220,138 @@ def _handle_openai_request(
     {"role": "system", "content": system_prompt},
     {"role": "user", "content": task}
   ]
-  
-  try_left = 3
-  while try_left > 0:
-    try:
-      params = {
-        "model": model,
-        "messages": messages
-      }
-      
-      if max_tokens:
-        params["max_tokens"] = max_tokens
-      
-      if json_output and provider == 'openai':
-        params["response_format"] = {"type": "json_object"}
-        
-      response = client.chat.completions.create(**params)
-      
-      if hasattr(response, 'choices') and response.choices:
-        content = response.choices[0].message.content
-        
-        if not json_output:
-          return content
-          
-        try:
-          json_data = decode_json(content)
-          if answer_format and not isinstance(answer_format, str):
-            return answer_format.from_json(json_data)
-          else:
-            return json_data
-        except Exception as e:
-          print(f"Réponse ne respecte pas le format JSON attendu: {e}")
-          try_left -= 1
-          continue
-      else:
-        raise Exception("Réponse invalide")
-    
-    except openai.AuthenticationError as e:
-      print(f"API request was not authorized: {e}")
-      error_str = str(e).lower()
-      if "insufficient_quota" in error_str or "exceeded your current quota" in error_str:
-        print(f"Erreur de crédit insuffisant: {e}")
-      return None
-      
-    except openai.RateLimitError as e:
-      print(f"API request exceeded rate limit: {e}")
-      sleep(60)
-      
-    except openai.APIError as e:
-      print(f"API returned an API Error: {e}")
-      sleep(10)
-      
-    except Exception as e:
-      print(f"An exception occurred: {type(e).__name__}: {e}")
-      sleep(1)
 
-    try_left -= 1
-    
-  raise Exception("Erreur lors de l'utilisation de l'API après 3 tentatives")
+  params = {
+    "model": model,
+    "messages": messages
+  }
+
+  if max_tokens:
+    params["max_tokens"] = max_tokens
+
+  if json_output and provider == 'openai':
+    params["response_format"] = {"type": "json_object"}
+
+  def attempt():
+    response = client.chat.completions.create(**params)
+
+    if hasattr(response, 'choices') and response.choices:
+      content = response.choices[0].message.content or ""
+
+      # Réponse JSON tronquée : on demande la suite plutôt que de tout régénérer
+      continuation_params = {k: v for k, v in params.items() if k != "response_format"}
+      continuations = 0
+      while json_output and response.choices[0].finish_reason == "length" and continuations < MAX_CONTINUATIONS:
+        continuation_params["messages"] = messages + [
+          {"role": "assistant", "content": content},
+          {"role": "user", "content": CONTINUATION_PROMPT}
+        ]
+        response = client.chat.completions.create(**continuation_params)
+        if not getattr(response, 'choices', None):
+          break
+        content = _stitch(content, response.choices[0].message.content or "")
+        continuations += 1
+
+      return _parse_content(content, json_output, answer_format, provider)
+    raise InvalidOutput("Réponse invalide", provider=provider)
+
+  return _with_retries(provider, attempt)
 
 def _handle_anthropic_request(
   client, task, model, json_output, system_prompt, answer_format, max_tokens
 ):
   messages = [{"role": "user", "content": task}]
-  
-  try_left = 3
-  while try_left > 0:
-    try:
-      params = {
-        "model": model,
-        "system": system_prompt,
-        "messages": messages,
-        "stream": False
-      }
-      
-      if max_tokens:
-        params["max_tokens"] = max_tokens
-        
-      response = client.messages.create(**params)
-      
-      if response and response.content:
-        content = response.content[0].text
-        
-        if not json_output:
-          return content
-          
-        try:
-          json_data = decode_json(content)
-          if answer_format and not isinstance(answer_format, str):
-            return answer_format.from_json(json_data)
-          else:
-            return json_data
-        except Exception as e:
-          print(f"Réponse ne respecte pas le format JSON attendu: {e}")
-          try_left -= 1
-          continue
-      else:
-        raise Exception("Réponse invalide")
-        
-    except APITimeoutError as e:
-      print(f"Timeout lors de la requête Anthropic: {e}")
-      sleep(30)
-    except AuthenticationError as e:
-      print(f"Erreur d'authentification Anthropic: {e}")
-      return None
-    except RateLimitError as e:
-      print(f"Rate limit Anthropic atteint: {e}")
-      sleep(60)
-    except APIError as e:
-      error_str = str(e).lower()
-      if "500" in error_str or "529" in error_str or "overloaded_error" in error_str:
-        print(f"Erreur serveur Anthropic détectée ({error_str}), nouvelle tentative...")
-        sleep(30)
-      elif "credit balance is too low" in error_str or "billing" in error_str:
-        print(f"Erreur de crédit Anthropic insuffisant: {e}")
-        return None
-      else:
-        print(f"Erreur API Anthropic: {e}")
-        sleep(10)
-    except Exception as e:
-      print(f"Erreur inattendue lors de l'appel à Anthropic: {e}")
-      sleep(1)
-    
-    try_left -= 1
-  
-  raise Exception("Erreur lors de l'utilisation de l'API Anthropic après 3 tentatives")
+
+  params = {
+    "model": model,
+    "system": system_prompt,
+    "messages": messages,
+    "stream": False
+  }
+
+  if max_tokens:
+    params["max_tokens"] = max_tokens
+
+  def attempt():
+    response = client.messages.create(**params)
+
+    if response and response.content:
+      content = response.content[0].text
+
+      # Réponse JSON tronquée : la partie reçue est renvoyée en pré-remplissage de l'assistant
+      continuations = 0
+      while json_output and response.stop_reason == "max_tokens" and continuations < MAX_CONTINUATIONS:
+        prefill = content.rstrip()
+        response = client.messages.create(**{
+          **params,
+          "messages": messages + [{"role": "assistant", "content": prefill}]
+        })
+        if not response or not response.content:
+          break
+        content = prefill + response.content[0].text
+        continuations += 1
+
+      return _parse_content(content, json_output, answer_format, 'anthropic')
+    raise InvalidOutput("Réponse invalide", provider='anthropic')
+
+  return _with_retries('anthropic', attempt)
 
 def _handle_google_request(
   client, task, model, json_output, system_prompt, answer_format, max_tokens
 ):
+  # Import différé : le SDK Google n'est chargé que s'il est utilisé
+  from google.genai import types
+
   params = {}
-  
+
   if json_output:
     params['response_mime_type'] = 'application/json'
-  
+
   if system_prompt:
     params['system_instruction'] = system_prompt
-    
+
   if max_tokens:
     params['max_output_tokens'] = max_tokens
-    
+
   params['temperature'] = 0.7
   params['top_p'] = 0.7
-  
-  try_left = 3
-  while try_left > 0:
-    try:
-      response = client.models.generate_content(
-        model=model,
-        contents=task,
-        config=types.GenerateContentConfig(**params),
-      )
-      
-      if response and response.text:
-        content = response.text
-        
-        if not json_output:
-          return content
-          
-        try:
-          json_data = decode_json(content)
-          if answer_format and not isinstance(answer_format, str):
-            return answer_format.from_json(json_data)
-          else:
-            return json_data
-        except Exception as e:
-          print(f"Réponse ne respecte pas le format JSON attendu: {e}")
-          try_left -= 1
-          continue
-      else:
-        raise Exception("Réponse invalide")
-        
-    except Exception as e:
-      error_str = str(e).lower()
-      if "429" in error_str or "resource_exhausted" in error_str:
-        print(f"Rate limit atteint (429), nouvelle tentative dans 60 secondes...")
-        sleep(60)
-      elif "400" in error_str and "failed_precondition" in error_str:
-        print(f"Erreur de crédit Gemini insuffisant: {e}")
-        return None
-      else:
-        print(f"Une erreur est survenue : {type(e).__name__}: {e}")
-        sleep(1)
-        
-      try_left -= 1
-  
-  raise Exception("Erreur lors de l'utilisation de l'API Google après 3 tentatives")
+
+  def attempt():
+    response = client.models.generate_content(
+      model=model,
+      contents=task,
+      config=types.GenerateContentConfig(**params),
+    )
+
+    if response and response.text:
+      content = response.text
+
+      # Réponse JSON tronquée : on demande la suite plutôt que de tout régénérer
+      continuation_params = {k: v for k, v in params.items() if k != 'response_mime_type'}
+      continuations = 0
+      while json_output and _is_google_truncated(response) and continuations < MAX_CONTINUATIONS:
+        response = client.models.generate_content(
+          model=model,
+          contents=[
+            types.Content(role='user', parts=[types.Part(text=task)]),
+            types.Content(role='model', parts=[types.Part(text=content)]),
+            types.Content(role='user', parts=[types.Part(text=CONTINUATION_PROMPT)]),
+          ],
+          config=types.GenerateContentConfig(**continuation_params),
+        )
+        if not response or not response.text:
+          break
+        content = _stitch(content, response.text)
+        continuations += 1
+
+      return _parse_content(content, json_output, answer_format, 'google')
+    raise InvalidOutput("Réponse invalide", provider='google')
+
+  return _with_retries('google', attempt)
+
+def _is_google_truncated(response) -> bool:
+  candidates = getattr(response, 'candidates', None)
+  if not candidates:
+    return False
+  finish_reason = candidates[0].finish_reason
+  return getattr(finish_reason, 'name', str(finish_reason)) == 'MAX_TOKENS'
@@ -1,7 +1,10 @@
 from pydantic import BaseModel
-from typing import Dict, Any, Union, get_type_hints, get_origin, get_args
+from typing import Dict, Any, Union, Optional, get_type_hints, get_origin, get_args
+from difflib import get_close_matches
+from decimal import Decimal
 import inspect
 import json
+import re
 
 class AnswerFormat(BaseModel):
   """Classe de base pour définir le format de réponse attendu d'un modèle d'IA"""
@@ -11,6 +14,130 @@ class AnswerFormat(BaseModel):
     """Crée une instance à partir d'un dictionnaire JSON"""
     return cls(**json_data)
   
+  @classmethod
+  def coerce_json(cls, json_data: Any) -> Any:
+    """
+    Répare un JSON décodé à partir des champs et des types déclarés :
+    clés approchantes ramenées aux noms déclarés, nombres en chaîne convertis
+    pour les champs int/float, valeurs isolées placées dans une liste pour les
+    champs List[...], et objet racine reconstitué si le modèle a répondu sans lui.
+    Lève ValueError pour une valeur qui n'est pas un nombre (ou pas un entier
+    pour un champ int)
+    """
+    type_hints = get_type_hints(cls)
+    model_fields = cls.model_fields
+
+    if not isinstance(json_data, dict):
+      # Réponse sans objet racine : on ne peut la rattacher qu'à un champ unique
+      candidates = list(model_fields)
+      if isinstance(json_data, list):
+        candidates = [name for name in model_fields if get_origin(AnswerFormat._unwrap_optional(type_hints.get(name))) is list]
+      if len(candidates) != 1:
+        return json_data
+      json_data = {candidates[0]: json_data}
+
+    result = {}
+    for key, value in json_data.items():
+      field_name = key if key in model_fields else AnswerFormat._match_field_name(key, model_fields)
+      if field_name is None or (field_name != key and field_name in json_data):
+        # Clé inconnue ou doublon d'une clé exacte : laissée telle quelle
+        result.setdefault(key, value)
+        continue
+      try:
+        result[field_name] = AnswerFormat._coerce_value(type_hints.get(field_name), value)
+      except ValueError as e:
+        raise ValueError(f"Champ '{field_name}' : {e}") from e
+
+    return result
+
+  @staticmethod
+  def _normalize_field_name(name: str) -> str:
+    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+
+  @staticmethod
+  def _match_field_name(key: str, model_fields: Dict[str, Any]) -> Optional[str]:
+    """Retrouve le champ déclaré le plus proche d'une clé inconnue (casse, séparateurs, fautes)"""
+    normalized = {AnswerFormat._normalize_field_name(name): name for name in model_fields}
+    normalized_key = AnswerFormat._normalize_field_name(key)
+    if normalized_key in normalized:
+      return normalized[normalized_key]
+    matches = get_close_matches(normalized_key, list(normalized), n=1, cutoff=0.8)
+    return normalized[matches[0]] if matches else None
+
+  @staticmethod
+  def _unwrap_optional(field_type: Any) -> Any:
+    if get_origin(field_type) is Union:
+      args = [arg for arg in get_args(field_type) if arg is not type(None)]
+      if len(args) == 1:
+        return args[0]
+    return field_type
+
+  @staticmethod
+  def _coerce_value(field_type: Any, value: Any) -> Any:
+    """Convertit une valeur vers le type déclaré lorsque c'est sans ambiguïté"""
+    if value is None or field_type is None:
+      return value
+
+    field_type = AnswerFormat._unwrap_optional(field_type)
+    origin = get_origin(field_type)
+    args = get_args(field_type)
+
+    # Gérer les listes (List[X])
+    if origin is list:
+      inner_type = args[0] if args else Any
+      if not isinstance(value, list):
+        value = [value]
+      return [AnswerFormat._coerce_value(inner_type, item) for item in value]
+
+    # Gérer les dictionnaires (Dict[K, V])
+    if origin is dict:
+      if isinstance(value, dict) and len(args) == 2:
+        return {k: AnswerFormat._coerce_value(args[1], v) for k, v in value.items()}
+      return value
+
+    # Gérer les sous-classes de AnswerFormat
+    if inspect.isclass(field_type) and issubclass(field_type, AnswerFormat):
+      return field_type.coerce_json(value) if isinstance(value, dict) else value
+
+    # Gérer les types de base
+    if field_type in (int, float) and not isinstance(value, bool):
+      return AnswerFormat._coerce_number(field_type, value)
+    if field_type is str and isinstance(value, (int, float)) and not isinstance(value, bool):
+      return str(value)
+    if field_type is bool and isinstance(value, str):
+      lowered = value.strip().lower()
+      if lowered in ("true", "oui", "yes", "1"):
+        return True
+      if lowered in ("false", "non", "no", "0"):
+        return False
+
+    return value
+
+  @staticmethod
+  def _coerce_number(field_type: type, value: Any) -> Any:
+    """
+    Convertit un nombre ou une chaîne commençant par un nombre ("8,5", "3 jours")
+    pour un champ int/float ; un champ int n'accepte que les valeurs entières.
+    Lève ValueError pour toute autre valeur
+    """
+    if isinstance(value, str):
+      match = re.match(r'\s*([-+]?\d+(?:[.,]\d+)?)', value)
+      if not match:
+        raise ValueError(f"{value!r} n'est pas un nombre")
+      number = Decimal(match.group(1).replace(',', '.'))
+    elif isinstance(value, (int, float)):
+      number = Decimal(value)
+      if not number.is_finite():
+        raise ValueError(f"{value!r} n'est pas un nombre fini")
+    else:
+      raise ValueError(f"{value!r} n'est pas un nombre")
+
+    if field_type is float:
+      return float(number)
+    if number != number.to_integral_value():
+      raise ValueError(f"{value!r} n'est pas un entier")
+    return int(number)
+
   def to_dict(self) -> Dict[str, Any]:
     """Convertit l'instance en dictionnaire"""
     return self.model_dump()
@@ -89,11 +216,12 @@ class AnswerFormat(BaseModel):
     field_descriptions = []
     AnswerFormat._add_field_descriptions(cls, "", field_descriptions)
     
+    descriptions = "".join(f"{desc}\n" for desc in field_descriptions)
     prompt = f"""Réponds en suivant strictement ce format JSON:
 {example_json}
 
 Description des champs:
-{"".join(f"{desc}\n" for desc in field_descriptions)}
+{descriptions}
 """
     return prompt
 
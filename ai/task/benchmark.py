@@ -0,0 +1,69 @@
+"""
+Benchmarks du module answer (ne nécessite pas de clés API)
+
+Usage:
+    python benchmark.py
+"""
+import os
+import subprocess
+import sys
+
+# Modules lourds qui ne doivent être chargés qu'à la première utilisation
+LAZY_MODULES = ["openai", "anthropic", "google.genai", "json_repair", "fix_busted_json"]
+
+# Budget de temps d'import de answer (en millisecondes) au-delà duquel le benchmark échoue
+IMPORT_TIME_BUDGET_MS = 500
+
+def _run_in_fresh_interpreter(code: str) -> str:
+  """Exécute du code dans un interpréteur neuf (aucun module en cache) et renvoie sa sortie"""
+  return subprocess.run(
+    [sys.executable, "-c", code],
+    cwd=os.path.dirname(os.path.abspath(__file__)),
+    capture_output=True, text=True, check=True
+  ).stdout
+
+def benchmark_import_time(runs: int = 5) -> float:
+  """Mesure le temps d'import de answer à froid et vérifie qu'aucun SDK n'est chargé"""
+  code = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import answer\n"
+    "elapsed = (time.perf_counter() - start) * 1000\n"
+    f"loaded = [m for m in {LAZY_MODULES!r} if m in sys.modules]\n"
+    "print(elapsed, ','.join(loaded))\n"
+  )
+
+  timings = []
+  for _ in range(runs):
+    elapsed, _, loaded = _run_in_fresh_interpreter(code).strip().partition(" ")
+    if loaded:
+      raise AssertionError(f"Modules chargés à l'import de answer : {loaded}")
+    timings.append(float(elapsed))
+
+  best = min(timings)
+  print(f"Import de answer : {best:.1f} ms (meilleur de {runs}), budget {IMPORT_TIME_BUDGET_MS} ms")
+  if best > IMPORT_TIME_BUDGET_MS:
+    raise AssertionError(f"Temps d'import de answer trop élevé : {best:.1f} ms")
+  return best
+
+def benchmark_sdk_import_time():
+  """Affiche le coût d'import de chaque SDK, économisé lorsqu'il n'est pas utilisé"""
+  for module in LAZY_MODULES:
+    code = (
+      "import time\n"
+      "start = time.perf_counter()\n"
+      f"import {module}\n"
+      "print((time.perf_counter() - start) * 1000)\n"
+    )
+    try:
+      elapsed = float(_run_in_fresh_interpreter(code))
+      print(f"  {module:<16} {elapsed:7.1f} ms")
+    except subprocess.CalledProcessError:
+      print(f"  {module:<16} non installé")
+
+if __name__ == "__main__":
+  print("=== Temps d'import à froid ===")
+  benchmark_import_time()
+
+  print("\n=== Temps d'import des SDK (chargés à la demande) ===")
+  benchmark_sdk_import_time()
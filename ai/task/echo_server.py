@@ -0,0 +1,58 @@
+"""
+Serveur d'écho compatible OpenAI pour tester le provider 'local' sans modèle
+
+Chaque réponse renvoie le dernier message utilisateur (chat/completions) ou le
+prompt reçu (completions). Les tailles des lots reçus sont enregistrées dans
+server.batch_sizes.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class EchoHandler(BaseHTTPRequestHandler):
+  def do_POST(self):
+    body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+    common = {"id": "echo", "created": int(time.time()), "model": body.get("model", "echo")}
+
+    if self.path.endswith("/chat/completions"):
+      payload = {**common, "object": "chat.completion", "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": body["messages"][-1]["content"]},
+        "finish_reason": "stop"
+      }]}
+    elif self.path.endswith("/completions"):
+      prompts = body["prompt"] if isinstance(body["prompt"], list) else [body["prompt"]]
+      self.server.batch_sizes.append(len(prompts))
+      payload = {**common, "object": "text_completion", "choices": [
+        {"index": i, "text": prompt, "logprobs": None, "finish_reason": "stop"}
+        for i, prompt in enumerate(prompts)
+      ]}
+    else:
+      self.send_error(404)
+      return
+
+    data = json.dumps(payload).encode()
+    self.send_response(200)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def log_message(self, format, *args):
+    pass
+
+def start_echo_server(host: str = "127.0.0.1", port: int = 0):
+  """Démarre le serveur dans un thread et renvoie (server, base_url)"""
+  server = ThreadingHTTPServer((host, port), EchoHandler)
+  server.batch_sizes = []
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server, f"http://{host}:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+  server, base_url = start_echo_server(port=8080)
+  print(f"Serveur d'écho démarré sur {base_url}")
+  try:
+    threading.Event().wait()
+  except KeyboardInterrupt:
+    server.shutdown()
@@ -0,0 +1,106 @@
+from dataclasses import dataclass, field
+from typing import Optional, List, Any
+
+@dataclass
+class Attempt:
+  """Trace d'une tentative d'appel API ayant échoué"""
+  number: int
+  error_type: str
+  message: str
+  status_code: Optional[int] = None
+  raw_text: Optional[str] = None
+
+
+class AITaskError(Exception):
+  """
+  Classe de base des erreurs levées par get_ai_task_answer.
+
+  Attributes:
+      provider: Le fournisseur de l'API à l'origine de l'erreur
+      status_code: Code HTTP renvoyé par l'API (si disponible)
+      raw_text: Texte brut renvoyé par le modèle ou par l'API
+      attempts: Historique des tentatives ayant échoué
+      retryable: Si True, une nouvelle tentative a des chances d'aboutir
+      retry_after: Délai conseillé (en secondes) avant une nouvelle tentative
+  """
+  retryable = True
+  retry_after = 1
+
+  def __init__(
+    self, message: str = "", provider: Optional[str] = None,
+    status_code: Optional[int] = None, raw_text: Optional[str] = None,
+    attempts: Optional[List[Attempt]] = None, retry_after: Optional[float] = None
+  ):
+    super().__init__(message)
+    self.provider = provider
+    self.status_code = status_code
+    self.raw_text = raw_text
+    self.attempts: List[Attempt] = attempts or []
+    if retry_after is not None:
+      self.retry_after = retry_after
+
+
+class RateLimited(AITaskError):
+  """Limite de requêtes atteinte (HTTP 429)"""
+  retry_after = 60
+
+
+class Overloaded(AITaskError):
+  """Serveur du fournisseur surchargé ou en erreur (HTTP 5xx, 529)"""
+  retry_after = 30
+
+
+class Timeout(AITaskError):
+  """La requête n'a pas abouti dans le délai imparti"""
+  retry_after = 30
+
+
+class InvalidOutput(AITaskError):
+  """La réponse du modèle ne respecte pas le format attendu"""
+  retry_after = 0
+
+
+class QuotaExhausted(AITaskError):
+  """Crédit ou quota épuisé : inutile de réessayer"""
+  retryable = False
+
+
+class AuthenticationFailed(AITaskError):
+  """Clé API invalide ou accès refusé : inutile de réessayer"""
+  retryable = False
+
+
+class APIFailure(AITaskError):
+  """Erreur API non classée"""
+  retry_after = 10
+
+
+def status_code_of(error: Any) -> Optional[int]:
+  """Extrait le code HTTP d'une exception de SDK (OpenAI, Anthropic ou Google)"""
+  for attr in ("status_code", "code"):
+    value = getattr(error, attr, None)
+    if isinstance(value, int):
+      return value
+  response = getattr(error, "response", None)
+  value = getattr(response, "status_code", None)
+  return value if isinstance(value, int) else None
+
+
+def error_code_of(error: Any) -> str:
+  """Extrait le code d'erreur structuré (ex: 'insufficient_quota', 'overloaded_error')"""
+  code = getattr(error, "code", None)
+  if isinstance(code, str):
+    return code.lower()
+
+  status = getattr(error, "status", None)
+  if isinstance(status, str):
+    return status.lower()
+
+  body = getattr(error, "body", None)
+  if isinstance(body, dict):
+    inner = body.get("error", body)
+    if isinstance(inner, dict):
+      for key in ("code", "type", "status"):
+        if isinstance(inner.get(key), str):
+          return inner[key].lower()
+  return ""
@@ -0,0 +1,116 @@
+"""
+Adaptateur pour les serveurs de modèles locaux compatibles OpenAI (llama.cpp server, vLLM)
+
+Utilisation:
+    client = LocalBatchingClient(OpenAI(api_key="local", base_url="http://localhost:8080/v1"))
+    get_ai_task_answer(client, task, model="qwen2.5-7b-instruct", provider='local')
+"""
+import json
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+def chatml_prompt(messages: List[Dict[str, str]]) -> str:
+  """Met en forme une conversation au format ChatML (Qwen, Hermes, etc.)"""
+  prompt = "".join(f"<|im_start|>{m['role']}\n{m['content']}<|im_end|>\n" for m in messages)
+  return prompt + "<|im_start|>assistant\n"
+
+
+class _Batch:
+  """Requêtes en attente partageant les mêmes paramètres de génération"""
+
+  def __init__(self):
+    self.items: List[tuple] = []
+    self.full = threading.Event()
+
+
+class LocalBatchingClient:
+  """
+  Client compatible OpenAI qui regroupe les requêtes concurrentes.
+
+  Les appels à chat.completions.create reçus pendant max_wait_ms avec les mêmes
+  paramètres (modèle, max_tokens, température...) sont envoyés en une seule
+  requête /v1/completions avec une liste de prompts, que llama.cpp server et
+  vLLM traitent en un seul lot. Les réponses ont la forme d'une réponse
+  chat.completions et peuvent donc être passées à get_ai_task_answer.
+
+  Args:
+      client: Client OpenAI configuré avec le base_url du serveur local
+      max_batch_size: Nombre maximum de requêtes par lot
+      max_wait_ms: Durée de collecte des requêtes concurrentes
+      batched_completions: Si False (serveur sans support des lots), chaque
+        requête est transmise telle quelle à chat.completions
+      prompt_template: Met en forme les messages en prompt texte (ChatML par défaut)
+      stop: Séquences d'arrêt associées au prompt_template
+  """
+
+  def __init__(
+    self, client, max_batch_size: int = 16, max_wait_ms: float = 5,
+    batched_completions: bool = True,
+    prompt_template: Callable[[List[Dict[str, str]]], str] = chatml_prompt,
+    stop: Optional[List[str]] = None
+  ):
+    self.client = client
+    self.max_batch_size = max_batch_size
+    self.max_wait_ms = max_wait_ms
+    self.batched_completions = batched_completions
+    self.prompt_template = prompt_template
+    self.stop = stop if stop is not None else ["<|im_end|>"]
+    # Même interface que le client OpenAI : client.chat.completions.create(...)
+    self.chat = SimpleNamespace(completions=self)
+    self._lock = threading.Lock()
+    self._pending: Dict[str, _Batch] = {}
+
+  def create(self, **params):
+    if not self.batched_completions or params.get("stream"):
+      return self.client.chat.completions.create(**params)
+
+    params = dict(params)
+    messages = params.pop("messages")
+    params.pop("response_format", None)
+    key = json.dumps(params, sort_keys=True, default=str)
+    future: Future = Future()
+
+    with self._lock:
+      batch = self._pending.get(key)
+      is_leader = batch is None
+      if is_leader:
+        batch = self._pending[key] = _Batch()
+      batch.items.append((self.prompt_template(messages), future))
+      if len(batch.items) >= self.max_batch_size:
+        # Lot complet : les requêtes suivantes ouvrent un nouveau lot
+        del self._pending[key]
+        batch.full.set()
+
+    if is_leader:
+      batch.full.wait(self.max_wait_ms / 1000)
+      with self._lock:
+        if self._pending.get(key) is batch:
+          del self._pending[key]
+      self._send(batch, params)
+
+    return future.result()
+
+  def _send(self, batch: _Batch, params: Dict[str, Any]):
+    """Envoie un lot de prompts et distribue les réponses aux requêtes en attente"""
+    prompts = [prompt for prompt, _ in batch.items]
+    try:
+      response = self.client.completions.create(prompt=prompts, stop=self.stop, **params)
+      choices = sorted(response.choices, key=lambda choice: choice.index)
+      if len(choices) != len(prompts):
+        raise ValueError(f"Le serveur a renvoyé {len(choices)} réponses pour {len(prompts)} prompts")
+    except Exception as e:
+      for _, future in batch.items:
+        future.set_exception(e)
+      return
+
+    for (_, future), choice in zip(batch.items, choices):
+      future.set_result(SimpleNamespace(
+        model=response.model,
+        choices=[SimpleNamespace(
+          index=0,
+          message=SimpleNamespace(role="assistant", content=choice.text),
+          finish_reason=choice.finish_reason
+        )]
+      ))
@@ -4,8 +4,13 @@ from typing import List, Optional
 from anthropic import Anthropic
 from google import genai
 
-from answer import get_ai_task_answer
+from types import SimpleNamespace
+from answer import get_ai_task_answer, get_ai_task_answers, _classify_error, _stitch, MAX_ATTEMPTS, CONTINUATION_PROMPT
+from errors import APIFailure, AuthenticationFailed, Overloaded, QuotaExhausted, RateLimited
 from answer_format import AnswerFormat
+from local import LocalBatchingClient
+from echo_server import start_echo_server
+from utils import extract_first_json, decode_json
 
 # Clés API stockées en variables (à remplacer par les vôtres)
 OPENAI_API_KEY = '<votre clé API OpenAI>'
@@ -229,6 +234,166 @@ def test_google_genai():
     print(f"⚠️ Test Google GenAI non exécuté: {e}")
     print("Vérifiez votre clé API ou votre connexion internet.")
 
+def test_local_batching():
+  """Test du provider local avec regroupement des requêtes (serveur d'écho, ne nécessite pas de clé API)"""
+  server, base_url = start_echo_server()
+  try:
+    client = LocalBatchingClient(OpenAI(api_key="local", base_url=base_url), max_batch_size=4, max_wait_ms=50)
+
+    print("\n=== Test serveur local avec requêtes concurrentes ===")
+    tasks = [f"Question numéro {i}" for i in range(8)]
+    responses = get_ai_task_answers(client, tasks, max_workers=8, model="echo", provider='local')
+
+    for task, response in zip(tasks, responses):
+      assert task in response, f"Réponse inattendue pour {task}: {response}"
+    assert sum(server.batch_sizes) == len(tasks)
+    print(f"Lots envoyés au serveur : {server.batch_sizes}")
+  finally:
+    server.shutdown()
+
+class ItemListFormat(AnswerFormat):
+  items: List[ResultItem] = Field(..., description="Éléments trouvés")
+
+def test_json_repair():
+  """Teste l'extraction et la réparation des JSON guidées par le format (ne nécessite pas de clés API)"""
+  assert extract_first_json('Result: [{"a": 1}, {"a": 2}] done') == [{"a": 1}, {"a": 2}]
+  assert extract_first_json('Voici : {"a": [1, 2]} fin') == {"a": [1, 2]}
+  assert extract_first_json('[incomplet puis {"a": 1}') == {"a": 1}
+
+  # Clés approchantes, nombres en chaîne et valeur isolée pour une liste
+  coerced = ComplexFormat.coerce_json({
+    "Result": {"name": "A", "description": "premier", "score": "8,5"},
+    "total-count": "1", "query_time": "0.25"
+  })
+  assert coerced == {
+    "result": [{"name": "A", "description": "premier", "score": 8.5}], "total_count": 1, "query_time": 0.25
+  }
+  ComplexFormat.from_json(coerced)
+
+  # Champ int : valeurs entières seulement ; toute valeur non convertible est refusée
+  base = {"result": [], "query_time": 0.25}
+  assert ComplexFormat.coerce_json(dict(base, total_count=4.0))["total_count"] == 4
+  assert ComplexFormat.coerce_json(dict(base, total_count="12 éléments"))["total_count"] == 12
+  for value in ("3.5", 3.5, "abc", [1], float("nan")):
+    try:
+      ComplexFormat.coerce_json(dict(base, total_count=value))
+      assert False, f"{value!r} accepté pour un champ int"
+    except ValueError as e:
+      assert "total_count" in str(e)
+  try:
+    ComplexFormat.coerce_json(dict(base, total_count=1, query_time="rapide"))
+    assert False, "Texte accepté pour un champ float"
+  except ValueError as e:
+    assert "query_time" in str(e)
+
+  # Tableau entouré de texte pour un format à liste racine : tous les éléments sont conservés
+  answer = 'Résultat : [{"name": "A", "description": "a"}, {"name": "B", "description": "b"}] terminé'
+  decoded = decode_json(answer, ItemListFormat)
+  assert [item["name"] for item in decoded["items"]] == ["A", "B"]
+  assert len(ItemListFormat.from_json(decoded).items) == 2
+  print("Réparation des JSON : OK")
+
+class FakeAPIError(Exception):
+  """Erreur de SDK simulée, avec code HTTP et en-tête Retry-After nul (pas d'attente entre les tentatives)"""
+  def __init__(self, status_code, message="erreur simulée", body=None):
+    super().__init__(message)
+    self.status_code = status_code
+    self.body = body
+    self.response = SimpleNamespace(status_code=status_code, headers={"retry-after": "0"})
+
+class FakeClient:
+  """
+  Client compatible OpenAI sans réseau : respond(messages) renvoie le texte de la
+  réponse, un couple (texte, finish_reason) ou une exception à lever
+  """
+  def __init__(self, respond):
+    self.respond = respond
+    self.calls = []
+    self.chat = SimpleNamespace(completions=self)
+
+  def create(self, **params):
+    self.calls.append(params)
+    outcome = self.respond(params["messages"])
+    if isinstance(outcome, Exception):
+      raise outcome
+    content, finish_reason = outcome if isinstance(outcome, tuple) else (outcome, "stop")
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)])
+
+def test_errors_and_retries():
+  """Teste les erreurs typées, les nouvelles tentatives et return_exceptions (client simulé, sans clé API)"""
+  # 429 : nouvelle tentative puis succès
+  outcomes = iter([FakeAPIError(429), "Bonjour"])
+  client = FakeClient(lambda messages: next(outcomes))
+  assert get_ai_task_answer(client, "Salut") == "Bonjour" and len(client.calls) == 2
+
+  # 400 : erreur typée levée une fois les tentatives épuisées, avec leur historique
+  client = FakeClient(lambda messages: FakeAPIError(400, "requête invalide"))
+  try:
+    get_ai_task_answer(client, "Salut")
+    assert False, "APIFailure attendue"
+  except APIFailure as e:
+    assert e.status_code == 400 and len(e.attempts) == MAX_ATTEMPTS == len(client.calls)
+
+  # 401 : pas de nouvelle tentative
+  client = FakeClient(lambda messages: FakeAPIError(401))
+  try:
+    get_ai_task_answer(client, "Salut")
+    assert False, "AuthenticationFailed attendue"
+  except AuthenticationFailed as e:
+    assert len(client.calls) == 1 and not e.retryable
+
+  assert isinstance(_classify_error(FakeAPIError(503), 'openai'), Overloaded)
+  assert isinstance(_classify_error(FakeAPIError(429, body={"error": {"code": "insufficient_quota"}}), 'openai'), QuotaExhausted)
+  assert isinstance(_classify_error(FakeAPIError(400, "Your credit balance is too low"), 'anthropic'), QuotaExhausted)
+  assert isinstance(_classify_error(FakeAPIError(429), 'openai'), RateLimited)
+  assert isinstance(_classify_error(ConnectionResetError("connexion perdue"), 'openai'), APIFailure)
+
+  # Erreur de programmation : remontée telle quelle, sans nouvelle tentative
+  assert _classify_error(KeyError("choices"), 'openai') is None
+  client = FakeClient(lambda messages: TypeError("argument inattendu"))
+  try:
+    get_ai_task_answer(client, "Salut")
+    assert False, "TypeError attendue"
+  except TypeError:
+    assert len(client.calls) == 1
+
+  # return_exceptions : les erreurs prennent la place des réponses en échec
+  def respond(messages):
+    return FakeAPIError(403) if "échec" in messages[-1]["content"] else messages[-1]["content"].upper()
+  results = get_ai_task_answers(FakeClient(respond), ["un", "échec", "deux"], return_exceptions=True)
+  assert results[0] == "UN" and results[2] == "DEUX" and isinstance(results[1], AuthenticationFailed)
+  try:
+    get_ai_task_answers(FakeClient(respond), ["un", "échec"])
+    assert False, "AuthenticationFailed attendue"
+  except AuthenticationFailed:
+    pass
+  print("Erreurs typées et nouvelles tentatives : OK")
+
+def test_truncated_continuation():
+  """Teste la reprise d'une réponse JSON tronquée et le raccord des morceaux (client simulé, sans clé API)"""
+  partial = '{"title": "Tarte aux pommes", "ingredients": ["pommes", "pâte brisée"'
+  assert _stitch(partial, '["pommes", "pâte brisée", "sucre"]}') == partial + ', "sucre"]}'  # Chevauchement retiré
+  assert _stitch(partial, '```json\n, "sucre"]}') == partial + ', "sucre"]}'  # Bloc de code retiré
+  assert _stitch('{"a": "x"', '"x"}') == '{"a": "x""x"}'  # Chevauchement trop court pour être retiré
+
+  answers = iter([
+    (partial, "length"),
+    ('"ingredients": ["pommes", "pâte brisée", "sucre"], "steps": ["Étaler", "Cuire"]', "length"),
+    (', "preparation_time": "45 minutes", "difficulty": "facile"}', "stop"),
+  ])
+  client = FakeClient(lambda messages: next(answers))
+  recipe = get_ai_task_answer(client, "Une recette de tarte", answer_format=RecipeFormat, max_tokens=50)
+  assert recipe.ingredients == ["pommes", "pâte brisée", "sucre"] and recipe.steps == ["Étaler", "Cuire"]
+  assert recipe.preparation_time == 45 and len(client.calls) == 3
+
+  # Chaque continuation renvoie la réponse partielle et demande la suite, sans format imposé
+  continuation = client.calls[2]
+  assert continuation["messages"][-1]["content"] == CONTINUATION_PROMPT
+  assert continuation["messages"][-2]["content"].endswith('"steps": ["Étaler", "Cuire"]')
+  assert "response_format" in client.calls[0] and "response_format" not in continuation
+  print("Reprise des réponses tronquées : OK")
+
 def test_generate_examples():
   """Teste la génération d'exemples et de prompts"""
   # Afficher un exemple du format généré et le prompt
@@ -243,6 +408,12 @@ def test_generate_examples():
 if __name__ == "__main__":
   # Tests de génération d'exemples (ne nécessite pas de clés API)
   test_generate_examples()
+  test_json_repair()
+  test_errors_and_retries()
+  test_truncated_continuation()
+  
+  # Test du provider local (ne nécessite pas de clés API)
+  test_local_batching()
   
   # Tests avec les différents fournisseurs (chaque test peut être exécuté indépendamment)
   print("\n=== Tests avec OpenAI ===")
@@ -1,7 +1,5 @@
 import json
 import re
-import json_repair
-from fix_busted_json import repair_json
 
 def decode_json_edge_cases(str_json):
   if not str_json or str_json.isspace():
@@ -257,7 +255,35 @@ def fix_multiline_strings(str_json):
   corrected_str_json = corrected_str_json.replace('\n', '\\n')
   return corrected_str_json
 
-def decode_json(str_json):
+def extract_first_json(str_json):
+  """Décode le premier objet ou tableau JSON complet en ignorant le texte qui l'entoure"""
+  decoder = json.JSONDecoder()
+  # Le premier délimiteur rencontré d'abord : un tableau d'objets n'est pas réduit à son premier élément
+  starts = sorted(start for start in (str_json.find('{'), str_json.find('[')) if start != -1)
+  for start in starts:
+    try:
+      return decoder.raw_decode(str_json, start)[0]
+    except json.JSONDecodeError:
+      continue
+  raise ValueError("Aucun JSON complet trouvé")
+
+def decode_json(str_json, answer_format=None):
+  """
+  Décode un JSON potentiellement mal formé.
+
+  Si answer_format est fourni, la réparation s'appuie sur les champs et types
+  déclarés (voir AnswerFormat.coerce_json) plutôt que de deviner à l'aveugle
+  """
+  if answer_format is not None and hasattr(answer_format, 'coerce_json'):
+    try:
+      json_data = json.loads(str_json)
+    except json.JSONDecodeError:
+      try:
+        json_data = extract_first_json(str_json)
+      except ValueError:
+        json_data = decode_json(str_json)
+    return answer_format.coerce_json(json_data)
+
   try:
     return json.loads(str_json)
   except json.JSONDecodeError:
@@ -318,6 +344,9 @@ def decode_json(str_json):
               try:
                 return decode_json_edge_cases(relatively_fixed_str_json)
               except:
+                # Import différé : les bibliothèques de réparation ne sont chargées qu'en dernier recours
+                import json_repair
+                from fix_busted_json import repair_json
                 try:
                   return json_repair.loads(original_str_json, skip_json_loads=True)
                 except:
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Point d'entrée de `python -m devis` (voir cli.py)
+"""
+
+import os
+import sys
+
+# Les modules du dossier s'importent à plat (from invoice import ...)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+if __name__ == "__main__":
+  raise SystemExit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks du rendu des devis (ne nécessite pas de clé Stripe : l'API est imitée localement)
+
+Usage:
+  python benchmark.py          # Suite complète
+  python benchmark.py rendu    # Débit de rendu uniquement
+  python benchmark.py tableaux # Tableaux d'items uniquement
+  python benchmark.py polices  # Polices standard contre polices TrueType
+"""
+
+import os
+import sys
+import time
+import resource
+import subprocess
+from datetime import datetime
+from decimal import Decimal
+
+from invoice import ModernInvoiceTemplate, CompanyInfo, ClientInfo, ItemGroup, InvoiceItem
+from fonts import FONT_REGISTRY, find_font
+
+# Nombres de lignes des devis mesurés
+TABLE_SIZES = [100, 1_000, 10_000]
+
+# Lignes par groupe d'items dans les devis générés
+ITEMS_PER_GROUP = 50
+
+# Tailles de devis mesurées : (nom, nombre de groupes, items par groupe)
+QUOTE_SIZES = [
+  ("minimal", 1, 5),
+  ("courant", 5, 10),
+  ("grand", 20, 50),
+  ("extrême", 200, 100),
+]
+
+# Variantes : devis nu, ou complet avec logo, notes et QR code de paiement (API Stripe imitée)
+VARIANTS = {
+  "nu": dict(logo=False, notes=False, qr_code=False),
+  "complet": dict(logo=True, notes=True, qr_code=True),
+}
+
+# Jeux de polices comparés : polices standard du PDF, ou famille TrueType (sous-ensembles intégrés)
+# avec une police de secours pour les symboles absents
+FONT_SETS = {
+  "standard": None,
+  "truetype": dict(
+    family=("DejaVuSerif", "DejaVuSerif.ttf", "DejaVuSerif-Bold.ttf"),
+    fallback=("DejaVuSans", "DejaVuSans.ttf"),
+  ),
+}
+
+# Durée minimale de mesure d'un scénario (en secondes), après un rendu de chauffe
+MIN_DURATION = 2.0
+
+# Date fixe : les PDF générés ne dépendent pas du jour de la mesure
+BENCHMARK_DATE = datetime(2024, 1, 15)
+
+NOTES = (
+  "<b>Conditions particulières</b><br/>"
+  + "Les prestations sont réalisées selon le calendrier convenu ; toute demande supplémentaire fera l'objet d'un avenant. " * 6
+)
+
+def create_large_quote(rows: int) -> ModernInvoiceTemplate:
+  """Crée un devis de `rows` lignes réparties en groupes de ITEMS_PER_GROUP"""
+  template = ModernInvoiceTemplate()
+  template.set_company_info(CompanyInfo("Société", "1 rue de Paris", "75001", "Paris", "0100000000", "contact@societe.fr"))
+  template.set_client_info(ClientInfo("Client", "2 rue de Lyon", "69001", "Lyon"))
+  template.set_invoice_details("BENCH-001")
+  for start in range(0, rows, ITEMS_PER_GROUP):
+    template.add_item_group(ItemGroup(f"Lot {start // ITEMS_PER_GROUP + 1}", [
+      InvoiceItem(f"Article {n}", n % 7 + 1, Decimal("12.50")) for n in range(start, min(start + ITEMS_PER_GROUP, rows))
+    ]))
+  return template
+
+def create_synthetic_quote(groups: int, items_per_group: int, logo: bool = False, notes: bool = False,
+                           invoice_number: str = "BENCH-001") -> ModernInvoiceTemplate:
+  """Crée un devis reproductible de `groups` groupes de `items_per_group` items"""
+  template = ModernInvoiceTemplate()
+  template.set_company_info(CompanyInfo(
+    "Société", "1 rue de Paris", "75001", "Paris", "0100000000", "contact@societe.fr",
+    rib_iban="FR76 3000 6000 0112 3456 7890 189", rib_bic="AGRIFRPP", rib_bank="Banque"
+  ))
+  template.set_client_info(ClientInfo("Client", "2 rue de Lyon", "69001", "Lyon", "client@example.com"))
+  template.set_invoice_details(invoice_number, BENCHMARK_DATE)
+  if logo:
+    template.set_logo(os.path.join(os.path.dirname(os.path.abspath(__file__)), "logo.png"))
+  for group in range(groups):
+    template.add_item_group(ItemGroup(f"Lot {group + 1}", [
+      InvoiceItem(f"Prestation {group + 1}.{n + 1}", n % 7 + 1, Decimal("12.50") + n % 13, "jour")
+      for n in range(items_per_group)
+    ]))
+  if notes:
+    template.add_notes(NOTES)
+  return template
+
+def measure_rendering(groups: int, items_per_group: int, variant: str, min_duration: float = MIN_DURATION):
+  """
+  Rend des devis du scénario pendant au moins min_duration secondes
+
+  Avec QR code, chaque devis crée son lien de paiement auprès d'un mock local
+  de l'API Stripe. Affiche "docs/s pic_mémoire_ko taille_moyenne_octets".
+  """
+  options = dict(VARIANTS[variant])
+  qr_code = options.pop("qr_code")
+  if qr_code:
+    import stripe
+    from stripe_mock import start_stripe_mock
+    _, stripe.api_base = start_stripe_mock()
+    os.environ["STRIPE_PRIVATE_KEY"] = "sk_test_benchmark"
+  else:
+    os.environ.pop("STRIPE_PRIVATE_KEY", None)
+  
+  def render(number: int) -> int:
+    template = create_synthetic_quote(groups, items_per_group, invoice_number=f"BENCH-{number:05d}", **options)
+    return len(template.render_pdf())
+  
+  render(0)  # Chauffe : polices, styles et caches du processus
+  documents = total_size = 0
+  start = time.perf_counter()
+  while documents == 0 or time.perf_counter() - start < min_duration:
+    documents += 1
+    total_size += render(documents)
+  elapsed = time.perf_counter() - start
+  print(documents / elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, total_size // documents)
+
+def font_theme(font_set: str):
+  """Thème utilisant un jeu de polices de FONT_SETS (None : thème par défaut)"""
+  options = FONT_SETS[font_set]
+  if options is None:
+    return None
+  name, regular, bold = options["family"]
+  fonts = FONT_REGISTRY.register_family(name, find_font(regular), bold=find_font(bold))
+  fallback_name, fallback_file = options["fallback"]
+  FONT_REGISTRY.add_fallback(fallback_name, find_font(fallback_file))
+  return ModernInvoiceTemplate.default_theme().with_fonts(fonts)
+
+def measure_fonts(groups: int, items_per_group: int, font_set: str, min_duration: float = MIN_DURATION):
+  """
+  Rend des devis complets (sans Stripe) avec un jeu de polices
+
+  Le premier rendu inclut l'enregistrement des polices dans le processus.
+  Affiche "premier_rendu_s docs/s taille_moyenne_octets".
+  """
+  os.environ.pop("STRIPE_PRIVATE_KEY", None)
+  start = time.perf_counter()
+  theme = font_theme(font_set)
+  
+  def render(number: int) -> int:
+    template = create_synthetic_quote(groups, items_per_group, logo=True, notes=True, invoice_number=f"BENCH-{number:05d}")
+    if theme is not None:
+      template.set_theme(theme)
+    return len(template.render_pdf())
+  
+  render(0)
+  first = time.perf_counter() - start
+  documents = total_size = 0
+  start = time.perf_counter()
+  while documents == 0 or time.perf_counter() - start < min_duration:
+    documents += 1
+    total_size += render(documents)
+  elapsed = time.perf_counter() - start
+  print(first, documents / elapsed, total_size // documents)
+
+def _run_in_fresh_interpreter(code: str) -> str:
+  """Exécute du code dans un interpréteur neuf (mémoire non partagée entre mesures) et renvoie sa sortie"""
+  return subprocess.run(
+    [sys.executable, "-c", code],
+    cwd=os.path.dirname(os.path.abspath(__file__)),
+    capture_output=True, text=True, check=True
+  ).stdout.strip().splitlines()[-1]
+
+def benchmark_items_table(sizes=TABLE_SIZES):
+  """Mesure le temps, le pic mémoire et la taille du PDF d'un devis selon son nombre de lignes"""
+  for rows in sizes:
+    code = (
+      "import resource, time\n"
+      "from benchmark import create_large_quote\n"
+      f"template = create_large_quote({rows})\n"
+      "start = time.perf_counter()\n"
+      "pdf = template.render_pdf()\n"
+      "elapsed = time.perf_counter() - start\n"
+      "print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, len(pdf))\n"
+    )
+    elapsed, max_rss_kb, size = _run_in_fresh_interpreter(code).split()
+    print(f"  {rows:>6} lignes : {float(elapsed):7.2f} s, pic mémoire {int(max_rss_kb) / 1024:7.1f} Mo, PDF {int(size) / 1024:8.1f} Ko")
+
+def benchmark_rendering(sizes=QUOTE_SIZES, variants=VARIANTS):
+  """Mesure le débit, le pic mémoire et la taille des PDF pour chaque taille et variante de devis"""
+  print(f"  {'scénario':<10} {'variante':<8} {'lignes':>7} {'docs/s':>8} {'pic mémoire':>12} {'PDF':>11}")
+  for name, groups, items_per_group in sizes:
+    for variant in variants:
+      code = (
+        "from benchmark import measure_rendering\n"
+        f"measure_rendering({groups}, {items_per_group}, {variant!r})\n"
+      )
+      rate, max_rss_kb, size = _run_in_fresh_interpreter(code).split()
+      print(
+        f"  {name:<10} {variant:<8} {groups * items_per_group:>7} {float(rate):8.2f} "
+        f"{int(max_rss_kb) / 1024:9.1f} Mo {int(size) / 1024:8.1f} Ko"
+      )
+
+def benchmark_fonts(sizes=QUOTE_SIZES[:3], font_sets=FONT_SETS):
+  """Compare le premier rendu, le débit et la taille des PDF selon le jeu de polices"""
+  print(f"  {'scénario':<10} {'polices':<9} {'1er rendu':>10} {'docs/s':>8} {'PDF':>11}")
+  for name, groups, items_per_group in sizes:
+    for font_set in font_sets:
+      code = (
+        "from benchmark import measure_fonts\n"
+        f"measure_fonts({groups}, {items_per_group}, {font_set!r})\n"
+      )
+      first, rate, size = _run_in_fresh_interpreter(code).split()
+      print(f"  {name:<10} {font_set:<9} {float(first) * 1000:7.0f} ms {float(rate):8.2f} {int(size) / 1024:8.1f} Ko")
+
+if __name__ == "__main__":
+  suites = sys.argv[1:] or ["rendu", "tableaux", "polices"]
+  
+  if "rendu" in suites:
+    print("=== Débit de rendu des devis ===")
+    benchmark_rendering()
+  
+  if "tableaux" in suites:
+    print("\n=== Rendu des tableaux d'items ===")
+    benchmark_items_table()
+  
+  if "polices" in suites:
+    print("\n=== Polices standard et TrueType ===")
+    benchmark_fonts()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Génération de devis en masse sur plusieurs processus
+
+Utilisation:
+  specs = [QuoteSpec(filename="devis_001.pdf", company=company, client=client, item_groups=[group]), ...]
+  for result in generate_many(specs, "sortie", workers=8):
+    print(result.filename, result.error or result.path)
+"""
+
+import os
+import traceback
+from time import perf_counter
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional, Iterable, Iterator, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from reportlab.pdfbase import pdfmetrics
+
+from invoice import (
+  ModernInvoiceTemplate,
+  Theme,
+  CompanyInfo,
+  ClientInfo,
+  ProjectInfo,
+  ItemGroup,
+  RecurringPlan,
+  DOCUMENT_QUOTE,
+  ROUNDING_PER_LINE
+)
+from numbering import InvoiceNumbering
+
+
+@dataclass
+class QuoteSpec:
+  """Description complète d'un devis à générer en lot"""
+  filename: str
+  company: CompanyInfo
+  client: ClientInfo
+  item_groups: List[ItemGroup]
+  invoice_number: str = ""
+  invoice_date: Optional[datetime] = None
+  due_date: Optional[datetime] = None
+  project: Optional[ProjectInfo] = None
+  notes: str = ""
+  logo_path: Optional[str] = None
+  payment_percentage: float = 1.0
+  invoice_title: Optional[str] = None
+  theme: Optional[Theme] = None
+  payment_link: Optional[str] = None  # Lien déjà provisionné (voir payment_links.provision_payment_links)
+  rounding: str = ROUNDING_PER_LINE
+  cached_chrome: bool = True  # En-tête et mentions de l'entreprise construits une fois par processus
+  profile: bool = False  # Rapport de rendu joint au résultat (voir profiling.RenderReport)
+  recurring_plans: Optional[List[RecurringPlan]] = None  # Formules par défaut si None, aucune si vide
+  disabled_sections: Tuple[str, ...] = ()  # Sections omises (voir ModernInvoiceTemplate.SECTIONS)
+  currency: str = "EUR"
+  locale: Optional[str] = None  # Conventions d'affichage des montants, fr_FR par défaut
+  price_currency: Optional[str] = None  # Devise des prix des items si elle diffère (convertis au taux de la table)
+  vat_rate: Optional[Decimal] = None  # Taux par défaut des lignes sans taux propre
+  document_kind: str = DOCUMENT_QUOTE  # "quote", "invoice" ou "credit_note"
+  quote_reference: Optional[str] = None  # Devis d'origine d'une facture ou d'un avoir
+  deposit_paid: bool = False  # Acompte du devis (payment_percentage) versé, déduit de la facture
+  credited_invoice: Optional[str] = None  # Facture annulée par un avoir
+  numbering: Optional[str] = None  # Base SQLite de numérotation : numéro attribué si invoice_number est vide
+
+  @property
+  def document_key(self) -> str:
+    """Clé du document dans la numérotation : le même fichier garde son numéro d'un lot à l'autre"""
+    return f"{self.document_kind}:{self.filename}"
+
+  def build_template(self) -> ModernInvoiceTemplate:
+    """Construit le template configuré pour ce devis"""
+    template = ModernInvoiceTemplate(theme=self.theme)
+    template.set_company_info(self.company)
+    template.set_client_info(self.client)
+    if self.project:
+      template.set_project_info(self.project)
+    invoice_number = self.invoice_number
+    if self.numbering and not invoice_number:
+      invoice_number = _numbering(self.numbering).allocate(self.document_kind, self.document_key, self.invoice_date)
+    template.set_invoice_details(invoice_number, self.invoice_date, self.due_date)
+    if self.logo_path:
+      template.set_logo(self.logo_path)
+    for group in self.item_groups:
+      template.add_item_group(group)
+    if self.notes:
+      template.add_notes(self.notes)
+    template.set_payment_percentage(self.payment_percentage)
+    template.set_rounding(self.rounding)
+    template.set_currency(self.currency, self.locale, self.price_currency)
+    if self.vat_rate is not None:
+      template.set_vat_rate(self.vat_rate)
+    if self.document_kind != DOCUMENT_QUOTE:
+      template.set_document_kind(
+        self.document_kind, self.quote_reference,
+        template.deposit_amount if self.deposit_paid else Decimal("0"), self.credited_invoice
+      )
+    template.set_cached_chrome(self.cached_chrome)
+    template.set_profiling(self.profile)
+    if self.recurring_plans is not None:
+      template.set_recurring_plans(self.recurring_plans)
+    for name in self.disabled_sections:
+      template.set_section_enabled(name, False)
+    if self.invoice_title:
+      template.set_invoice_title(self.invoice_title)
+    if self.payment_link:
+      template.set_payment_link(self.payment_link)
+    return template
+
+
+@dataclass
+class RenderResult:
+  """Résultat du rendu d'un devis (chemin créé ou erreur)"""
+  index: int
+  filename: str
+  path: Optional[str] = None
+  error: Optional[str] = None
+  seconds: float = 0.0
+  skipped: bool = False  # PDF existant conservé (mode incrémental)
+  report: Optional[dict] = None  # RenderReport.to_dict() si le devis a été profilé
+  invoice_number: str = ""  # Numéro du document, éventuellement attribué par la numérotation
+
+  @property
+  def ok(self) -> bool:
+    return self.error is None
+
+
+@lru_cache(maxsize=None)
+def _numbering(path: str) -> InvoiceNumbering:
+  """Numérotation ouverte une fois par processus et par base"""
+  return InvoiceNumbering(path)
+
+def _init_worker():
+  """Prépare les styles et les polices une fois pour tous les devis du processus"""
+  theme = ModernInvoiceTemplate.default_theme()
+  theme.styles
+  for font_name in (theme.fonts.regular, theme.fonts.bold, theme.margin_font):
+    pdfmetrics.getFont(font_name)
+
+def _render(index: int, spec: QuoteSpec, out_dir: str, incremental: bool = False) -> RenderResult:
+  start = perf_counter()
+  try:
+    template = spec.build_template()
+    path = os.path.join(out_dir, spec.filename)
+    if incremental and template.is_up_to_date(path):
+      return RenderResult(
+        index, spec.filename, path=os.path.abspath(path), seconds=perf_counter() - start, skipped=True,
+        invoice_number=template.invoice_number
+      )
+    path = template.generate_pdf(path)
+    report = template.render_report.to_dict() if template.render_report else None
+    return RenderResult(
+      index, spec.filename, path=path, seconds=perf_counter() - start, report=report,
+      invoice_number=template.invoice_number
+    )
+  except Exception:
+    return RenderResult(index, spec.filename, error=traceback.format_exc(), seconds=perf_counter() - start)
+
+def generate_many(specs: Iterable[QuoteSpec], out_dir: str, workers: Optional[int] = None, incremental: bool = False) -> Iterator[RenderResult]:
+  """
+  Génère une série de devis en parallèle
+
+  Args:
+    specs: Devis à générer
+    out_dir: Dossier de sortie (créé si nécessaire)
+    workers: Nombre de processus (nombre de cœurs par défaut, 1 pour un rendu dans le processus courant)
+    incremental: Conserve les PDF existants générés à partir des mêmes données
+
+  Returns:
+    Itérateur des résultats au fur et à mesure de leur achèvement ; une erreur sur
+    un devis est rapportée dans son résultat sans interrompre les autres
+  """
+  os.makedirs(out_dir, exist_ok=True)
+  workers = workers or os.cpu_count() or 1
+
+  if workers == 1:
+    _init_worker()
+    for index, spec in enumerate(specs):
+      yield _render(index, spec, out_dir, incremental)
+    return
+
+  with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+    futures = [executor.submit(_render, index, spec, out_dir, incremental) for index, spec in enumerate(specs)]
+    for future in as_completed(futures):
+      yield future.result()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ligne de commande de génération des devis à partir de documents JSON/YAML
+
+Usage:
+  python -m devis render devis.yaml -o sortie
+  python -m devis render dossier_devis/ -o sortie --workers 8
+  cat devis.jsonl | python -m devis render - -o sortie
+"""
+
+import os
+import json
+import argparse
+from typing import Dict, List, Optional
+
+from bulk import generate_many
+from quote_document import iter_documents
+from profiling import RenderReport
+
+# Empreintes des documents déjà générés, conservées dans le dossier de sortie
+MANIFEST_FILENAME = ".devis-manifest.json"
+
+
+def _load_manifest(out_dir: str) -> Dict[str, str]:
+  try:
+    with open(os.path.join(out_dir, MANIFEST_FILENAME), encoding="utf-8") as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return {}
+
+def _save_manifest(out_dir: str, manifest: Dict[str, str]):
+  path = os.path.join(out_dir, MANIFEST_FILENAME)
+  with open(path + ".tmp", "w", encoding="utf-8") as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
+  os.replace(path + ".tmp", path)
+
+def render(source: str, out_dir: str, workers: Optional[int] = None, force: bool = False, profile: bool = False) -> int:
+  """
+  Génère les devis d'un fichier, d'un dossier ou d'un flux JSONL
+
+  Les documents dont l'empreinte n'a pas changé depuis la dernière exécution
+  (et dont le PDF existe toujours) ne sont pas régénérés, sauf avec force=True.
+  Avec profile=True, le rapport de rendu cumulé du lot est affiché à la fin.
+
+  Returns:
+    Nombre de documents en erreur (lecture, validation ou rendu)
+  """
+  os.makedirs(out_dir, exist_ok=True)
+  manifest = _load_manifest(out_dir)
+  errors = skipped = 0
+  specs, hashes = [], []
+  seen_filenames = set()
+
+  for loaded in iter_documents(source):
+    if not loaded.ok:
+      errors += 1
+      print(f"❌ {loaded.source} : {loaded.error}")
+      continue
+
+    document = loaded.document
+    filename = document.output_filename
+    if filename in seen_filenames:
+      errors += 1
+      print(f"❌ {loaded.source} : le fichier {filename} est déjà produit par un autre devis")
+      continue
+    seen_filenames.add(filename)
+
+    content_hash = document.content_hash(loaded.base_dir)
+    if not force and manifest.get(filename) == content_hash and os.path.exists(os.path.join(out_dir, filename)):
+      skipped += 1
+      continue
+    spec = document.to_spec(loaded.base_dir)
+    spec.profile = profile
+    specs.append(spec)
+    hashes.append(content_hash)
+
+  rendered = 0
+  reports = []
+  for result in generate_many(specs, out_dir, workers=workers):
+    if result.ok:
+      rendered += 1
+      manifest[result.filename] = hashes[result.index]
+      reports.append(result.report)
+      print(f"✅ {result.filename} ({result.seconds:.2f} s)")
+    else:
+      errors += 1
+      manifest.pop(result.filename, None)
+      print(f"❌ {result.filename} :\n{result.error}")
+
+  _save_manifest(out_dir, manifest)
+  print(f"📊 {rendered} généré(s), {skipped} inchangé(s), {errors} erreur(s)")
+  if profile and rendered:
+    print(RenderReport.aggregate(reports).format())
+  return errors
+
+def main(argv: Optional[List[str]] = None) -> int:
+  parser = argparse.ArgumentParser(prog="python -m devis", description="Génération de devis PDF")
+  commands = parser.add_subparsers(dest="command", required=True)
+
+  render_parser = commands.add_parser("render", help="Génère les devis décrits en JSON/YAML")
+  render_parser.add_argument("source", help="Fichier JSON, YAML ou JSONL, dossier, ou - pour un flux JSONL sur l'entrée standard")
+  render_parser.add_argument("-o", "--output", default=".", help="Dossier de sortie (défaut : dossier courant)")
+  render_parser.add_argument("-w", "--workers", type=int, default=None, help="Nombre de processus (défaut : nombre de cœurs)")
+  render_parser.add_argument("-f", "--force", action="store_true", help="Régénère aussi les devis inchangés")
+  render_parser.add_argument("-p", "--profile", action="store_true", help="Affiche la durée de chaque étape du rendu")
+
+  args = parser.parse_args(argv)
+  if args.command == "render":
+    return 1 if render(args.source, args.output, args.workers, args.force, args.profile) else 0
+  return 0
+
+if __name__ == "__main__":
+  raise SystemExit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Devises, taux de change et formatage des montants selon la langue
+
+Utilisation:
+  format_money(Decimal("1920"), "EUR", "fr_FR")        # '1 920,00 €'
+  format_money(Decimal("1920"), "USD", "en_US")        # '$1,920.00'
+  format_rate(Decimal("0.055"))                        # '5,5 %'
+  to_minor_units(Decimal("19.99"), "EUR")              # 1999 (centimes, pour Stripe)
+  load_exchange_rates().convert(Decimal("100"), "EUR", "CHF")
+"""
+
+import os
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from typing import Callable, Dict, Union
+
+# Table des taux de change locale, lue une seule fois par processus
+DEFAULT_EXCHANGE_RATES_PATH = os.getenv(
+  "DEVIS_EXCHANGE_RATES",
+  os.path.join(os.path.dirname(os.path.abspath(__file__)), "exchange_rates.json")
+)
+
+
+@dataclass(frozen=True)
+class Currency:
+  """Devise ISO 4217 avec son symbole et son nombre de décimales"""
+  code: str
+  symbol: str
+  minor_units: int = 2  # 2 pour l'euro (centimes), 0 pour le yen
+
+  @property
+  def quantum(self) -> Decimal:
+    """Plus petite unité de la devise (0.01 pour l'euro)"""
+    return Decimal(1).scaleb(-self.minor_units)
+
+
+# Devises prises en charge (symboles disponibles dans les polices standard du PDF)
+CURRENCIES = {currency.code: currency for currency in (
+  Currency("EUR", "€"),
+  Currency("USD", "$"),
+  Currency("GBP", "£"),
+  Currency("CHF", "CHF"),
+  Currency("CAD", "$ CA"),
+  Currency("JPY", "¥", 0),
+)}
+
+# Conventions par langue : (séparateur de milliers, séparateur décimal, symbole avant le montant)
+LOCALE_CONVENTIONS = {
+  "fr_FR": (" ", ",", False),
+  "fr_BE": (" ", ",", False),
+  "fr_CA": (" ", ",", False),
+  "de_DE": (".", ",", False),
+  "de_CH": ("'", ".", True),
+  "en_US": (",", ".", True),
+  "en_GB": (",", ".", True),
+}
+
+
+def get_currency(currency: Union[str, Currency]) -> Currency:
+  """Retourne la devise correspondant à un code ISO (EUR, USD...)"""
+  if isinstance(currency, Currency):
+    return currency
+  try:
+    return CURRENCIES[currency.upper()]
+  except KeyError:
+    raise ValueError(f"Devise non prise en charge : {currency}")
+
+
+def round_to_currency(amount: Decimal, currency: Union[str, Currency]) -> Decimal:
+  """Arrondit un montant à la plus petite unité de la devise (arrondi commercial)"""
+  return amount.quantize(get_currency(currency).quantum, rounding=ROUND_HALF_UP)
+
+
+def to_minor_units(amount: Decimal, currency: Union[str, Currency]) -> int:
+  """Montant en unités mineures de la devise (centimes pour l'euro, yens pour le yen)"""
+  currency = get_currency(currency)
+  return int(round_to_currency(amount, currency).scaleb(currency.minor_units))
+
+
+@lru_cache(maxsize=None)
+def money_formatter(locale: str) -> Callable[[Decimal, Currency], str]:
+  """
+  Formateur de montants compilé pour une langue (mis en cache)
+
+  Les séparateurs sont appliqués par une table de traduction construite une
+  fois, plutôt que par des remplacements successifs à chaque montant.
+  """
+  try:
+    group, decimal, symbol_first = LOCALE_CONVENTIONS[locale]
+  except KeyError:
+    raise ValueError(f"Langue non prise en charge : {locale}")
+  separators = str.maketrans({",": group, ".": decimal})
+
+  def format_amount(amount: Decimal, currency: Currency) -> str:
+    digits = f"{abs(round_to_currency(amount, currency)):,.{currency.minor_units}f}".translate(separators)
+    sign = "-" if amount < 0 else ""
+    if not symbol_first:
+      return f"{sign}{digits} {currency.symbol}"
+    # Symbole alphabétique (CHF) séparé du montant, symbole typographique accolé ($)
+    space = " " if currency.symbol[-1].isalpha() else ""
+    return f"{sign}{currency.symbol}{space}{digits}"
+
+  return format_amount
+
+
+def format_rate(rate: Decimal, locale: str = "fr_FR") -> str:
+  """Affiche un taux (0.055 -> '5,5 %' en français, '5.5%' en anglais)"""
+  _, decimal, _ = LOCALE_CONVENTIONS[locale]
+  digits = f"{(rate * 100).normalize():f}".replace(".", decimal)
+  return f"{digits}%" if locale.startswith("en") else f"{digits}\u00a0%"
+
+
+def format_money(amount: Decimal, currency: Union[str, Currency] = "EUR", locale: str = "fr_FR") -> str:
+  """Affiche un montant dans une devise selon les conventions d'une langue"""
+  return money_formatter(locale)(amount, get_currency(currency))
+
+
+@dataclass(frozen=True)
+class ExchangeRates:
+  """Taux de change d'une date : 1 unité de la devise de base vaut rates[code] unités de code"""
+  base: str
+  rates: Dict[str, Decimal] = field(default_factory=dict)
+  date: str = ""
+
+  def rate(self, source: str, target: str) -> Decimal:
+    """Taux de conversion de source vers target"""
+    rates = {**self.rates, self.base: Decimal("1")}
+    try:
+      return rates[target.upper()] / rates[source.upper()]
+    except KeyError as e:
+      raise ValueError(f"Taux de change inconnu pour {e.args[0]} (table du {self.date or '?'})")
+
+  def convert(self, amount: Decimal, source: str, target: str) -> Decimal:
+    """Convertit un montant (non arrondi) de source vers target"""
+    return amount if source.upper() == target.upper() else amount * self.rate(source, target)
+
+
+@lru_cache(maxsize=None)
+def load_exchange_rates(path: str = DEFAULT_EXCHANGE_RATES_PATH) -> ExchangeRates:
+  """
+  Charge une table de taux de change JSON (une seule lecture par fichier et par processus)
+
+  Format : {"base": "EUR", "date": "2024-01-15", "rates": {"USD": "1.0945", ...}}
+  """
+  with open(path, encoding="utf-8") as f:
+    data = json.load(f)
+  return ExchangeRates(
+    base=data["base"].upper(),
+    rates={code.upper(): Decimal(str(rate)) for code, rate in data["rates"].items()},
+    date=data.get("date", "")
+  )
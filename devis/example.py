@@ -304,7 +304,7 @@ def create_demo_invoice():
     pdf_path = template.generate_pdf("devis_demo_ecommerce.pdf")
     print(f"✅ Devis de démonstration généré : {pdf_path}")
     print(f"📊 Nombre de groupes de tâches : {len([design_group, frontend_group, backend_group, advanced_group, deployment_group])}")
-    print(f"💰 Montant total du projet : {sum(group.subtotal for group in [design_group, frontend_group, backend_group, advanced_group, deployment_group]):.2f}€ HT")
+    print(f"💰 Montant total du projet : {template.totals.total_ht:.2f}€ HT ({template.totals.total_ttc:.2f}€ TTC)")
     return pdf_path
   except Exception as e:
     print(f"❌ Erreur lors de la génération du devis : {e}")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registre des polices du processus : polices TrueType enregistrées une seule fois
+
+ReportLab n'intègre au PDF que les glyphes utilisés d'une police TrueType
+(sous-ensemble), si bien qu'une police complète ne coûte que quelques Ko par
+document. Les caractères absents de la police d'un texte (emoji, symboles)
+sont dessinés avec une police de secours qui les contient, ou omis plutôt
+qu'affichés comme glyphes manquants (avec un avertissement).
+
+Utilisation:
+  fonts = FONT_REGISTRY.register_family(
+    "DejaVuSerif", find_font("DejaVuSerif.ttf"), bold=find_font("DejaVuSerif-Bold.ttf")
+  )
+  FONT_REGISTRY.add_fallback("DejaVuSans", find_font("DejaVuSans.ttf"))
+  template.set_theme(ModernInvoiceTemplate.default_theme().with_fonts(fonts))
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Iterator
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.fonts import addMapping
+
+# Dossiers parcourus par find_font
+FONT_DIRS = [
+  os.path.expanduser("~/.fonts"),
+  "/usr/share/fonts",
+  "/usr/local/share/fonts",
+  "/Library/Fonts",
+  "C:\\Windows\\Fonts",
+]
+
+# Polices standard du PDF (non intégrées) : caractères de l'encodage WinAnsi uniquement
+STANDARD_FONT_ENCODING = "cp1252"
+
+
+@dataclass(frozen=True)
+class FontFamily:
+  """Polices d'une famille (normal, gras, italique) et fichiers TrueType à enregistrer"""
+  regular: str
+  bold: str
+  italic: str
+  bold_italic: str
+  files: Tuple[Tuple[str, str], ...] = ()  # (nom de police, chemin du .ttf), vide pour les polices standard
+
+
+# Polices standard utilisées par défaut
+BASE_FONTS = FontFamily("Times-Roman", "Times-Bold", "Times-Italic", "Times-BoldItalic")
+
+
+def find_font(filename: str, dirs: Optional[List[str]] = None) -> str:
+  """Cherche un fichier de police dans les dossiers usuels du système"""
+  for directory in dirs or FONT_DIRS:
+    for root, _, files in os.walk(directory):
+      if filename in files:
+        return os.path.join(root, filename)
+  raise FileNotFoundError(f"Police introuvable : {filename}")
+
+
+class FontRegistry:
+  """
+  Polices TrueType du processus, enregistrées une seule fois auprès de ReportLab
+
+  Thread-safe. Une FontFamily ne contient que des noms et des chemins : elle peut
+  être transmise à d'autres processus, qui enregistrent les fichiers à la
+  première utilisation (ensure).
+  """
+
+  def __init__(self):
+    self._lock = threading.RLock()
+    self._registered = set()
+    self._coverage: Dict[str, frozenset] = {}
+    self.fallbacks: List[str] = []  # Polices essayées pour les caractères absents
+    self._dropped_warned = set()  # Caractères omis déjà signalés
+
+  def _register_font(self, name: str, path: str):
+    if name not in self._registered:
+      pdfmetrics.registerFont(TTFont(name, path))
+      self._registered.add(name)
+
+  def ensure(self, family: FontFamily) -> FontFamily:
+    """Enregistre les fichiers de la famille s'ils ne le sont pas encore dans ce processus"""
+    if not family.files or all(name in self._registered for name, _ in family.files):
+      return family
+    with self._lock:
+      for name, path in family.files:
+        self._register_font(name, path)
+      # Balises <b> et <i> des Paragraph
+      for bold, italic, name in ((0, 0, family.regular), (1, 0, family.bold), (0, 1, family.italic), (1, 1, family.bold_italic)):
+        addMapping(family.regular, bold, italic, name)
+    return family
+
+  def register_family(self, name: str, regular: str, bold: Optional[str] = None,
+                      italic: Optional[str] = None, bold_italic: Optional[str] = None) -> FontFamily:
+    """
+    Enregistre une famille TrueType (les styles absents reprennent le normal ou le gras)
+
+    Returns:
+      FontFamily à passer à Theme.with_fonts
+    """
+    paths = {"": regular, "-Bold": bold or regular, "-Italic": italic or regular, "-BoldItalic": bold_italic or bold or regular}
+    files = tuple((f"{name}{suffix}", path) for suffix, path in paths.items())
+    return self.ensure(FontFamily(*(font_name for font_name, _ in files), files=files))
+
+  def add_fallback(self, name: str, path: str):
+    """Ajoute une police de secours pour les caractères absents des polices du texte"""
+    with self._lock:
+      self._register_font(name, path)
+      if name not in self.fallbacks:
+        self.fallbacks.append(name)
+
+  def coverage(self, font_name: str) -> Optional[frozenset]:
+    """Caractères disponibles dans une police (None : police standard, encodage WinAnsi)"""
+    if font_name not in self._coverage:
+      font = pdfmetrics.getFont(font_name)
+      face = getattr(font, "face", None)
+      char_to_glyph = getattr(face, "charToGlyph", None)
+      self._coverage[font_name] = frozenset(map(chr, char_to_glyph)) if char_to_glyph is not None else None
+    return self._coverage[font_name]
+
+  def covers(self, font_name: str, text: str) -> bool:
+    """Indique si une police contient tous les caractères d'un texte (vérification rapide)"""
+    coverage = self.coverage(font_name)
+    if coverage is not None:
+      return coverage.issuperset(text)
+    try:
+      text.encode(STANDARD_FONT_ENCODING)
+      return True
+    except UnicodeEncodeError:
+      return False
+
+  def supports(self, font_name: str, char: str) -> bool:
+    """Indique si une police contient le glyphe d'un caractère"""
+    return char.isspace() or self.covers(font_name, char)
+
+  def _runs(self, text: str, font_name: str) -> Iterator[Tuple[Optional[str], str]]:
+    """
+    Découpe un texte en suites de caractères dessinés avec la même police (None : omis)
+
+    L'espace qui suit un caractère omis l'est aussi ("◆ PROJET" devient "PROJET").
+    """
+    current, run, dropped = font_name, [], False
+    for char in text:
+      if dropped and char.isspace():
+        font = None
+      elif self.supports(font_name, char):
+        font = font_name
+      else:
+        font = next((fallback for fallback in self.fallbacks if self.supports(fallback, char)), None)
+      dropped = font is None
+      if font != current and run:
+        yield current, "".join(run)
+        run = []
+      current = font
+      run.append(char)
+    if run:
+      yield current, "".join(run)
+
+  def apply_fallbacks(self, frags: list) -> list:
+    """
+    Fragments de Paragraph dont les caractères absents de la police passent par
+    une police de secours, ou sont omis si aucune ne les contient
+    """
+    result = []
+    dropped = set()
+    for frag in frags:
+      text = getattr(frag, "text", "")
+      if not text or self.covers(frag.fontName, text) or all(self.supports(frag.fontName, char) for char in text):
+        result.append(frag)
+        continue
+      for font, run in self._runs(text, frag.fontName):
+        if font is not None:
+          result.append(frag.clone(text=run, fontName=font))
+        else:
+          dropped.update(char for char in run if not char.isspace())
+    if dropped:
+      self._warn_dropped(dropped)
+    return result
+
+  def _warn_dropped(self, chars: set):
+    """Signale une seule fois par processus chaque caractère omis faute de police"""
+    with self._lock:
+      new = chars - self._dropped_warned
+      self._dropped_warned.update(new)
+    if new:
+      print(f"⚠️ Caractères absents des polices, omis : {' '.join(sorted(new))} (police de secours : FONT_REGISTRY.add_fallback)")
+
+
+# Registre partagé par tous les devis du processus
+FONT_REGISTRY = FontRegistry()
@@ -7,49 +7,521 @@ Design ultra-professionnel avec attention aux détails
 """
 
 import os
+import re
+import json
+import hashlib
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from contextlib import nullcontext
+from time import perf_counter
 from datetime import datetime
-from typing import List, Optional, Any
-from dataclasses import dataclass
-from decimal import Decimal
+from typing import List, Optional, Any, BinaryIO, Union, Tuple, Iterable, Callable, Set
+from dataclasses import dataclass, field, replace, asdict
+from decimal import Decimal, ROUND_HALF_UP
 from dotenv import load_dotenv
 
 import stripe
 import qrcode
+from PIL import Image as PILImage
+
+from payment_links import PaymentLinkRegistry
+from profiling import RenderReport
+from fonts import FontFamily, BASE_FONTS, FONT_REGISTRY
+from currency import Currency, get_currency, money_formatter, format_rate, to_minor_units, load_exchange_rates, ExchangeRates
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import mm
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, StyleSheet1
+from reportlab.lib.units import mm, inch
+from reportlab.lib.utils import ImageReader
 from reportlab.platypus import (
   Paragraph, Spacer, Table, TableStyle, 
-  KeepTogether, Image, PageTemplate, BaseDocTemplate, Frame
+  KeepTogether, Image, PageTemplate, BaseDocTemplate, Frame,
+  Flowable, NextPageTemplate, PageBreak
 )
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_JUSTIFY
+from reportlab.graphics.shapes import Drawing
+from reportlab.platypus.paragraph import cleanBlockQuotedText, textTransformFrags
+from reportlab.platypus.paraparser import ParaParser
+from xml.sax.saxutils import escape
+from reportlab.graphics.barcode.qr import QrCodeWidget
 
 load_dotenv()
 
-@dataclass
+
+def _read_asset(path: str) -> bytes:
+  """Lit un fichier image une seule fois par version du fichier (logo partagé entre devis)"""
+  stat = os.stat(path)
+  return _read_asset_version(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=32)
+def _read_asset_version(path: str, mtime_ns: int, size: int) -> bytes:
+  # Date et taille dans la clé : un fichier remplacé est relu
+  with open(path, 'rb') as f:
+    return f.read()
+
+
+class MemoryImage(Image):
+  """Image ReportLab construite depuis une image PIL en mémoire, sans fichier temporaire"""
+  
+  def __init__(self, pil_image, width=None, height=None, hAlign='CENTER'):
+    # L'ImageReader est fourni d'avance : le flux passé à Image n'est jamais lu
+    self._img = ImageReader(pil_image)
+    Image.__init__(self, BytesIO(), width=width, height=height, hAlign=hAlign)
+
+
+class QRCodeCache:
+  """
+  Cache des QR codes adressé par contenu : (url, couleurs, niveau de correction)
+  
+  Les images matricielles sont gardées en mémoire et, si un dossier est fourni,
+  également stockées sur disque pour être partagées entre exécutions. Les QR
+  codes vectoriels (rectangles ReportLab) sont gardés en mémoire.
+  """
+  
+  def __init__(self, directory: Optional[str] = None, maxsize: int = 256):
+    self.directory = directory
+    self.maxsize = maxsize
+    self._entries: OrderedDict = OrderedDict()
+    self._lock = threading.Lock()
+  
+  @staticmethod
+  def key(url: str, fill_color: str, back_color: str, error_correction: str) -> str:
+    return hashlib.sha256(f"{url}|{fill_color}|{back_color}|{error_correction}".encode()).hexdigest()
+  
+  def _get(self, key: str):
+    with self._lock:
+      if key in self._entries:
+        self._entries.move_to_end(key)
+        return self._entries[key]
+    return None
+  
+  def _put(self, key: str, value):
+    with self._lock:
+      self._entries[key] = value
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+    return value
+  
+  def get_image(self, url: str, fill_color: str, back_color: str = "#ffffff", error_correction: str = "M"):
+    """Retourne l'image PIL du QR code (générée au premier appel)"""
+    key = self.key(url, fill_color, back_color, error_correction)
+    image = self._get(key)
+    if image is not None:
+      return image
+    
+    path = os.path.join(self.directory, f"qr_{key}.png") if self.directory else None
+    if path and os.path.exists(path):
+      with PILImage.open(path) as stored:
+        return self._put(key, stored.copy())
+    
+    # Configuration du QR code avec style sophistiqué
+    qr = qrcode.QRCode(
+      version=1,
+      error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{error_correction}"),
+      box_size=10,
+      border=4,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    
+    # Création de l'image avec les couleurs de marque
+    image = qr.make_image(fill_color=fill_color, back_color=back_color).get_image()
+    
+    if path:
+      os.makedirs(self.directory, exist_ok=True)
+      tmp_path = f"{path}.{os.getpid()}.tmp"
+      image.save(tmp_path, format="PNG")
+      os.replace(tmp_path, path)
+    return self._put(key, image)
+  
+  def get_vector(self, url: str, fill_color: str, back_color: str = "#ffffff", error_correction: str = "M"):
+    """Retourne les rectangles vectoriels du QR code et leurs dimensions"""
+    key = "vector-" + self.key(url, fill_color, back_color, error_correction)
+    vector = self._get(key)
+    if vector is not None:
+      return vector
+    
+    widget = QrCodeWidget(url, barLevel=error_correction, barBorder=4)
+    widget.barFillColor = colors.HexColor(fill_color)
+    x1, y1, x2, y2 = widget.getBounds()
+    return self._put(key, (widget.draw(), x2 - x1, y2 - y1))
+
+
+# Cache partagé par défaut (mémoire uniquement ; définir QR_CODE_CACHE.directory pour le disque)
+QR_CODE_CACHE = QRCodeCache()
+
+
+class AssetCache:
+  """
+  Cache des images (logos) prêtes à être intégrées au PDF
+
+  Chaque image est lue une seule fois par processus, réduite à sa taille
+  d'impression pour la résolution cible, aplatie sur la couleur de fond puis
+  compressée en JPEG. ReportLab intègre alors ces quelques Ko tels quels au
+  lieu de décoder et recompresser l'image source dans chaque document.
+  """
+  
+  def __init__(self, dpi: int = 200, quality: int = 90, maxsize: int = 32):
+    self.dpi = dpi
+    self.quality = quality
+    self.maxsize = maxsize
+    self._entries: OrderedDict = OrderedDict()
+    self._lock = threading.Lock()
+  
+  def get_image(self, path: str, width: float, height: float, background: str = "#ffffff") -> bytes:
+    """
+    Retourne le JPEG de l'image réduite à width x height points (préparé au premier appel)
+
+    Args:
+      path: Chemin de l'image source
+      width, height: Taille d'impression en points
+      background: Couleur sur laquelle la transparence est aplatie (fond de l'encadré)
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, width, height, background, self.dpi, self.quality)
+    with self._lock:
+      if key in self._entries:
+        self._entries.move_to_end(key)
+        return self._entries[key]
+    
+    with PILImage.open(path) as source:
+      image = source.convert("RGBA")
+    # Taille en pixels à la résolution cible, sans jamais agrandir l'image source
+    size = (
+      min(image.width, max(1, round(width / inch * self.dpi))),
+      min(image.height, max(1, round(height / inch * self.dpi)))
+    )
+    if size != image.size:
+      image = image.resize(size, PILImage.LANCZOS)
+    flattened = PILImage.new("RGB", image.size, background)
+    flattened.paste(image, mask=image.getchannel("A"))
+    buffer = BytesIO()
+    flattened.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+    
+    with self._lock:
+      self._entries[key] = buffer.getvalue()
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+    return buffer.getvalue()
+
+
+# Cache partagé par défaut entre tous les devis du processus
+ASSET_CACHE = AssetCache()
+
+
+class ChromeCache:
+  """
+  Cache des éléments fixes d'une entreprise (en-tête, mentions légales)
+
+  Ces éléments ne dépendent que de l'entreprise, du logo et du thème : ils sont
+  construits et mis en page une fois, puis réutilisés par tous les devis de
+  cette entreprise rendus dans le processus. Un même élément ne doit pas être
+  mis en page par plusieurs threads à la fois (rendu en processus séparés).
+  """
+  
+  def __init__(self, maxsize: int = 64):
+    self.maxsize = maxsize
+    self._entries: OrderedDict = OrderedDict()
+    self._lock = threading.Lock()
+  
+  def get(self, key: tuple, build):
+    """Retourne l'élément associé à key, construit par build() au premier appel"""
+    with self._lock:
+      if key in self._entries:
+        self._entries.move_to_end(key)
+        return self._entries[key]
+    value = build()
+    with self._lock:
+      self._entries[key] = value
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+    return value
+
+
+# Cache partagé par défaut entre tous les devis du processus
+CHROME_CACHE = ChromeCache()
+
+# Appels Stripe exécutés en arrière-plan pendant la construction des devis (threads créés à la demande)
+STRIPE_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="devis-stripe")
+
+
+def escape_markup(value) -> str:
+  """Échappe une valeur insérée dans le balisage d'un Paragraph (texte ou attribut)"""
+  return escape(str(value), {'"': "&quot;"})
+
+
+# Champs {nom} du balisage et jetons qui les remplacent pendant l'analyse
+_MARKUP_FIELD = re.compile(r"\{(\w+)\}")
+_MARKUP_TOKEN = re.compile("\ue000(\\w+)\ue001")
+
+
+class MarkupTemplate:
+  """
+  Balisage de Paragraph analysé une seule fois
+
+  Les champs {nom} (uniquement dans le texte, pas dans les attributs) sont
+  remplacés après l'analyse par les valeurs passées à fill() : elles sont
+  insérées telles quelles dans les fragments, sans passer par le parseur XML,
+  si bien qu'un nom contenant & ou < s'affiche correctement.
+  """
+  
+  def __init__(self, markup: str, style: ParagraphStyle):
+    parser = ParaParser()
+    tokenized = _MARKUP_FIELD.sub(lambda match: f"\ue000{match.group(1)}\ue001", markup)
+    self.style, self.frags, _ = parser.parse(cleanBlockQuotedText(tokenized), style)
+    if self.frags is None:
+      raise ValueError(f"Balisage invalide : {parser.errors[0]}")
+    self.markup = markup
+  
+  def fill(self, **values) -> Paragraph:
+    """Crée le Paragraph avec les valeurs des champs"""
+    def value(match):
+      return str(values[match.group(1)])
+    
+    # Fragments copiés : ReportLab peut les modifier lors de la mise en page
+    frags = [
+      frag.clone(text=_MARKUP_TOKEN.sub(value, frag.text) if "\ue000" in frag.text else frag.text)
+      for frag in self.frags
+    ]
+    # Emoji et symboles absents de la police (y compris dans les valeurs) : police de secours ou caractère omis
+    frags = FONT_REGISTRY.apply_fallbacks(frags)
+    textTransformFrags(frags, self.style)
+    return Paragraph(self.markup, self.style, frags=frags)
+
+
+def fallback_paragraph(markup: str, style: ParagraphStyle) -> Paragraph:
+  """Paragraph d'un texte libre (notes, description) avec polices de secours, comme MarkupTemplate.fill"""
+  style, frags, _ = ParaParser().parse(cleanBlockQuotedText(markup), style)
+  if frags is None:
+    return Paragraph(markup, style)  # Balisage invalide : erreur habituelle de ReportLab
+  frags = FONT_REGISTRY.apply_fallbacks(frags)
+  textTransformFrags(frags, style)
+  return Paragraph(markup, style, frags=frags)
+
+
+def fallback_cell(text: str, style: ParagraphStyle) -> Union[str, Paragraph]:
+  """
+  Texte d'une cellule de tableau : inchangé si la police du style contient tous
+  ses caractères, sinon Paragraph avec polices de secours (voir fallback_paragraph)
+  """
+  if FONT_REGISTRY.covers(style.fontName, text):
+    return text
+  return fallback_paragraph(escape_markup(text), style)
+
+
+@lru_cache(maxsize=256)
+def markup_template(markup: str, style: ParagraphStyle) -> MarkupTemplate:
+  """Balisage compilé, partagé par tous les devis utilisant le même squelette et le même style"""
+  return MarkupTemplate(markup, style)
+
+
+# Règles d'arrondi des montants au centime
+ROUNDING_PER_LINE = "line"  # Chaque ligne est arrondie, les totaux sont la somme des lignes arrondies
+ROUNDING_PER_TOTAL = "total"  # Les lignes sont sommées exactement, seuls les totaux sont arrondis
+CENT = Decimal("0.01")
+
+
+def _to_decimal(value) -> Decimal:
+  """Convertit une quantité ou un prix en Decimal (les float passent par leur représentation décimale)"""
+  return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def round_amount(amount: Decimal, quantum: Decimal = CENT) -> Decimal:
+  """Arrondit un montant au centime, ou à l'unité mineure donnée (arrondi commercial)"""
+  return amount.quantize(quantum, rounding=ROUND_HALF_UP)
+
+
+def format_quantity(quantity: Decimal) -> str:
+  """Affiche une quantité sans zéros superflus (3, 2.5, 100)"""
+  return f"{quantity.normalize():f}"
+
+
+@dataclass(frozen=True, slots=True)
 class InvoiceItem:
-  """Item d'un devis avec description, quantité, prix unitaire"""
+  """Item d'un devis avec description, quantité, prix unitaire (total exact calculé à la création)"""
   description: str
-  quantity: float
+  quantity: Decimal
   unit_price: Decimal
   unit: str = "unité"
+  vat_rate: Optional[Decimal] = None  # Taux propre à la ligne (0.055, 0.10...), taux du devis si None
+  total_price: Decimal = field(init=False, repr=False, compare=False)
   
-  @property
-  def total_price(self) -> Decimal:
-    return Decimal(str(self.quantity)) * self.unit_price
+  def __post_init__(self):
+    object.__setattr__(self, "quantity", _to_decimal(self.quantity))
+    object.__setattr__(self, "unit_price", _to_decimal(self.unit_price))
+    if self.vat_rate is not None:
+      object.__setattr__(self, "vat_rate", _to_decimal(self.vat_rate))
+    object.__setattr__(self, "total_price", self.quantity * self.unit_price)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ItemGroup:
-  """Groupe d'items avec sous-total"""
+  """Groupe d'items avec sous-total exact (calculé à la création)"""
   title: str
-  items: List[InvoiceItem]
+  items: Tuple[InvoiceItem, ...]
+  subtotal: Decimal = field(init=False, repr=False, compare=False)
+  
+  def __post_init__(self):
+    object.__setattr__(self, "items", tuple(self.items))
+    object.__setattr__(self, "subtotal", sum((item.total_price for item in self.items), Decimal("0")))
+
+
+@dataclass(frozen=True, slots=True)
+class VatLine:
+  """Ligne du récapitulatif TVA : base HT et TVA d'un taux"""
+  rate: Decimal
+  base: Decimal
+  amount: Decimal
+
+
+@dataclass(frozen=True, slots=True)
+class QuoteTotals:
+  """Montants d'un devis arrondis à l'unité mineure de sa devise selon la règle d'arrondi"""
+  line_totals: Tuple[Tuple[Decimal, ...], ...]  # Par groupe puis par item
+  subtotals: Tuple[Decimal, ...]
+  total_ht: Decimal
+  vat_rate: Decimal
+  vat_amount: Decimal
+  total_ttc: Decimal
+  rounding: str
+  unit_prices: Tuple[Tuple[Decimal, ...], ...] = ()  # Prix unitaires dans la devise du devis
+  line_vat_rates: Tuple[Tuple[Decimal, ...], ...] = ()
+  vat_breakdown: Tuple[VatLine, ...] = ()  # Par taux croissant, vide sans TVA
+  
+  @classmethod
+  def compute(cls, item_groups: Iterable[ItemGroup], vat_rate: Optional[Decimal] = Decimal("0"), rounding: str = ROUNDING_PER_LINE,
+              exchange_rate: Decimal = Decimal("1"), quantum: Decimal = CENT) -> "QuoteTotals":
+    """
+    Args:
+      vat_rate: Taux par défaut des lignes sans taux propre ; None si la TVA ne s'applique pas
+        (les taux des lignes sont alors ignorés)
+      exchange_rate: Conversion des prix unitaires vers la devise du devis (arrondis à quantum)
+      quantum: Unité mineure de la devise du devis
+    """
+    if rounding not in (ROUNDING_PER_LINE, ROUNDING_PER_TOTAL):
+      raise ValueError(f"Règle d'arrondi inconnue : {rounding}")
+    item_groups = tuple(item_groups)
+    
+    if exchange_rate == 1:
+      unit_prices = tuple(tuple(item.unit_price for item in group.items) for group in item_groups)
+      exact_lines = tuple(tuple(item.total_price for item in group.items) for group in item_groups)
+    else:
+      unit_prices = tuple(tuple(round_amount(item.unit_price * exchange_rate, quantum) for item in group.items) for group in item_groups)
+      exact_lines = tuple(
+        tuple(item.quantity * price for item, price in zip(group.items, prices))
+        for group, prices in zip(item_groups, unit_prices)
+      )
+    line_totals = tuple(tuple(round_amount(line, quantum) for line in lines) for lines in exact_lines)
+    
+    zero = Decimal("0")
+    if rounding == ROUNDING_PER_LINE:
+      subtotals = tuple(sum(lines, zero) for lines in line_totals)
+      total_ht = sum(subtotals, zero)
+    else:
+      subtotals = tuple(round_amount(sum(lines, zero), quantum) for lines in exact_lines)
+      total_ht = round_amount(sum((sum(lines, zero) for lines in exact_lines), zero), quantum)
+    
+    # Bases par taux : somme des lignes arrondies, ou somme exacte arrondie une fois
+    line_vat_rates = tuple(
+      tuple(zero if vat_rate is None else item.vat_rate if item.vat_rate is not None else vat_rate for item in group.items)
+      for group in item_groups
+    )
+    bases = {}
+    lines = line_totals if rounding == ROUNDING_PER_LINE else exact_lines
+    for rates, amounts in zip(line_vat_rates, lines):
+      for rate, amount in zip(rates, amounts):
+        bases[rate] = bases.get(rate, zero) + amount
+    vat_breakdown = () if vat_rate is None else tuple(
+      VatLine(rate, round_amount(base, quantum), round_amount(round_amount(base, quantum) * rate, quantum))
+      for rate, base in sorted(bases.items())
+    )
+    
+    vat_amount = sum((line.amount for line in vat_breakdown), zero)
+    return cls(
+      line_totals, subtotals, total_ht, vat_rate or zero, vat_amount, total_ht + vat_amount, rounding,
+      unit_prices=unit_prices, line_vat_rates=line_vat_rates, vat_breakdown=vat_breakdown
+    )
+
+
+# Libellés des périodes de facturation des formules récurrentes (en mois)
+PERIOD_LABELS = {1: "mois", 3: "trimestre", 6: "semestre", 12: "an"}
+
+
+@dataclass(frozen=True, slots=True)
+class RecurringPlan:
+  """Formule récurrente (maintenance, support) facturée par période d'engagement"""
+  name: str
+  monthly_price: Decimal
+  months: int = 1  # Durée d'engagement, payée d'avance au-delà d'un mois
+  total: Decimal = field(init=False, repr=False, compare=False)
+  
+  def __post_init__(self):
+    object.__setattr__(self, "monthly_price", _to_decimal(self.monthly_price))
+    object.__setattr__(self, "total", self.monthly_price * self.months)
+  
+  @property
+  def commitment(self) -> str:
+    return "1 mois" if self.months == 1 else f"{self.months} mois payés d'avance"
   
   @property
-  def subtotal(self) -> Decimal:
-    return sum(item.total_price for item in self.items)
+  def period(self) -> str:
+    return PERIOD_LABELS.get(self.months, f"{self.months} mois")
+  
+  def monthly_savings(self, reference: "RecurringPlan") -> Decimal:
+    """Économie mensuelle par rapport à une formule de référence (la plus chère au mois)"""
+    return max(reference.monthly_price - self.monthly_price, Decimal("0"))
+  
+  def savings_rate(self, reference: "RecurringPlan") -> Decimal:
+    """Part économisée par rapport à la formule de référence (0.29 pour 29 %)"""
+    if not reference.monthly_price:
+      return Decimal("0")
+    return self.monthly_savings(reference) / reference.monthly_price
+
+
+# Formules de maintenance proposées par défaut
+DEFAULT_RECURRING_PLANS = (
+  RecurringPlan("Maintenance Essentielle", Decimal("450.00"), 1),
+  RecurringPlan("Maintenance Premium", Decimal("320.00"), 6),
+  RecurringPlan("Maintenance Enterprise", Decimal("280.00"), 12),
+)
+
+
+# Taux de TVA appliqué aux sociétés soumises à TVA
+STANDARD_VAT_RATE = Decimal("0.20")
+
+# Types de document
+DOCUMENT_QUOTE = "quote"
+DOCUMENT_INVOICE = "invoice"
+DOCUMENT_CREDIT_NOTE = "credit_note"
+
+
+@dataclass(frozen=True)
+class DocumentKind:
+  """Libellés d'un type de document"""
+  name: str  # Métadonnées et signets du PDF
+  title: str  # Titre par défaut
+  pdf_title: str  # Titre des propriétés du PDF
+  margin_label: str  # Texte en marge
+  number_label: str  # Libellé du numéro
+
+
+DOCUMENT_KINDS = {
+  DOCUMENT_QUOTE: DocumentKind("Devis", "DEVIS PROFESSIONNEL", "Devis Professionnel", "DEVIS", "N° de devis"),
+  DOCUMENT_INVOICE: DocumentKind("Facture", "FACTURE", "Facture", "FACTURE", "N° de facture"),
+  DOCUMENT_CREDIT_NOTE: DocumentKind("Avoir", "AVOIR", "Avoir", "AVOIR", "N° d'avoir"),
+}
+
+# Version de la mise en page, incluse dans l'empreinte des devis : à incrémenter
+# lorsque le rendu change pour que le mode incrémental régénère les PDF existants
+RENDER_VERSION = 2
+
+# Préfixe de l'empreinte stockée dans les mots-clés du PDF
+CONTENT_HASH_PREFIX = "devis-hash:"
 
 
 @dataclass
@@ -87,13 +559,242 @@ class ProjectInfo:
   description: str = ""
 
 
+@dataclass(frozen=True)
+class Theme:
+  """
+  Thème graphique immuable (couleurs et styles) partagé par les templates
+  
+  Les styles et les styles de tableaux fixes sont construits une seule fois par
+  palette de couleurs puis partagés : ils ne doivent pas être modifiés.
+  
+  Utilisation:
+    theme = Theme().with_colors(primary_color=colors.HexColor("#a900d4"))
+    template = ModernInvoiceTemplate(theme=theme)
+  """
+  primary_color: colors.Color = colors.Color(25/255, 55/255, 109/255)  # Bleu marine professionnel #19376D
+  secondary_color: colors.Color = colors.Color(248/255, 249/255, 252/255)  # Gris très clair #F8F9FC
+  accent_color: colors.Color = colors.Color(15/255, 35/255, 70/255)  # Bleu foncé #0F2346
+  gradient_start: colors.Color = colors.Color(100/255, 130/255, 180/255)  # Bleu moyen pour gradients #6482B4
+  gradient_end: colors.Color = colors.Color(245/255, 247/255, 250/255)  # Gris très clair #F5F7FA
+  grey_light: colors.Color = colors.Color(0.96, 0.97, 0.98)  # Gris clair
+  grey_medium: colors.Color = colors.Color(0.55, 0.60, 0.65)  # Gris moyen
+  grey_dark: colors.Color = colors.Color(0.15, 0.20, 0.25)  # Gris foncé
+  white: colors.Color = colors.white
+  black: colors.Color = colors.black
+  separator_color: colors.Color = colors.Color(200/255, 210/255, 220/255)  # Gris-bleu clair #C8D2DC
+  fonts: FontFamily = BASE_FONTS  # Polices du texte (voir fonts.FONT_REGISTRY)
+  margin_font: str = "Helvetica"  # Police du texte en marge
+  
+  def with_colors(self, **changes) -> "Theme":
+    """Retourne une copie du thème avec les couleurs modifiées"""
+    return replace(self, **changes)
+  
+  def with_fonts(self, fonts: FontFamily, margin_font: Optional[str] = None) -> "Theme":
+    """Retourne une copie du thème utilisant une famille de polices (TrueType enregistrée ou standard)"""
+    return replace(self, fonts=fonts, margin_font=margin_font or fonts.regular)
+  
+  @property
+  def styles(self) -> StyleSheet1:
+    """Feuille de styles du thème (construite une fois par palette)"""
+    return _build_theme_styles(self)
+  
+  @property
+  def separator_style(self) -> TableStyle:
+    """Style de la ligne de séparation élégante"""
+    return _build_separator_style(self)
+  
+  @property
+  def items_table_base_style(self) -> tuple:
+    """Commandes de style fixes du tableau des items (en-tête, polices, bordures)"""
+    return _build_items_table_base_style(self)
+
+
+@lru_cache(maxsize=None)
+def _build_theme_styles(theme: Theme) -> StyleSheet1:
+  """Configure les styles personnalisés ultra-sophistiqués"""
+  FONT_REGISTRY.ensure(theme.fonts)
+  styles = getSampleStyleSheet()
+  
+  # Style pour le titre principal (plus imposant)
+  styles.add(ParagraphStyle(
+    name='UltraTitle',
+    parent=styles['Title'],
+    fontSize=32,
+    textColor=theme.primary_color,
+    spaceAfter=15,
+    fontName=theme.fonts.bold,
+    alignment=TA_LEFT,
+    leading=36
+  ))
+  
+  # Style pour les titres de projet
+  styles.add(ParagraphStyle(
+    name='ProjectTitle',
+    parent=styles['Heading1'],
+    fontSize=18,
+    textColor=theme.accent_color,
+    spaceAfter=10,
+    spaceBefore=10,
+    fontName=theme.fonts.bold,
+    alignment=TA_LEFT,
+    leading=22
+  ))
+  
+  # Style pour les sous-titres élégants
+  styles.add(ParagraphStyle(
+    name='ElegantSubtitle',
+    parent=styles['Heading2'],
+    fontSize=13,
+    textColor=theme.accent_color,
+    spaceAfter=8,
+    spaceBefore=15,
+    fontName=theme.fonts.bold,
+    alignment=TA_LEFT,
+    borderPadding=5,
+    leftIndent=5
+  ))
+  
+  # Style pour le texte sophistiqué
+  styles.add(ParagraphStyle(
+    name='SophisticatedNormal',
+    parent=styles['Normal'],
+    fontSize=10,
+    textColor=theme.grey_dark,
+    spaceAfter=6,
+    fontName=theme.fonts.regular,
+    leading=15,
+    alignment=TA_JUSTIFY
+  ))
+  
+  # Style pour les informations VIP
+  styles.add(ParagraphStyle(
+    name='VIPInfo',
+    parent=styles['Normal'],
+    fontSize=11,
+    textColor=theme.black,
+    fontName=theme.fonts.bold,
+    spaceAfter=8,
+    leading=16
+  ))
+  
+  # Style pour les totaux premium
+  styles.add(ParagraphStyle(
+    name='PremiumTotal',
+    parent=styles['Normal'],
+    fontSize=14,
+    textColor=theme.primary_color,
+    fontName=theme.fonts.bold,
+    alignment=TA_RIGHT,
+    spaceAfter=10
+  ))
+  
+  # Style pour les encadrés
+  styles.add(ParagraphStyle(
+    name='BoxedContent',
+    parent=styles['Normal'],
+    fontSize=9,
+    textColor=theme.grey_dark,
+    fontName=theme.fonts.regular,
+    leading=12,
+    leftIndent=10,
+    rightIndent=10,
+    spaceAfter=8
+  ))
+  
+  # Cellules du tableau des items dont le texte passe par les polices de secours
+  styles.add(ParagraphStyle(
+    name='ItemCell',
+    parent=styles['Normal'],
+    fontSize=8,
+    textColor=theme.black,
+    fontName=theme.fonts.regular,
+    leading=10
+  ))
+  styles.add(ParagraphStyle(
+    name='ItemGroupTitle',
+    parent=styles['Normal'],
+    fontSize=9,
+    textColor=theme.accent_color,
+    fontName=theme.fonts.bold,
+    leading=11
+  ))
+  
+  return styles
+
+
+@lru_cache(maxsize=None)
+def _build_separator_style(theme: Theme) -> TableStyle:
+  return TableStyle([
+    ('LINEBELOW', (0, 0), (0, 0), 0.5, theme.separator_color),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ('TOPPADDING', (0, 0), (-1, -1), 0),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+  ])
+
+
+@lru_cache(maxsize=None)
+def _build_items_table_base_style(theme: Theme) -> tuple:
+  return (
+    # En-tête principal
+    ('BACKGROUND', (0, 0), (-1, 0), theme.primary_color),
+    ('TEXTCOLOR', (0, 0), (-1, 0), theme.white),
+    ('FONTNAME', (0, 0), (-1, 0), theme.fonts.bold),
+    ('FONTSIZE', (0, 0), (-1, 0), 8),  # Taille réduite
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    
+    # Style par défaut pour toutes les cellules
+    ('FONTNAME', (0, 1), (-1, -1), theme.fonts.regular),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),  # Taille réduite
+    ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
+    ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+    
+    # Réduction de la hauteur des cellules
+    ('TOPPADDING', (0, 0), (-1, -1), 4),  # Padding réduit
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    
+    # Bordures - seulement horizontales
+    ('LINEBELOW', (0, 1), (-1, -1), 0.5, theme.grey_medium),  # Lignes horizontales uniquement
+    ('LINEBELOW', (0, 0), (-1, 0), 2, theme.accent_color),
+    
+    # CONTRAINTES DE PAGINATION - Éviter la casse après l'en-tête
+    ('NOSPLIT', (0, 0), (-1, 2)),  # Garde l'en-tête + au moins 2 lignes ensemble
+  )
+
+
 class InvoiceTemplate(BaseDocTemplate):
   """Template de document personnalisé avec texte en marge verticale"""
   
-  def __init__(self, filename, invoice_number="", **kwargs):
+  # Nom du Form XObject contenant le décor de page
+  CHROME_FORM_NAME = "DevisPageChrome"
+  
+  def __init__(self, filename, invoice_number="", chrome_form=False, margin_font="Helvetica", margin_label="DEVIS", **kwargs):
+    """
+    Args:
+      chrome_form: Si True, le décor de page est dessiné une seule fois dans un
+        Form XObject puis référencé sur chaque page (moins de dessin et un PDF
+        plus léger pour les devis de nombreuses pages)
+      margin_font: Police du texte en marge
+      margin_label: Type de document affiché en marge avant le numéro
+    """
     self.invoice_number = invoice_number
+    self.margin_font = margin_font
+    self.chrome_form = chrome_form
+    self._chrome_forms_drawn = set()
+    self.report: Optional[RenderReport] = None  # Renseigné pour chronométrer chaque élément
+    self._current_section = "document"
     BaseDocTemplate.__init__(self, filename, **kwargs)
-    
+    self.add_quote_page_template('normal', invoice_number, margin_label)
+  
+  def add_quote_page_template(self, template_id: str, invoice_number: str, margin_label: str = "DEVIS"):
+    """
+    Ajoute un modèle de page portant le type et le numéro d'un document en marge
+
+    Plusieurs devis d'un même PDF (voir render_combined) ont chacun le leur,
+    sélectionné par NextPageTemplate(template_id).
+    """
     # Configuration des marges
     margin = 15 * mm
     frame = Frame(
@@ -102,29 +803,76 @@ class InvoiceTemplate(BaseDocTemplate):
       leftPadding=0, bottomPadding=0, rightPadding=0, topPadding=0
     )
     
-    template = PageTemplate(id='normal', frames=[frame], onPage=self._draw_margin_text)
-    self.addPageTemplates([template])
+    if self.chrome_form:
+      form_name = self.CHROME_FORM_NAME if template_id == 'normal' else f"{self.CHROME_FORM_NAME}{template_id}"
+      on_page = lambda canvas, doc: self._draw_page_chrome(canvas, form_name, invoice_number, margin_label)
+    else:
+      on_page = lambda canvas, doc: self._draw_margin_text(canvas, invoice_number, margin_label)
+    self.addPageTemplates([PageTemplate(id=template_id, frames=[frame], onPage=on_page)])
+  
+  def handle_flowable(self, flowables):
+    if self.report is None:
+      return BaseDocTemplate.handle_flowable(self, flowables)
+    
+    # Les morceaux d'un élément coupé sur deux pages héritent de sa section
+    flowable = flowables[0]
+    self._current_section = getattr(flowable, '_devis_section', self._current_section)
+    start = perf_counter()
+    BaseDocTemplate.handle_flowable(self, flowables)
+    self.report.add_flowable(self._current_section, flowable.__class__.__name__, perf_counter() - start)
+  
+  def _draw_page_chrome(self, canvas, form_name: str, invoice_number: str, margin_label: str = "DEVIS"):
+    """Tamponne le décor de page, enregistré en Form XObject à la première page"""
+    if form_name not in self._chrome_forms_drawn:
+      canvas.beginForm(form_name)
+      self._draw_margin_text(canvas, invoice_number, margin_label)
+      canvas.endForm()
+      self._chrome_forms_drawn.add(form_name)
+    canvas.doForm(form_name)
   
-  def _draw_margin_text(self, canvas, doc):
+  def _draw_margin_text(self, canvas, invoice_number: str, margin_label: str = "DEVIS"):
     """Dessine le texte en marge verticale"""
     canvas.saveState()
     
     # Couleur violette claire pour le texte en marge
     canvas.setFillColor(colors.Color(169/255, 0/255, 212/255, alpha=0.3))
-    canvas.setFont("Helvetica", 8)
+    canvas.setFont(self.margin_font, 8)
     
     # Texte vertical sur la marge gauche
-    if self.invoice_number:
+    if invoice_number:
       canvas.rotate(90)
       canvas.drawString(
         50 * mm,  # Position Y (après rotation)
         -8 * mm,  # Position X (après rotation) 
-        f"DEVIS {self.invoice_number} • CONFIDENTIEL"
+        f"{margin_label} {invoice_number} • CONFIDENTIEL"
       )
     
     canvas.restoreState()
 
 
+class QuoteBookmark(Flowable):
+  """Signet et entrée du sommaire du PDF pointant sur le début d'un devis"""
+  
+  def __init__(self, key: str, title: str):
+    Flowable.__init__(self)
+    self.key = key
+    self.title = title
+  
+  def wrap(self, availWidth, availHeight):
+    return 0, 0
+  
+  def draw(self):
+    self.canv.bookmarkPage(self.key)
+    self.canv.addOutlineEntry(self.title, self.key, level=0)
+    self.canv.showOutline()
+
+
+THEME_COLOR_ATTRIBUTES = (
+  'PRIMARY_COLOR', 'SECONDARY_COLOR', 'ACCENT_COLOR', 'GRADIENT_START', 'GRADIENT_END',
+  'GREY_LIGHT', 'GREY_MEDIUM', 'GREY_DARK', 'WHITE', 'BLACK', 'SEPARATOR_COLOR'
+)
+
+
 class ModernInvoiceTemplate:
   """
   Template moderne et élégant pour générer des devis professionnels ultra-sophistiqués
@@ -138,7 +886,8 @@ class ModernInvoiceTemplate:
     template.generate_pdf("devis_001.pdf")
   """
   
-  # Couleurs du thème professionnelles (palette bleu marine et gris)
+  # Couleurs du thème par défaut (palette bleu marine et gris), personnalisables
+  # par héritage ou, par instance, via un objet Theme
   PRIMARY_COLOR = colors.Color(25/255, 55/255, 109/255)  # Bleu marine professionnel #19376D
   SECONDARY_COLOR = colors.Color(248/255, 249/255, 252/255)  # Gris très clair #F8F9FC
   ACCENT_COLOR = colors.Color(15/255, 35/255, 70/255)  # Bleu foncé #0F2346
@@ -151,7 +900,24 @@ class ModernInvoiceTemplate:
   BLACK = colors.black
   SEPARATOR_COLOR = colors.Color(200/255, 210/255, 220/255)  # Gris-bleu clair #C8D2DC
   
-  def __init__(self):
+  # Sections du devis dans l'ordre de la page : (nom, méthode de construction)
+  SECTIONS = (
+    ("header", "_create_header_section"),  # En-tête sophistiqué
+    ("title_and_info", "_create_invoice_title_and_info"),  # Titre et informations
+    ("project", "_create_project_section"),  # Section projet avec lorem ipsum
+    ("items", "_create_items_table"),  # Tableau des items ultra-stylé
+    ("settlement", "_create_settlement_section"),  # Acompte déduit et reste à payer (factures et avoirs)
+    ("recurring_payments", "_create_recurring_payments_table"),  # Formules de maintenance récurrentes
+    ("payment", "_create_payment_section_when_ready"),  # Section paiement avec QR code
+    ("rib", "_create_rib_section"),  # Section RIB
+    ("footer", "_create_footer"),  # Pied de page sophistiqué
+  )
+  
+  def __init__(self, theme: Optional[Theme] = None):
+    """
+    Args:
+      theme: Thème à utiliser, par défaut celui construit à partir des couleurs de la classe
+    """
     self.company_info: Optional[CompanyInfo] = None
     self.client_info: Optional[ClientInfo] = None
     self.project_info: Optional[ProjectInfo] = None
@@ -164,14 +930,36 @@ class ModernInvoiceTemplate:
     self.payment_percentage: float = 1.0  # Proportion du montant pour le paiement (1.0 = 100%, 0.3 = 30%)
     self.invoice_title: str = "DEVIS PROFESSIONNEL"  # Titre personnalisable du devis
     
+    # Type de document et références (voir set_document_kind, convert_to_invoice)
+    self.document_kind: str = DOCUMENT_QUOTE
+    self.quote_reference: Optional[str] = None  # Devis d'origine d'une facture ou d'un avoir
+    self.deposit_paid: Decimal = Decimal("0")  # Acompte déjà versé, déduit du montant de la facture
+    self.credited_invoice: Optional[str] = None  # Facture annulée par un avoir
+    
+    # Arrondi des montants (par ligne par défaut) et totaux calculés une seule fois
+    self.rounding: str = ROUNDING_PER_LINE
+    self._totals_cache: Optional[tuple] = None
+    
+    # Devise, langue d'affichage des montants et TVA (voir set_currency et set_vat_rate)
+    self.currency: Currency = get_currency("EUR")
+    self.locale: str = "fr_FR"
+    self.price_currency: Currency = self.currency  # Devise dans laquelle les prix des items sont saisis
+    self.exchange_rate: Decimal = Decimal("1")  # Conversion des prix des items vers la devise du devis
+    self.default_vat_rate: Decimal = STANDARD_VAT_RATE
+    
+    # Grands devis : au-delà de large_table_threshold lignes, le tableau des items
+    # est découpé en tables de table_chunk_size lignes (environ une page)
+    self.large_table_threshold: int = 300
+    self.table_chunk_size: int = 40
+    
     # Configuration des marges ultra-fines
     self.margin_left = 15 * mm
     self.margin_right = 15 * mm
     self.margin_top = 15 * mm
     self.margin_bottom = 15 * mm
     
-    # Styles personnalisés ultra-sophistiqués
-    self._setup_styles()
+    # Thème et styles personnalisés ultra-sophistiqués (partagés entre instances)
+    self.set_theme(theme or self.default_theme())
 
     # Configuration Stripe
     self.stripe_private_key = os.getenv("STRIPE_PRIVATE_KEY")
@@ -180,98 +968,37 @@ class ModernInvoiceTemplate:
     
     # QR Code et paiement
     self.payment_link: Optional[str] = None
-    self.qr_code_path: Optional[str] = None
-
-  def _setup_styles(self):
-    """Configure les styles personnalisés ultra-sophistiqués"""
-    self.styles = getSampleStyleSheet()
-    
-    # Style pour le titre principal (plus imposant)
-    self.styles.add(ParagraphStyle(
-      name='UltraTitle',
-      parent=self.styles['Title'],
-      fontSize=32,
-      textColor=self.PRIMARY_COLOR,
-      spaceAfter=15,
-      fontName='Times-Bold',
-      alignment=TA_LEFT,
-      leading=36
-    ))
-    
-    # Style pour les titres de projet
-    self.styles.add(ParagraphStyle(
-      name='ProjectTitle',
-      parent=self.styles['Heading1'],
-      fontSize=18,
-      textColor=self.ACCENT_COLOR,
-      spaceAfter=10,
-      spaceBefore=10,
-      fontName='Times-Bold',
-      alignment=TA_LEFT,
-      leading=22
-    ))
-    
-    # Style pour les sous-titres élégants
-    self.styles.add(ParagraphStyle(
-      name='ElegantSubtitle',
-      parent=self.styles['Heading2'],
-      fontSize=13,
-      textColor=self.ACCENT_COLOR,
-      spaceAfter=8,
-      spaceBefore=15,
-      fontName='Times-Bold',
-      alignment=TA_LEFT,
-      borderPadding=5,
-      leftIndent=5
-    ))
-    
-    # Style pour le texte sophistiqué
-    self.styles.add(ParagraphStyle(
-      name='SophisticatedNormal',
-      parent=self.styles['Normal'],
-      fontSize=10,
-      textColor=self.GREY_DARK,
-      spaceAfter=6,
-      fontName='Times-Roman',
-      leading=15,
-      alignment=TA_JUSTIFY
-    ))
-    
-    # Style pour les informations VIP
-    self.styles.add(ParagraphStyle(
-      name='VIPInfo',
-      parent=self.styles['Normal'],
-      fontSize=11,
-      textColor=self.BLACK,
-      fontName='Times-Bold',
-      spaceAfter=8,
-      leading=16
-    ))
-    
-    # Style pour les totaux premium
-    self.styles.add(ParagraphStyle(
-      name='PremiumTotal',
-      parent=self.styles['Normal'],
-      fontSize=14,
-      textColor=self.PRIMARY_COLOR,
-      fontName='Times-Bold',
-      alignment=TA_RIGHT,
-      spaceAfter=10
-    ))
-    
-    # Style pour les encadrés
-    self.styles.add(ParagraphStyle(
-      name='BoxedContent',
-      parent=self.styles['Normal'],
-      fontSize=9,
-      textColor=self.GREY_DARK,
-      fontName='Times-Roman',
-      leading=12,
-      leftIndent=10,
-      rightIndent=10,
-      spaceAfter=8
-    ))
+    self.payment_link_registry: Optional[PaymentLinkRegistry] = None
+    self.qr_code: Optional[Any] = None  # Flowable du QR code de paiement
+    self.stripe_timeout: Optional[float] = 10.0  # Attente maximale du lien Stripe pendant le rendu (voir set_stripe_timeout)
+    self._payment_future: Optional[Future] = None
+    self._payment_deadline: Optional[float] = None
+    self._payment_pending: bool = False  # Lien non obtenu dans le délai lors du dernier rendu
+    self.qr_code_cache: QRCodeCache = QR_CODE_CACHE
+    self.qr_code_vector: bool = False  # QR code dessiné en rectangles vectoriels plutôt qu'en image
+    self.qr_code_error_correction: str = "M"  # Niveau de correction d'erreur : L, M, Q ou H
+    self.asset_cache: AssetCache = ASSET_CACHE  # Logo réduit et compressé une fois par processus
+    self.cached_chrome: bool = False  # Décor de page et éléments fixes de l'entreprise réutilisés (voir set_cached_chrome)
+    
+    # Sections du document : seules les sections activées sont construites
+    self.sections: List[Tuple[str, Callable[[], List[Any]]]] = [(name, getattr(self, method)) for name, method in self.SECTIONS]
+    self.disabled_sections: Set[str] = set()
+    self.recurring_plans: Tuple[RecurringPlan, ...] = DEFAULT_RECURRING_PLANS
+    
+    # Chronométrage du rendu (voir set_profiling)
+    self.profiling: bool = False
+    self.render_report: Optional[RenderReport] = None
 
+  @classmethod
+  def default_theme(cls) -> Theme:
+    """Thème construit à partir des couleurs définies sur la classe"""
+    return Theme(**{color.lower(): getattr(cls, color) for color in THEME_COLOR_ATTRIBUTES})
+  
+  def set_theme(self, theme: Theme):
+    """Définit le thème (couleurs et styles) du devis"""
+    self.theme = theme
+    self.styles = theme.styles
+  
   def set_company_info(self, company: CompanyInfo):
     """Définit les informations de l'entreprise"""
     self.company_info = company
@@ -310,10 +1037,292 @@ class ModernInvoiceTemplate:
       raise ValueError("Le pourcentage doit être entre 0.0 et 1.0")
     self.payment_percentage = percentage
   
+  def set_rounding(self, rounding: str):
+    """Définit la règle d'arrondi des montants (ROUNDING_PER_LINE ou ROUNDING_PER_TOTAL)"""
+    if rounding not in (ROUNDING_PER_LINE, ROUNDING_PER_TOTAL):
+      raise ValueError(f"Règle d'arrondi inconnue : {rounding}")
+    self.rounding = rounding
+  
+  def set_currency(self, currency: str, locale: Optional[str] = None, price_currency: Optional[str] = None,
+                   rates: Optional[ExchangeRates] = None):
+    """
+    Définit la devise du devis et la langue d'affichage des montants
+
+    Args:
+      currency: Code ISO de la devise (EUR, USD, CHF...)
+      locale: Conventions d'affichage (fr_FR, en_US, de_CH...), inchangées par défaut
+      price_currency: Devise des prix saisis sur les items s'ils ne sont pas dans la
+        devise du devis ; ils sont alors convertis au taux de la table de change
+      rates: Table de change, par défaut celle chargée une fois par load_exchange_rates()
+    """
+    self.currency = get_currency(currency)
+    if locale:
+      money_formatter(locale)  # Langue non prise en charge : erreur dès la configuration
+      self.locale = locale
+    self.price_currency = get_currency(price_currency or currency)
+    if self.price_currency == self.currency:
+      self.exchange_rate = Decimal("1")
+    else:
+      self.exchange_rate = (rates or load_exchange_rates()).rate(self.price_currency.code, self.currency.code)
+  
+  def set_vat_rate(self, rate: Decimal):
+    """Définit le taux de TVA des lignes sans taux propre (entreprises soumises à TVA)"""
+    self.default_vat_rate = Decimal(str(rate))
+  
+  def format_amount(self, amount: Decimal) -> str:
+    """Affiche un montant dans la devise et la langue du devis"""
+    return money_formatter(self.locale)(amount, self.currency)
+  
+  @property
+  def subject_to_vat(self) -> bool:
+    return bool(self.company_info) and self.company_info.vat_status == "company_with_vat"
+  
+  @property
+  def vat_rate(self) -> Decimal:
+    """Taux de TVA par défaut déduit du statut TVA de l'entreprise"""
+    return self.default_vat_rate if self.subject_to_vat else Decimal("0")
+  
+  @property
+  def totals(self) -> QuoteTotals:
+    """Totaux du devis, recalculés uniquement si les groupes, l'arrondi, la TVA ou la devise ont changé"""
+    # Les groupes sont immuables : ils servent eux-mêmes de clé (comparés par valeur,
+    # les identifiants d'objets libérés pouvant être réutilisés)
+    vat_rate = self.vat_rate if self.subject_to_vat else None
+    key = (tuple(self.item_groups), self.rounding, vat_rate, self.currency, self.exchange_rate)
+    if self._totals_cache is None or self._totals_cache[0] != key:
+      self._totals_cache = (key, QuoteTotals.compute(
+        self.item_groups, vat_rate, self.rounding, exchange_rate=self.exchange_rate, quantum=self.currency.quantum
+      ))
+    return self._totals_cache[1]
+  
+  def set_large_table_options(self, threshold: int = 300, chunk_size: int = 40):
+    """
+    Configure le découpage du tableau des items pour les très grands devis
+
+    Args:
+      threshold: Nombre de lignes au-delà duquel le tableau est découpé
+      chunk_size: Nombre maximum de lignes par table (en-tête répété sur chacune)
+    """
+    if chunk_size < 3:
+      raise ValueError("Le nombre de lignes par table doit être d'au moins 3")
+    self.large_table_threshold = threshold
+    self.table_chunk_size = chunk_size
+  
+  def set_profiling(self, enabled: bool = True):
+    """
+    Active le chronométrage du rendu
+
+    Chaque génération enregistre alors dans render_report la durée de la
+    configuration Stripe et du QR code, de la construction de chaque section,
+    de la mise en page de chaque élément par ReportLab, ainsi que le nombre de
+    pages et la taille du PDF.
+    """
+    self.profiling = enabled
+  
+  def _phase(self, name: str):
+    """Chronomètre une étape du rendu en cours si le chronométrage est actif"""
+    report = self.render_report if self.profiling else None
+    return report.phase(name) if report else nullcontext()
+  
+  def set_section_enabled(self, name: str, enabled: bool = True):
+    """Active ou désactive une section ; une section désactivée n'est pas construite"""
+    if name not in dict(self.sections):
+      raise ValueError(f"Section inconnue : {name}")
+    if enabled:
+      self.disabled_sections.discard(name)
+    else:
+      self.disabled_sections.add(name)
+  
+  def add_section(self, name: str, build: Callable[[], List[Any]], before: Optional[str] = None):
+    """
+    Ajoute une section personnalisée
+
+    Args:
+      name: Nom de la section (pour set_section_enabled et le rapport de rendu)
+      build: Fonction sans argument renvoyant les éléments de la section
+      before: Section devant laquelle l'insérer, à la fin du document par défaut
+    """
+    names = [section_name for section_name, _ in self.sections]
+    if name in names:
+      raise ValueError(f"Section déjà présente : {name}")
+    if before is not None and before not in names:
+      raise ValueError(f"Section inconnue : {before}")
+    self.sections.insert(names.index(before) if before else len(names), (name, build))
+  
+  @property
+  def enabled_sections(self) -> List[str]:
+    return [name for name, _ in self.sections if name not in self.disabled_sections]
+  
+  def set_recurring_plans(self, plans: Iterable[RecurringPlan]):
+    """Définit les formules récurrentes proposées ; sans formule, la section est omise"""
+    self.recurring_plans = tuple(plans)
+  
+  def set_cached_chrome(self, enabled: bool = True):
+    """
+    Active la réutilisation des éléments fixes du document
+
+    Le texte en marge est dessiné une fois par document en Form XObject et
+    tamponné sur chaque page ; l'en-tête et les mentions légales de l'entreprise
+    sont construits une fois par processus (CHROME_CACHE) pour tous ses devis.
+    """
+    self.cached_chrome = enabled
+  
+  def _chrome_key(self, part: str) -> tuple:
+    """Clé du cache des éléments fixes : entreprise, thème et logo"""
+    logo = None
+    if self.logo_path and os.path.exists(self.logo_path):
+      stat = os.stat(self.logo_path)
+      logo = (os.path.abspath(self.logo_path), stat.st_mtime_ns, stat.st_size, self.asset_cache.dpi, self.asset_cache.quality)
+    return (part, repr(self.company_info), self.theme, logo)
+  
+  def set_asset_cache(self, cache: AssetCache):
+    """Utilise un cache d'images dédié (résolution et qualité JPEG propres)"""
+    self.asset_cache = cache
+  
+  def set_qr_code_options(self, vector: bool = False, error_correction: str = "M", cache: Optional[QRCodeCache] = None):
+    """
+    Configure le rendu des QR codes
+    
+    Args:
+      vector: Dessine le QR code en rectangles vectoriels (PDF plus léger, sans image)
+      error_correction: Niveau de correction d'erreur (L, M, Q ou H)
+      cache: Cache de QR codes à utiliser (par défaut le cache partagé QR_CODE_CACHE)
+    """
+    if error_correction not in ("L", "M", "Q", "H"):
+      raise ValueError("Le niveau de correction doit être L, M, Q ou H")
+    self.qr_code_vector = vector
+    self.qr_code_error_correction = error_correction
+    if cache is not None:
+      self.qr_code_cache = cache
+  
+  def set_payment_link_registry(self, registry: PaymentLinkRegistry):
+    """Définit le registre qui évite de recréer le lien de paiement à chaque génération"""
+    self.payment_link_registry = registry
+  
+  def set_payment_link(self, url: str) -> bool:
+    """Utilise un lien de paiement existant (provisionné au préalable) et génère son QR code"""
+    self.payment_link = url
+    self.qr_code = self._generate_qr_code(url)
+    return self.qr_code is not None
+  
+  def set_stripe_timeout(self, seconds: Optional[float]):
+    """
+    Définit l'attente maximale du lien de paiement Stripe lors du rendu
+
+    Le lien et son QR code sont créés en arrière-plan pendant la construction
+    des autres sections. Passé ce délai (compté depuis le lancement), le devis
+    est généré sans lien : le virement (section RIB) reste proposé, ou à défaut
+    la section de paiement générique. Le lien obtenu plus tard sert aux rendus
+    suivants. None attend sans limite.
+    """
+    self.stripe_timeout = seconds
+  
+  def prefetch_stripe_payment(self) -> Optional[Future]:
+    """Lance en arrière-plan la création du lien de paiement Stripe et de son QR code"""
+    if not self.stripe_private_key or self.payment_link:
+      return None
+    if self._payment_future is None:
+      self._payment_deadline = perf_counter() + self.stripe_timeout if self.stripe_timeout is not None else None
+      self._payment_future = STRIPE_EXECUTOR.submit(self.setup_stripe_payment)
+    return self._payment_future
+  
+  def _needs_stripe_payment(self) -> bool:
+    """Lien Stripe à créer : clé configurée, pas de lien existant et section paiement affichée"""
+    return (
+      bool(self.stripe_private_key) and not self.payment_link and "payment" not in self.disabled_sections
+      and self.document_kind == DOCUMENT_QUOTE
+    )
+  
+  def _wait_stripe_payment(self) -> bool:
+    """Attend le lien lancé par prefetch_stripe_payment, au plus jusqu'à l'échéance"""
+    future = self._payment_future
+    if future is None:
+      return self.payment_link is not None
+    
+    timeout = max(0.0, self._payment_deadline - perf_counter()) if self._payment_deadline is not None else None
+    try:
+      with self._phase("stripe_wait"):
+        configured = future.result(timeout=timeout)
+    except FutureTimeoutError:
+      # Création poursuivie en arrière-plan pour les rendus suivants
+      self._payment_pending = True
+      print(f"⏳ Lien de paiement Stripe non obtenu en {self.stripe_timeout:g} s : devis généré sans lien")
+      return False
+    
+    self._payment_future = None
+    self._payment_pending = False
+    return configured
+  
   def set_invoice_title(self, title: str):
     """Définit le titre du devis"""
     self.invoice_title = title
   
+  @property
+  def document(self) -> DocumentKind:
+    return DOCUMENT_KINDS[self.document_kind]
+  
+  def set_document_kind(self, kind: str, quote_reference: Optional[str] = None,
+                        deposit_paid: Decimal = Decimal("0"), credited_invoice: Optional[str] = None):
+    """
+    Définit le type de document (devis, facture ou avoir) et ses références
+
+    Le titre par défaut suit le type de document. Une facture ou un avoir ne
+    propose ni paiement d'acompte ni formules récurrentes : ces sections sont
+    désactivées.
+
+    Args:
+      quote_reference: Numéro du devis d'origine
+      deposit_paid: Acompte déjà versé, déduit du montant d'une facture
+      credited_invoice: Numéro de la facture annulée par un avoir
+    """
+    if kind not in DOCUMENT_KINDS:
+      raise ValueError(f"Type de document inconnu : {kind}")
+    if self.invoice_title == self.document.title:
+      self.invoice_title = DOCUMENT_KINDS[kind].title
+    self.document_kind = kind
+    self.quote_reference = quote_reference
+    self.deposit_paid = Decimal(str(deposit_paid))
+    self.credited_invoice = credited_invoice
+    if kind != DOCUMENT_QUOTE:
+      self.disabled_sections.update(("payment", "recurring_payments"))
+  
+  @property
+  def deposit_amount(self) -> Decimal:
+    """Acompte demandé par le devis (payment_percentage du total TTC, comme le lien Stripe)"""
+    return round_amount(self._calculate_total() * Decimal(str(self.payment_percentage)), self.currency.quantum)
+  
+  @property
+  def balance_due(self) -> Decimal:
+    """Reste à payer : total TTC moins l'acompte déjà versé"""
+    return self.totals.total_ttc - self.deposit_paid
+  
+  def convert_to_invoice(self, number: str, date: Optional[datetime] = None, due_date: Optional[datetime] = None,
+                         deposit_paid: bool = False):
+    """
+    Transforme le devis accepté en facture finale
+
+    Args:
+      number: Numéro de facture (voir numbering.InvoiceNumbering)
+      date: Date de la facture, aujourd'hui par défaut
+      deposit_paid: Si True, l'acompte demandé par le devis (deposit_amount) a été
+        versé et est déduit du montant à payer
+    """
+    if self.document_kind != DOCUMENT_QUOTE:
+      raise ValueError("Seul un devis peut être converti en facture")
+    deposit = self.deposit_amount if deposit_paid else Decimal("0")
+    self.set_document_kind(DOCUMENT_INVOICE, quote_reference=self.invoice_number, deposit_paid=deposit)
+    self.set_invoice_details(number, date or datetime.now(), due_date)
+  
+  def convert_to_credit_note(self, number: str, date: Optional[datetime] = None):
+    """Transforme la facture en avoir l'annulant (mêmes lignes, références conservées)"""
+    if self.document_kind != DOCUMENT_INVOICE:
+      raise ValueError("Seule une facture peut être convertie en avoir")
+    self.set_document_kind(
+      DOCUMENT_CREDIT_NOTE, quote_reference=self.quote_reference,
+      deposit_paid=self.deposit_paid, credited_invoice=self.invoice_number
+    )
+    self.set_invoice_details(number, date or datetime.now())
+  
   def configure_vat_status(self, status: str, vat_number: Optional[str] = None):
     """
     Configure le statut TVA de l'entreprise
@@ -336,15 +1345,15 @@ class ModernInvoiceTemplate:
     """Crée une ligne de séparation élégante"""
     separator_data = [['', '']]
     separator_table = Table(separator_data, colWidths=[180*mm, 0])
-    separator_table.setStyle(TableStyle([
-      ('LINEBELOW', (0, 0), (0, 0), 0.5, self.SEPARATOR_COLOR),
-      ('LEFTPADDING', (0, 0), (-1, -1), 0),
-      ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-      ('TOPPADDING', (0, 0), (-1, -1), 0),
-      ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-    ]))
+    separator_table.setStyle(self.theme.separator_style)
     return separator_table
   
+  def _create_header_section(self) -> List[Any]:
+    """En-tête, construit une fois par entreprise si les éléments fixes sont mis en cache"""
+    if self.cached_chrome:
+      return CHROME_CACHE.get(self._chrome_key("header"), self._create_header)
+    return self._create_header()
+  
   def _create_header(self) -> List[Any]:
     """Crée l'en-tête sophistiqué avec logo et informations entreprise"""
     elements = []
@@ -354,20 +1363,24 @@ class ModernInvoiceTemplate:
     
     if self.logo_path and os.path.exists(self.logo_path):
       try:
-        logo = Image(self.logo_path, width=25*mm, height=25*mm, hAlign='LEFT')
+        # Logo réduit à sa taille imprimée et aplati sur le fond de l'encadré
+        background = '#' + self.theme.secondary_color.hexval()[2:]
+        logo_data = self.asset_cache.get_image(self.logo_path, 25*mm, 25*mm, background)
+        logo = Image(BytesIO(logo_data), width=25*mm, height=25*mm, hAlign='LEFT')
         company_text = f"""
-        <font size="16" color="{self.PRIMARY_COLOR.hexval()}"><b>{self.company_info.name}</b></font><br/>
-        <font size="9" color="{self.GREY_DARK.hexval()}">
-        {self.company_info.address}<br/>
-        {self.company_info.postal_code} {self.company_info.city}<br/>
-        <b>Tel:</b> {self.company_info.phone}<br/>
-        <b>Email:</b> {self.company_info.email}
+        <font size="16" color="{self.theme.primary_color.hexval()}"><b>{{name}}</b></font><br/>
+        <font size="9" color="{self.theme.grey_dark.hexval()}">
+        {{address}}<br/>
+        {{postal_code}} {{city}}<br/>
+        <b>Tel:</b> {{phone}}<br/>
+        <b>Email:</b> {{email}}
         </font>
         """
         if self.company_info.website:
-          company_text += f'<br/><font size="9" color="{self.PRIMARY_COLOR.hexval()}"><b>{self.company_info.website}</b></font>'
+          company_text += f'<br/><font size="9" color="{self.theme.primary_color.hexval()}"><b>{{website}}</b></font>'
         
-        header_data = [[logo, Paragraph(company_text, self.styles['SophisticatedNormal'])]]
+        company_paragraph = markup_template(company_text, self.styles['SophisticatedNormal']).fill(**asdict(self.company_info))
+        header_data = [[logo, company_paragraph]]
       except:
         header_data = [[self._create_company_text_only()]]
     else:
@@ -378,7 +1391,7 @@ class ModernInvoiceTemplate:
       ('ALIGN', (0, 0), (0, 0), 'LEFT'),
       ('ALIGN', (1, 0), (1, 0), 'LEFT'),
       ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-      ('BACKGROUND', (0, 0), (-1, -1), self.SECONDARY_COLOR),
+      ('BACKGROUND', (0, 0), (-1, -1), self.theme.secondary_color),
       ('LEFTPADDING', (0, 0), (-1, -1), 12),
       ('RIGHTPADDING', (0, 0), (-1, -1), 12),
       ('TOPPADDING', (0, 0), (-1, -1), 12),
@@ -394,52 +1407,62 @@ class ModernInvoiceTemplate:
   def _create_company_text_only(self) -> Paragraph:
     """Crée le texte de l'entreprise sans logo (version sophistiquée)"""
     company_text = f"""
-    <font size="20" color="{self.PRIMARY_COLOR.hexval()}"><b>{self.company_info.name}</b></font><br/>
-    <font size="10" color="{self.GREY_DARK.hexval()}">
-    {self.company_info.address}<br/>
-    {self.company_info.postal_code} {self.company_info.city}<br/>
-    <b>Tel:</b> {self.company_info.phone} • <b>Email:</b> {self.company_info.email}
+    <font size="20" color="{self.theme.primary_color.hexval()}"><b>{{name}}</b></font><br/>
+    <font size="10" color="{self.theme.grey_dark.hexval()}">
+    {{address}}<br/>
+    {{postal_code}} {{city}}<br/>
+    <b>Tel:</b> {{phone}} • <b>Email:</b> {{email}}
     </font>
     """
     if self.company_info.website:
-      company_text += f'<br/><font size="10" color="{self.PRIMARY_COLOR.hexval()}"><b>{self.company_info.website}</b></font>'
+      company_text += f'<br/><font size="10" color="{self.theme.primary_color.hexval()}"><b>{{website}}</b></font>'
     
-    return Paragraph(company_text, self.styles['SophisticatedNormal'])
+    return markup_template(company_text, self.styles['SophisticatedNormal']).fill(**asdict(self.company_info))
   
   def _create_invoice_title_and_info(self) -> List[Any]:
     """Crée le titre du devis et informations avec design sophistiqué"""
     elements = []
     
     # Titre principal ultra-imposant
-    title = Paragraph(self.invoice_title, self.styles['UltraTitle'])
+    title = markup_template("{title}", self.styles['UltraTitle']).fill(title=self.invoice_title)
     elements.append(title)
     elements.append(Spacer(1, 15))
     
     # Informations dans un layout sophistiqué
     invoice_info = f"""
-    <font size="10" color="{self.GREY_DARK.hexval()}">
-    <b>N° de devis:</b> <font color="{self.PRIMARY_COLOR.hexval()}"><b>{self.invoice_number}</b></font><br/>
-    <b>Date d'émission:</b> {self.invoice_date.strftime('%d/%m/%Y')}<br/>
+    <font size="10" color="{self.theme.grey_dark.hexval()}">
+    <b>{self.document.number_label}:</b> <font color="{self.theme.primary_color.hexval()}"><b>{{number}}</b></font><br/>
+    <b>Date d'émission:</b> {{date}}<br/>
     """
+    if self.quote_reference:
+      invoice_info += '<b>Devis de référence:</b> {quote_reference}<br/>'
+    if self.credited_invoice:
+      invoice_info += '<b>Facture d\'origine:</b> {credited_invoice}<br/>'
     if self.due_date:
-      invoice_info += f'<b>Date limite:</b> {self.due_date.strftime("%d/%m/%Y")}<br/>'
+      invoice_info += '<b>Date limite:</b> {due_date}<br/>'
     
     invoice_info += '</font>'
     
     client_info = f"""
-    <font size="12" color="{self.ACCENT_COLOR.hexval()}"><b>Facturé à</b></font><br/>
-    <font size="11" color="{self.BLACK.hexval()}"><b>{self.client_info.name}</b></font><br/>
-    <font size="10" color="{self.GREY_DARK.hexval()}">
-    {self.client_info.address}<br/>
-    {self.client_info.postal_code} {self.client_info.city}
+    <font size="12" color="{self.theme.accent_color.hexval()}"><b>Facturé à</b></font><br/>
+    <font size="11" color="{self.theme.black.hexval()}"><b>{{name}}</b></font><br/>
+    <font size="10" color="{self.theme.grey_dark.hexval()}">
+    {{address}}<br/>
+    {{postal_code}} {{city}}
     """
     if self.client_info.email:
-      client_info += f'<br/><b>Email:</b> {self.client_info.email}'
+      client_info += '<br/><b>Email:</b> {email}'
     client_info += '</font>'
     
     info_data = [[
-      Paragraph(invoice_info, self.styles['SophisticatedNormal']),
-      Paragraph(client_info, self.styles['SophisticatedNormal'])
+      markup_template(invoice_info, self.styles['SophisticatedNormal']).fill(
+        number=self.invoice_number,
+        date=self.invoice_date.strftime('%d/%m/%Y'),
+        due_date=self.due_date.strftime('%d/%m/%Y') if self.due_date else '',
+        quote_reference=self.quote_reference or '',
+        credited_invoice=self.credited_invoice or ''
+      ),
+      markup_template(client_info, self.styles['SophisticatedNormal']).fill(**asdict(self.client_info))
     ]]
     
     info_table = Table(info_data, colWidths=[85*mm, 95*mm])
@@ -447,8 +1470,8 @@ class ModernInvoiceTemplate:
       ('ALIGN', (0, 0), (0, 0), 'LEFT'),
       ('ALIGN', (1, 0), (1, 0), 'LEFT'),
       ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-      ('BACKGROUND', (0, 0), (0, 0), self.GREY_LIGHT),
-      ('BACKGROUND', (1, 0), (1, 0), self.SECONDARY_COLOR),
+      ('BACKGROUND', (0, 0), (0, 0), self.theme.grey_light),
+      ('BACKGROUND', (1, 0), (1, 0), self.theme.secondary_color),
       ('LEFTPADDING', (0, 0), (-1, -1), 15),
       ('RIGHTPADDING', (0, 0), (-1, -1), 15),
       ('TOPPADDING', (0, 0), (-1, -1), 12),
@@ -471,7 +1494,7 @@ class ModernInvoiceTemplate:
     elements = []
     
     # Titre du projet
-    project_title = Paragraph(f"◆ PROJET : {self.project_info.title.upper()}", self.styles['ProjectTitle'])
+    project_title = markup_template("◆ PROJET : {title}", self.styles['ProjectTitle']).fill(title=self.project_info.title.upper())
     elements.append(project_title)
     elements.append(Spacer(1, 10))
     
@@ -487,16 +1510,16 @@ class ModernInvoiceTemplate:
     """
     
     # Encadré pour la description
-    desc_data = [[Paragraph(description, self.styles['SophisticatedNormal'])]]
+    desc_data = [[fallback_paragraph(description, self.styles['SophisticatedNormal'])]]
     desc_table = Table(desc_data, colWidths=[180*mm])
     desc_table.setStyle(TableStyle([
-      ('BACKGROUND', (0, 0), (-1, -1), self.GREY_LIGHT),
+      ('BACKGROUND', (0, 0), (-1, -1), self.theme.grey_light),
       ('LEFTPADDING', (0, 0), (-1, -1), 20),
       ('RIGHTPADDING', (0, 0), (-1, -1), 20),
       ('TOPPADDING', (0, 0), (-1, -1), 15),
       ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
       ('ROUNDEDCORNERS', (0, 0), (-1, -1), [8, 8, 8, 8]),
-      ('LINEBELOW', (0, 0), (-1, -1), 3, self.PRIMARY_COLOR),
+      ('LINEBELOW', (0, 0), (-1, -1), 3, self.theme.primary_color),
     ]))
     
     elements.append(desc_table)
@@ -506,156 +1529,253 @@ class ModernInvoiceTemplate:
     
     return elements
   
-  def _create_items_table(self) -> List[Any]:
-    """Crée le tableau des items unifié et compact"""
-    elements = []
-    
-    if not self.item_groups:
-      return elements
-    
-    # Construction des données pour une seule grande table
-    table_data = []
-    
-    # En-tête du tableau principal
-    headers = ['DESCRIPTION', 'QTÉ', 'UNITÉ', 'PRIX UNITAIRE HT', 'TOTAL HT']
-    table_data.append(headers)
-    
-    total_general = Decimal('0')
+  def _items_table_rows(self) -> tuple:
+    """
+    Construit les lignes du tableau des items
+
+    Returns:
+      (lignes, types) où types[i] vaut 'title', 'item', 'subtotal', 'separator' ou 'total'
+      et, pour les items, ('item', rang de l'item dans son groupe)
+    """
+    rows = []
+    kinds = []
+    totals = self.totals
+    format_amount = self.format_amount
+    vat_column = self._items_vat_column
+    padding = [''] * (4 if vat_column else 3)
+    item_cell = self.styles['ItemCell']
     
     for group_index, group in enumerate(self.item_groups):
       # Ligne de titre du groupe (si il y a un titre)
       if group.title:
-        group_row = [group.title.upper(), '', '', '', '']
-        table_data.append(group_row)
+        rows.append([fallback_cell(group.title.upper(), self.styles['ItemGroupTitle'])] + padding + [''])
+        kinds.append('title')
       
       # Items du groupe
-      for item in group.items:
+      lines = zip(group.items, totals.unit_prices[group_index], totals.line_totals[group_index], totals.line_vat_rates[group_index])
+      for item_index, (item, unit_price, line_total, vat_rate) in enumerate(lines):
         row = [
-          item.description,
-          f"{item.quantity:g}",
+          fallback_cell(item.description, item_cell),
+          format_quantity(item.quantity),
           item.unit,
-          f"{item.unit_price:.2f} €",
-          f"{item.total_price:.2f} €"
+          format_amount(unit_price),
+          format_amount(line_total)
         ]
-        table_data.append(row)
+        if vat_column:
+          row.insert(4, format_rate(vat_rate, self.locale))
+        rows.append(row)
+        kinds.append(('item', item_index))
       
       # Sous-total du groupe
-      subtotal_row = ['', '', '', 'Sous-total HT:', f"{group.subtotal:.2f} €"]
-      table_data.append(subtotal_row)
+      rows.append(padding + ['Sous-total HT:', format_amount(totals.subtotals[group_index])])
+      kinds.append('subtotal')
       
       # Ligne vide de séparation entre groupes (sauf pour le dernier)
       if group_index < len(self.item_groups) - 1:
-        separator_row = ['', '', '', '', '']
-        table_data.append(separator_row)
-      
-      total_general += group.subtotal
+        rows.append(padding + ['', ''])
+        kinds.append('separator')
     
     # Total général
-    total_row = ['', '', '', 'TOTAL GÉNÉRAL HT:', f"{total_general:.2f} €"]
-    table_data.append(total_row)
-    
-    # Création de la table unifiée avec colonnes réduites
-    items_table = Table(table_data, colWidths=[95*mm, 15*mm, 20*mm, 25*mm, 25*mm])
-    
-    # Répétition de l'en-tête si le tableau doit se couper sur plusieurs pages
-    items_table.repeatRows = 1
+    rows.append(padding + ['TOTAL GÉNÉRAL HT:', format_amount(totals.total_ht)])
+    kinds.append('total')
     
+    return rows, kinds
+  
+  @property
+  def _items_vat_column(self) -> bool:
+    """Colonne TVA dans le tableau des items lorsque plusieurs taux coexistent"""
+    return len(self.totals.vat_breakdown) > 1
+  
+  def _items_table_style(self, kinds: List[Any]) -> TableStyle:
+    """
+    Style d'un tableau d'items (en-tête en ligne 0 suivi des lignes décrites par kinds)
+
+    L'alternance des fonds des items est appliquée par bandes (ROWBACKGROUNDS),
+    une commande par suite d'items consécutifs plutôt qu'une par ligne.
+    """
     # Style unifié avec textes plus petits et cases moins hautes
-    table_style = [
-      # En-tête principal
-      ('BACKGROUND', (0, 0), (-1, 0), self.PRIMARY_COLOR),
-      ('TEXTCOLOR', (0, 0), (-1, 0), self.WHITE),
-      ('FONTNAME', (0, 0), (-1, 0), 'Times-Bold'),
-      ('FONTSIZE', (0, 0), (-1, 0), 8),  # Taille réduite
-      ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-      
-      # Style par défaut pour toutes les cellules
-      ('FONTNAME', (0, 1), (-1, -1), 'Times-Roman'),
-      ('FONTSIZE', (0, 1), (-1, -1), 8),  # Taille réduite
-      ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
-      ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+    table_style = list(self.theme.items_table_base_style)
+    band_start = None
+    
+    for index, kind in enumerate(kinds):
+      row = index + 1  # Décalage de l'en-tête
       
-      # Réduction de la hauteur des cellules
-      ('TOPPADDING', (0, 0), (-1, -1), 4),  # Padding réduit
-      ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-      ('LEFTPADDING', (0, 0), (-1, -1), 8),
-      ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+      if isinstance(kind, tuple):
+        if band_start is None:
+          band_start = row
+          # L'alternance suit le rang de l'item dans son groupe, même en début de morceau
+          band_colors = [self.theme.grey_light, None] if kind[1] % 2 == 0 else [None, self.theme.grey_light]
+        continue
       
-      # Bordures - seulement horizontales
-      ('LINEBELOW', (0, 1), (-1, -1), 0.5, self.GREY_MEDIUM),  # Lignes horizontales uniquement
-      ('LINEBELOW', (0, 0), (-1, 0), 2, self.ACCENT_COLOR),
+      if band_start is not None:
+        table_style.append(('ROWBACKGROUNDS', (0, band_start), (-1, row - 1), band_colors))
+        band_start = None
       
-      # CONTRAINTES DE PAGINATION - Éviter la casse après l'en-tête
-      ('NOSPLIT', (0, 0), (-1, 2)),  # Garde l'en-tête + au moins 2 lignes ensemble
-    ]
+      if kind == 'title':
+        # Style pour la ligne de titre du groupe
+        table_style.extend([
+          ('BACKGROUND', (0, row), (-1, row), self.theme.secondary_color),
+          ('FONTNAME', (0, row), (-1, row), self.theme.fonts.bold),
+          ('FONTSIZE', (0, row), (-1, row), 9),
+          ('TEXTCOLOR', (0, row), (-1, row), self.theme.accent_color),
+          ('SPAN', (0, row), (-1, row)),  # Fusion des colonnes
+          ('ALIGN', (0, row), (-1, row), 'LEFT'),
+          # Éviter la casse juste après un titre de groupe
+          ('NOSPLIT', (0, row), (-1, row + 1)),
+        ])
+      elif kind == 'subtotal':
+        # Style pour la ligne de sous-total
+        table_style.extend([
+          ('BACKGROUND', (0, row), (-1, row), self.theme.gradient_start),
+          ('FONTNAME', (0, row), (-1, row), self.theme.fonts.bold),
+          ('FONTSIZE', (0, row), (-1, row), 8),
+          ('ALIGN', (-2, row), (-1, row), 'RIGHT'),
+          ('TEXTCOLOR', (0, row), (-1, row), self.theme.black),
+          # Éviter la casse juste avant un sous-total
+          ('NOSPLIT', (0, row - 1), (-1, row)),
+        ])
+      elif kind == 'separator':
+        # Ligne de séparation entre groupes
+        table_style.append(('BACKGROUND', (0, row), (-1, row), colors.white))
+      elif kind == 'total':
+        # Style pour le total général
+        table_style.extend([
+          ('BACKGROUND', (0, row), (-1, row), self.theme.accent_color),
+          ('TEXTCOLOR', (0, row), (-1, row), self.theme.white),
+          ('FONTNAME', (0, row), (-1, row), self.theme.fonts.bold),
+          ('FONTSIZE', (0, row), (-1, row), 10),  # Légèrement plus grand pour le total
+          ('ALIGN', (-2, row), (-1, row), 'RIGHT'),
+          # Éviter la casse juste avant le total général
+          ('NOSPLIT', (0, row - 1), (-1, row)),
+        ])
+    
+    if band_start is not None:
+      table_style.append(('ROWBACKGROUNDS', (0, band_start), (-1, len(kinds)), band_colors))
+    
+    return TableStyle(table_style)
+  
+  def _items_table_chunks(self, kinds: List[Any]) -> List[tuple]:
+    """
+    Découpe les lignes en morceaux d'au plus table_chunk_size lignes
+
+    Un morceau ne se termine pas sur un titre de groupe et le suivant ne commence
+    pas par un sous-total ou le total, pour ne pas les isoler de leurs items : la
+    coupure recule jusqu'à la première position possible, ou avance jusqu'à la
+    suivante si le morceau n'en contient aucune (morceau alors un peu plus long).
+    """
+    def breakable(position: int) -> bool:
+      return kinds[position - 1] != 'title' and kinds[position] not in ('subtotal', 'total')
+    
+    chunks = []
+    start = 0
+    while start < len(kinds):
+      end = min(start + self.table_chunk_size, len(kinds))
+      if end < len(kinds) and not breakable(end):
+        end = (
+          next((position for position in range(end - 1, start, -1) if breakable(position)), None)
+          or next((position for position in range(end + 1, len(kinds)) if breakable(position)), len(kinds))
+        )
+      chunks.append((start, end))
+      start = end
+    return chunks
+  
+  def _create_items_table(self) -> List[Any]:
+    """Crée le tableau des items unifié et compact"""
+    elements = []
     
-    # Application des styles spécifiques selon le type de ligne
-    current_row = 1  # Commence après l'en-tête
+    if not self.item_groups:
+      return elements
     
-    for group_index, group in enumerate(self.item_groups):
-      # Style pour la ligne de titre du groupe
-      if group.title:
-          table_style.extend([
-            ('BACKGROUND', (0, current_row), (-1, current_row), self.SECONDARY_COLOR),
-            ('FONTNAME', (0, current_row), (-1, current_row), 'Times-Bold'),
-            ('FONTSIZE', (0, current_row), (-1, current_row), 9),
-            ('TEXTCOLOR', (0, current_row), (-1, current_row), self.ACCENT_COLOR),
-            ('SPAN', (0, current_row), (4, current_row)),  # Fusion des colonnes
-            ('ALIGN', (0, current_row), (-1, current_row), 'LEFT'),
-            # Éviter la casse juste après un titre de groupe
-            ('NOSPLIT', (0, current_row), (-1, current_row + 1)),
-          ])
-          current_row += 1
-      
-      # Style pour les items normaux avec alternance
-      for item_index, item in enumerate(group.items):
-        if item_index % 2 == 0:
-          table_style.append(('BACKGROUND', (0, current_row), (-1, current_row), self.GREY_LIGHT))
-        current_row += 1
+    # En-tête du tableau principal (colonne TVA si plusieurs taux)
+    if self._items_vat_column:
+      headers = ['DESCRIPTION', 'QTÉ', 'UNITÉ', 'PRIX UNITAIRE HT', 'TVA', 'TOTAL HT']
+      col_widths = [83*mm, 15*mm, 20*mm, 25*mm, 12*mm, 25*mm]
+    else:
+      headers = ['DESCRIPTION', 'QTÉ', 'UNITÉ', 'PRIX UNITAIRE HT', 'TOTAL HT']
+      col_widths = [95*mm, 15*mm, 20*mm, 25*mm, 25*mm]
+    rows, kinds = self._items_table_rows()
+    
+    if len(rows) <= self.large_table_threshold:
+      # Création de la table unifiée avec colonnes réduites
+      items_table = Table([headers] + rows, colWidths=col_widths)
       
-      # Style pour la ligne de sous-total
-      table_style.extend([
-        ('BACKGROUND', (0, current_row), (-1, current_row), self.GRADIENT_START),
-        ('FONTNAME', (0, current_row), (-1, current_row), 'Times-Bold'),
-        ('FONTSIZE', (0, current_row), (-1, current_row), 8),
-        ('ALIGN', (3, current_row), (-1, current_row), 'RIGHT'),
-        ('TEXTCOLOR', (0, current_row), (-1, current_row), self.BLACK),
-        # Éviter la casse juste avant un sous-total
-        ('NOSPLIT', (0, current_row - 1), (-1, current_row)),
-      ])
-      current_row += 1
+      # Répétition de l'en-tête si le tableau doit se couper sur plusieurs pages
+      items_table.repeatRows = 1
+      items_table.setStyle(self._items_table_style(kinds))
       
-      # Ligne de séparation (si pas le dernier groupe)
-      if group_index < len(self.item_groups) - 1:
-        table_style.append(('BACKGROUND', (0, current_row), (-1, current_row), colors.white))
-        current_row += 1
-    
-    # Style pour le total général (dernière ligne)
-    table_style.extend([
-      ('BACKGROUND', (0, -1), (-1, -1), self.ACCENT_COLOR),
-      ('TEXTCOLOR', (0, -1), (-1, -1), self.WHITE),
-      ('FONTNAME', (0, -1), (-1, -1), 'Times-Bold'),
-      ('FONTSIZE', (0, -1), (-1, -1), 10),  # Légèrement plus grand pour le total
-      ('ALIGN', (3, -1), (-1, -1), 'RIGHT'),
-      # Éviter la casse juste avant le total général
-      ('NOSPLIT', (0, -2), (-1, -1)),
-    ])
-    
-    items_table.setStyle(TableStyle(table_style))
-    
-    # Utilisation de KeepTogether pour les premières lignes critiques
-    table_with_constraints = KeepTogether([items_table])
-    elements.append(table_with_constraints)
+      # Utilisation de KeepTogether pour les premières lignes critiques
+      elements.append(KeepTogether([items_table]))
+    else:
+      # Grand devis : une table par morceau, chacune avec son en-tête. La mise en page
+      # d'une seule table de plusieurs milliers de lignes est bien plus coûteuse, et
+      # KeepTogether sur un contenu plus grand qu'une page ne fait que ralentir le rendu.
+      for start, end in self._items_table_chunks(kinds):
+        chunk_table = Table([headers] + rows[start:end], colWidths=col_widths)
+        chunk_table.repeatRows = 1
+        chunk_table.setStyle(self._items_table_style(kinds[start:end]))
+        elements.append(chunk_table)
+    
+    elements.extend(self._create_vat_summary())
     elements.append(Spacer(1, 15))
     
     return elements
   
+  def _create_vat_summary(self) -> List[Any]:
+    """Récapitulatif TVA par taux et total TTC (entreprises soumises à TVA)"""
+    totals = self.totals
+    if not totals.vat_breakdown:
+      return []
+    
+    rows = [['TAUX TVA', 'BASE HT', 'MONTANT TVA']]
+    for line in totals.vat_breakdown:
+      rows.append([format_rate(line.rate, self.locale), self.format_amount(line.base), self.format_amount(line.amount)])
+    rows.append(['TOTAL TVA', '', self.format_amount(totals.vat_amount)])
+    rows.append(['TOTAL TTC', '', self.format_amount(totals.total_ttc)])
+    
+    summary_table = Table(rows, colWidths=[30*mm, 35*mm, 35*mm], hAlign='RIGHT')
+    summary_table.setStyle(TableStyle(list(self.theme.items_table_base_style) + [
+      ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+      ('FONTNAME', (0, -2), (-1, -1), self.theme.fonts.bold),
+      ('BACKGROUND', (0, -1), (-1, -1), self.theme.accent_color),
+      ('TEXTCOLOR', (0, -1), (-1, -1), self.theme.white),
+      ('FONTSIZE', (0, -1), (-1, -1), 10),
+    ]))
+    return [Spacer(1, 8), KeepTogether([summary_table])]
+  
+  def _create_settlement_section(self) -> List[Any]:
+    """Acompte déduit et reste à payer d'une facture, montant d'un avoir"""
+    if self.document_kind == DOCUMENT_QUOTE or (self.document_kind == DOCUMENT_INVOICE and not self.deposit_paid):
+      return []
+    
+    total_label = 'TOTAL TTC' if self.totals.vat_breakdown else 'TOTAL'
+    rows = [['RÈGLEMENT', 'MONTANT'], [total_label, self.format_amount(self.totals.total_ttc)]]
+    if self.document_kind == DOCUMENT_INVOICE:
+      reference = f" (devis {self.quote_reference})" if self.quote_reference else ""
+      rows.append([f"Acompte versé{reference}", self.format_amount(-self.deposit_paid)])
+      rows.append(['RESTE À PAYER', self.format_amount(self.balance_due)])
+    else:
+      rows.append([f"Avoir sur la facture {self.credited_invoice or ''}".strip(), ''])
+      rows.append(["MONTANT DE L'AVOIR", self.format_amount(-self.totals.total_ttc)])
+    
+    settlement_table = Table(rows, colWidths=[65*mm, 35*mm], hAlign='RIGHT')
+    settlement_table.setStyle(TableStyle(list(self.theme.items_table_base_style) + [
+      ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+      ('FONTNAME', (0, -1), (-1, -1), self.theme.fonts.bold),
+      ('BACKGROUND', (0, -1), (-1, -1), self.theme.accent_color),
+      ('TEXTCOLOR', (0, -1), (-1, -1), self.theme.white),
+      ('FONTSIZE', (0, -1), (-1, -1), 10),
+    ]))
+    return [KeepTogether([settlement_table]), Spacer(1, 15)]
+  
   def _create_recurring_payments_table(self) -> List[Any]:
-    """Crée le tableau des frais de gestion récurrents"""
+    """Crée le tableau des formules récurrentes (économies calculées par rapport à la formule la plus chère)"""
+    if not self.recurring_plans:
+      return []
+    
     elements = []
     
     # Titre de la section
-    recurring_title = Paragraph("◆ MAINTENANCE & SUPPORT RÉCURRENTS", self.styles['ElegantSubtitle'])
+    recurring_title = markup_template("◆ MAINTENANCE & SUPPORT RÉCURRENTS", self.styles['ElegantSubtitle']).fill()
     elements.append(recurring_title)
     elements.append(Spacer(1, 10))
     
@@ -673,10 +1793,10 @@ class ModernInvoiceTemplate:
     </font>
     """
     
-    intro_data = [[Paragraph(intro_text, self.styles['SophisticatedNormal'])]]
+    intro_data = [[markup_template(intro_text, self.styles['SophisticatedNormal']).fill()]]
     intro_table = Table(intro_data, colWidths=[180*mm])
     intro_table.setStyle(TableStyle([
-      ('BACKGROUND', (0, 0), (-1, -1), self.GREY_LIGHT),
+      ('BACKGROUND', (0, 0), (-1, -1), self.theme.grey_light),
       ('LEFTPADDING', (0, 0), (-1, -1), 15),
       ('RIGHTPADDING', (0, 0), (-1, -1), 15),
       ('TOPPADDING', (0, 0), (-1, -1), 12),
@@ -687,42 +1807,24 @@ class ModernInvoiceTemplate:
     elements.append(intro_table)
     elements.append(Spacer(1, 12))
     
-    # Tableau des options de maintenance
-    recurring_data = []
-    
-    # En-têtes
-    headers = ['FORMULE', 'ENGAGEMENT', 'PRIX MENSUEL', 'ÉCONOMIE', 'TOTAL']
-    recurring_data.append(headers)
-    
-    # Option mensuelle
-    monthly_row = [
-      'Maintenance Essentielle',
-      '1 mois',
-      '450,00 €',
-      '-',
-      '450,00 € / mois'
-    ]
-    recurring_data.append(monthly_row)
-    
-    # Option semestrielle
-    semester_row = [
-      'Maintenance Premium',
-      '6 mois payés d\'avance',
-      '320,00 €',
-      '130,00 € / mois\n(29% d\'économie)',
-      '1 920,00 € / semestre'
-    ]
-    recurring_data.append(semester_row)
-    
-    # Option annuelle
-    annual_row = [
-      'Maintenance Enterprise',
-      '12 mois payés d\'avance',
-      '280,00 €',
-      '170,00 € / mois\n(38% d\'économie)',
-      '3 360,00 € / an'
-    ]
-    recurring_data.append(annual_row)
+    # Tableau des formules, économies calculées par rapport à la formule au prix mensuel le plus élevé
+    reference = max(self.recurring_plans, key=lambda plan: plan.monthly_price)
+    recurring_data = [['FORMULE', 'ENGAGEMENT', 'PRIX MENSUEL', 'ÉCONOMIE', 'TOTAL']]
+    savings_rows = []
+    for row, plan in enumerate(self.recurring_plans, 1):
+      savings = plan.monthly_savings(reference)
+      if savings:
+        savings_rows.append(row)
+        savings_text = f"{self.format_amount(savings)} / mois\n({plan.savings_rate(reference) * 100:.0f}% d'économie)"
+      else:
+        savings_text = '-'
+      recurring_data.append([
+        plan.name,
+        plan.commitment,
+        self.format_amount(plan.monthly_price),
+        savings_text,
+        f"{self.format_amount(plan.total)} / {plan.period}"
+      ])
     
     # Création de la table
     recurring_table = Table(recurring_data, colWidths=[40*mm, 35*mm, 30*mm, 40*mm, 35*mm])
@@ -733,28 +1835,20 @@ class ModernInvoiceTemplate:
     # Style du tableau
     recurring_table.setStyle(TableStyle([
       # En-tête
-      ('BACKGROUND', (0, 0), (-1, 0), self.PRIMARY_COLOR),
-      ('TEXTCOLOR', (0, 0), (-1, 0), self.WHITE),
-      ('FONTNAME', (0, 0), (-1, 0), 'Times-Bold'),
+      ('BACKGROUND', (0, 0), (-1, 0), self.theme.primary_color),
+      ('TEXTCOLOR', (0, 0), (-1, 0), self.theme.white),
+      ('FONTNAME', (0, 0), (-1, 0), self.theme.fonts.bold),
       ('FONTSIZE', (0, 0), (-1, 0), 9),
       ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
       
       # Lignes de données
-      ('FONTNAME', (0, 1), (-1, -1), 'Times-Roman'),
+      ('FONTNAME', (0, 1), (-1, -1), self.theme.fonts.regular),
       ('FONTSIZE', (0, 1), (-1, -1), 8),
       ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
       ('ALIGN', (0, 1), (0, -1), 'LEFT'),
       
       # Alternance de couleurs
-      ('BACKGROUND', (0, 1), (-1, 1), self.SECONDARY_COLOR),
-      ('BACKGROUND', (0, 2), (-1, 2), self.GREY_LIGHT),
-      ('BACKGROUND', (0, 3), (-1, 3), self.SECONDARY_COLOR),
-      
-      # Mise en évidence des économies
-      ('TEXTCOLOR', (3, 2), (3, 2), self.PRIMARY_COLOR),
-      ('FONTNAME', (3, 2), (3, 2), 'Times-Bold'),
-      ('TEXTCOLOR', (3, 3), (3, 3), self.PRIMARY_COLOR),
-      ('FONTNAME', (3, 3), (3, 3), 'Times-Bold'),
+      ('ROWBACKGROUNDS', (0, 1), (-1, -1), [self.theme.secondary_color, self.theme.grey_light]),
       
       # Padding
       ('TOPPADDING', (0, 0), (-1, -1), 6),
@@ -763,12 +1857,18 @@ class ModernInvoiceTemplate:
       ('RIGHTPADDING', (0, 0), (-1, -1), 6),
       
       # Bordures
-      ('LINEBELOW', (0, 0), (-1, 0), 2, self.ACCENT_COLOR),
-      ('LINEBELOW', (0, 1), (-1, -1), 0.5, self.GREY_MEDIUM),
+      ('LINEBELOW', (0, 0), (-1, 0), 2, self.theme.accent_color),
+      ('LINEBELOW', (0, 1), (-1, -1), 0.5, self.theme.grey_medium),
       ('ROUNDEDCORNERS', (0, 0), (-1, -1), [3, 3, 3, 3]),
       
       # CONTRAINTES DE PAGINATION - Éviter la casse après l'en-tête
-      ('NOSPLIT', (0, 0), (-1, 2)),  # Garde l'en-tête + au moins 2 lignes ensemble
+      ('NOSPLIT', (0, 0), (-1, min(2, len(recurring_data) - 1))),  # Garde l'en-tête + au moins 2 lignes ensemble
+    ] + [
+      # Mise en évidence des économies
+      command for row in savings_rows for command in (
+        ('TEXTCOLOR', (3, row), (3, row), self.theme.primary_color),
+        ('FONTNAME', (3, row), (3, row), self.theme.fonts.bold),
+      )
     ]))
     
     # Utilisation de KeepTogether pour éviter les coupures malheureuses
@@ -785,7 +1885,7 @@ class ModernInvoiceTemplate:
     </i></font>
     """
     
-    note_data = [[Paragraph(note_text, self.styles['SophisticatedNormal'])]]
+    note_data = [[markup_template(note_text, self.styles['SophisticatedNormal']).fill()]]
     note_table = Table(note_data, colWidths=[180*mm])
     note_table.setStyle(TableStyle([
       ('BACKGROUND', (0, 0), (-1, -1), colors.Color(0.98, 0.98, 1.0)),
@@ -802,8 +1902,8 @@ class ModernInvoiceTemplate:
     return elements
 
   def _calculate_total(self) -> Decimal:
-    """Calcule le total général du devis"""
-    return sum(group.subtotal for group in self.item_groups)
+    """Montant total à payer : TTC si la TVA s'applique, HT sinon (les deux sont alors égaux)"""
+    return self.totals.total_ttc
 
   def _create_stripe_payment_link(self) -> Optional[str]:
     """Crée un lien de paiement Stripe et retourne l'URL"""
@@ -818,33 +1918,51 @@ class ModernInvoiceTemplate:
     try:
       total_amount = self._calculate_total()
       # Calcul du montant selon le pourcentage défini
-      payment_amount = total_amount * Decimal(str(self.payment_percentage))
-      # Stripe travaille en centimes
-      amount_in_cents = int(payment_amount * 100)
+      payment_amount = self.deposit_amount
+      # Stripe travaille en unités mineures de la devise (centimes, ou yens pour le yen)
+      amount_in_cents = to_minor_units(payment_amount, self.currency)
       
-      # Création d'un produit Stripe pour ce devis
-      product = stripe.Product.create(
-        name=f"Devis {self.invoice_number} ({self.payment_percentage*100:.0f}%)",
-        description=f"Acompte de {self.payment_percentage*100:.0f}% pour le devis {self.invoice_number} - {self.client_info.name if self.client_info else 'Client'}",
-        metadata={
+      # Lien déjà créé pour ce devis et ce montant : pas de nouvel appel de création
+      registry_key = PaymentLinkRegistry.key(self.invoice_number, amount_in_cents, self.payment_percentage, self.currency.code)
+      if self.payment_link_registry:
+        existing_url = self.payment_link_registry.get(registry_key) or self.payment_link_registry.find_in_stripe(registry_key)
+        if existing_url:
+          self.payment_link_registry.put(registry_key, existing_url, self.invoice_number, amount_in_cents, self.payment_percentage)
+          self.payment_link = existing_url
+          print(f"♻️ Lien de paiement Stripe existant réutilisé : {existing_url}")
+          return existing_url
+      
+      product_params = {
+        "name": f"Devis {self.invoice_number} ({self.payment_percentage*100:.0f}%)",
+        "description": f"Acompte de {self.payment_percentage*100:.0f}% pour le devis {self.invoice_number} - {self.client_info.name if self.client_info else 'Client'}",
+        "metadata": {
           "invoice_number": self.invoice_number,
           "client_name": self.client_info.name if self.client_info else "",
           "company_name": self.company_info.name if self.company_info else "",
           "payment_percentage": str(self.payment_percentage),
           "total_amount": str(total_amount),
-          "payment_amount": str(payment_amount)
+          "payment_amount": str(payment_amount),
+          "currency": self.currency.code,
+          "registry_key": registry_key
         }
-      )
+      }
+      # Clés d'idempotence : relancer la génération du même devis ne crée pas de doublon
+      idempotency_prefix = "devis-" + hashlib.sha256(f"{registry_key}|{product_params}".encode()).hexdigest()[:32]
+      
+      # Création d'un produit Stripe pour ce devis
+      product = stripe.Product.create(idempotency_key=f"{idempotency_prefix}-product", **product_params)
       
       # Création du prix
       price = stripe.Price.create(
+        idempotency_key=f"{idempotency_prefix}-price",
         unit_amount=amount_in_cents,
-        currency="eur",
+        currency=self.currency.code.lower(),
         product=product.id,
       )
       
       # Création du lien de paiement
       payment_link = stripe.PaymentLink.create(
+        idempotency_key=f"{idempotency_prefix}-link",
         line_items=[{
           'price': price.id,
           'quantity': 1,
@@ -867,51 +1985,42 @@ class ModernInvoiceTemplate:
         }
       )
       
+      # URL conservée sur le produit pour la retrouver depuis Stripe
+      stripe.Product.modify(
+        product.id,
+        metadata={"payment_link_url": payment_link.url},
+        idempotency_key=f"{idempotency_prefix}-url"
+      )
+      if self.payment_link_registry:
+        self.payment_link_registry.put(registry_key, payment_link.url, self.invoice_number, amount_in_cents, self.payment_percentage)
+      
       self.payment_link = payment_link.url
       print(f"✅ Lien de paiement Stripe créé : {payment_link.url}")
-      print(f"💰 Montant demandé : {payment_amount:.2f}€ ({self.payment_percentage*100:.0f}% du total)")
+      print(f"💰 Montant demandé : {self.format_amount(payment_amount)} ({self.payment_percentage*100:.0f}% du total)")
       return payment_link.url
         
     except Exception as e:
       print(f"❌ Erreur lors de la création du lien Stripe : {e}")
       return None
   
-  def _generate_qr_code(self, url: str) -> Optional[str]:
-    """Génère un QR code à partir d'une URL et retourne le chemin du fichier"""
+  def _generate_qr_code(self, url: str) -> Optional[Any]:
+    """Génère le QR code d'une URL (via le cache) et retourne le flowable à insérer"""
     if not url:
       return None
     
     try:
-      # Configuration du QR code avec style sophistiqué
-      qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_M,
-        box_size=10,
-        border=4,
-      )
-      qr.add_data(url)
-      qr.make(fit=True)
-      
-      # Création de l'image avec les couleurs de marque
-      qr_image = qr.make_image(
-        fill_color="#19376D",  # Couleur principale bleu marine
-        back_color="white"
-      )
-      
-      # Nom de fichier basé sur le numéro de devis ou timestamp
-      if self.invoice_number:
-        filename = f"qr_code_{self.invoice_number.replace('/', '_').replace('-', '_')}.png"
-      else:
-        from time import time
-        filename = f"qr_code_{int(time())}.png"
+      fill_color = self.theme.primary_color.hexval().replace("0x", "#")
+      size = 25 * mm
       
-      # Sauvegarde dans le dossier courant
-      qr_path = os.path.join(os.getcwd(), filename)
-      qr_image.save(qr_path)
+      if self.qr_code_vector:
+        shapes, width, height = self.qr_code_cache.get_vector(url, fill_color, error_correction=self.qr_code_error_correction)
+        drawing = Drawing(size, size, transform=[size / width, 0, 0, size / height, 0, 0])
+        drawing.add(shapes)
+        drawing.hAlign = 'LEFT'
+        return drawing
       
-      self.qr_code_path = qr_path
-      print(f"✅ QR code généré : {qr_path}")
-      return qr_path
+      qr_image = self.qr_code_cache.get_image(url, fill_color, error_correction=self.qr_code_error_correction)
+      return MemoryImage(qr_image, width=size, height=size, hAlign='LEFT')
         
     except Exception as e:
       print(f"❌ Erreur lors de la génération du QR code : {e}")
@@ -924,13 +2033,15 @@ class ModernInvoiceTemplate:
       return False
     
     # Création du lien de paiement
-    payment_url = self._create_stripe_payment_link()
+    with self._phase("stripe"):
+      payment_url = self._create_stripe_payment_link()
     if not payment_url:
       return False
     
     # Génération du QR code
-    qr_path = self._generate_qr_code(payment_url)
-    if not qr_path:
+    with self._phase("qr_code"):
+      self.qr_code = self._generate_qr_code(payment_url)
+    if self.qr_code is None:
       return False
     
     print(f"🎯 Paiement Stripe configuré avec succès !")
@@ -944,22 +2055,22 @@ class ModernInvoiceTemplate:
     payment_section_elements = []  # Éléments à garder ensemble
     
     # Titre de la section paiement (toujours affiché)
-    payment_title = Paragraph("◆ PAIEMENT SÉCURISÉ", self.styles['ElegantSubtitle'])
+    payment_title = markup_template("◆ PAIEMENT SÉCURISÉ", self.styles['ElegantSubtitle']).fill()
     payment_section_elements.append(payment_title)
     payment_section_elements.append(Spacer(1, 10))
     
     # Mode avec Stripe configuré
-    if self.payment_link and self.qr_code_path:
+    if self.payment_link and self.qr_code is not None:
       try:
         # QR Code
-        qr_image = Image(self.qr_code_path, width=25*mm, height=25*mm, hAlign='LEFT')
+        qr_image = self.qr_code
         
         # Texte explicatif
         payment_text = f"""
-        <font size="11" color="{self.ACCENT_COLOR.hexval()}"><b>Paiement en ligne sécurisé ({self.payment_percentage*100:.0f}% du montant total)</b></font><br/>
-        <font size="9" color="{self.GREY_DARK.hexval()}">
+        <font size="11" color="{self.theme.accent_color.hexval()}"><b>Paiement en ligne sécurisé ({{percentage}}% du montant total)</b></font><br/>
+        <font size="9" color="{self.theme.grey_dark.hexval()}">
         Scannez le QR code avec votre téléphone ou cliquez sur le lien ci-dessous pour procéder au paiement sécurisé via Stripe. 
-        Il s'agit uniquement du paiement initial de {self.payment_percentage*100:.0f}% pour démarrer le projet.<br/><br/>
+        Il s'agit uniquement du paiement initial de {{percentage}}% pour démarrer le projet.<br/><br/>
         
         <b>Moyens de paiement acceptés :</b><br/>
         • Cartes bancaires (Visa, Mastercard, American Express)<br/>
@@ -977,17 +2088,18 @@ class ModernInvoiceTemplate:
         if len(display_link) > 60:
             display_link = display_link[:50] + "..."
         
+        # Lien propre à chaque devis : balisage échappé, non mis en cache
         link_text = f"""
-        <font size="9" color="{self.PRIMARY_COLOR.hexval()}"><b>
-        🌐 Lien de paiement direct (cliquable) :<br/>
-        <link href="{self.payment_link}">{display_link}</link>
+        <font size="9" color="{self.theme.primary_color.hexval()}"><b>
+        {{label}}<br/>
+        <link href="{escape_markup(self.payment_link)}">{escape_markup(display_link)}</link>
         </b></font>
         """
         
         # Organisation en tableau
         payment_data = [[
           qr_image,
-          Paragraph(payment_text, self.styles['SophisticatedNormal'])
+          markup_template(payment_text, self.styles['SophisticatedNormal']).fill(percentage=f"{self.payment_percentage*100:.0f}")
         ]]
         
         payment_table = Table(payment_data, colWidths=[35*mm, 145*mm])
@@ -995,23 +2107,23 @@ class ModernInvoiceTemplate:
           ('ALIGN', (0, 0), (0, 0), 'CENTER'),
           ('ALIGN', (1, 0), (1, 0), 'LEFT'),
           ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-          ('BACKGROUND', (0, 0), (-1, -1), self.SECONDARY_COLOR),
+          ('BACKGROUND', (0, 0), (-1, -1), self.theme.secondary_color),
           ('LEFTPADDING', (0, 0), (-1, -1), 15),
           ('RIGHTPADDING', (0, 0), (-1, -1), 15),
           ('TOPPADDING', (0, 0), (-1, -1), 15),
           ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
           ('ROUNDEDCORNERS', (0, 0), (-1, -1), [8, 8, 8, 8]),
-          ('LINEABOVE', (0, 0), (-1, -1), 3, self.PRIMARY_COLOR),
+          ('LINEABOVE', (0, 0), (-1, -1), 3, self.theme.primary_color),
         ]))
         
         payment_section_elements.append(payment_table)
         payment_section_elements.append(Spacer(1, 10))
         
         # Lien cliquable séparé (plus discret)
-        link_data = [[Paragraph(link_text, self.styles['SophisticatedNormal'])]]
+        link_data = [[MarkupTemplate(link_text, self.styles['SophisticatedNormal']).fill(label="🌐 Lien de paiement direct (cliquable) :")]]
         link_table = Table(link_data, colWidths=[180*mm])
         link_table.setStyle(TableStyle([
-          ('BACKGROUND', (0, 0), (-1, -1), self.GREY_LIGHT),
+          ('BACKGROUND', (0, 0), (-1, -1), self.theme.grey_light),
           ('LEFTPADDING', (0, 0), (-1, -1), 15),
           ('RIGHTPADDING', (0, 0), (-1, -1), 15),
           ('TOPPADDING', (0, 0), (-1, -1), 12),
@@ -1029,7 +2141,7 @@ class ModernInvoiceTemplate:
     
     # Mode démo/fallback (sans Stripe configuré)
     else:
-      print(f"📝 Mode démo : payment_link={bool(self.payment_link)}, qr_code={bool(self.qr_code_path)}")
+      print(f"📝 Mode démo : payment_link={bool(self.payment_link)}, qr_code={self.qr_code is not None}")
       print(f"🔑 Stripe key configurée : {bool(self.stripe_private_key)}")
       fallback_elements = self._create_payment_fallback()
       payment_section_elements.extend(fallback_elements)
@@ -1040,26 +2152,37 @@ class ModernInvoiceTemplate:
     
     return elements
   
+  def _create_payment_section_when_ready(self) -> List[Any]:
+    """Section paiement une fois le lien Stripe obtenu, sans dépasser stripe_timeout"""
+    self._wait_stripe_payment()
+    
+    # Délai dépassé : le virement reste proposé par la section RIB
+    if self._payment_pending and not (self.payment_link and self.qr_code is not None):
+      if self.company_info.rib_iban or self.company_info.rib_bic:
+        return []
+    return self._create_payment_section()
+  
   def _create_payment_fallback(self) -> List[Any]:
     """Crée une section de paiement de démonstration ou fallback"""
     elements = []
     
     # QR Code de démonstration (générique)
     demo_url = "https://example.com/demo-payment"
-    demo_qr_path = self._generate_qr_code(demo_url)
+    with self._phase("qr_code"):
+      demo_qr_code = self._generate_qr_code(demo_url)
     
     try:
-      if demo_qr_path and os.path.exists(demo_qr_path):
-        qr_image = Image(demo_qr_path, width=25*mm, height=25*mm, hAlign='LEFT')
+      if demo_qr_code is not None:
+        qr_image = demo_qr_code
       else:
         # Placeholder si même le QR demo échoue
-        qr_image = Paragraph("📱 QR", self.styles['SophisticatedNormal'])
+        qr_image = markup_template("📱 QR", self.styles['SophisticatedNormal']).fill()
       
       # Texte pour mode démo
       payment_text = f"""
-      <font size="11" color="{self.ACCENT_COLOR.hexval()}"><b>🔒 PAIEMENT SÉCURISÉ</b></font><br/>
-      <font size="9" color="{self.GREY_DARK.hexval()}">
-      {'[MODE DÉMO - Configurez STRIPE_PRIVATE_KEY pour activer les paiements réels]' if not self.stripe_private_key else '[Erreur de configuration Stripe]'}<br/><br/>
+      <font size="11" color="{self.theme.accent_color.hexval()}"><b>🔒 PAIEMENT SÉCURISÉ</b></font><br/>
+      <font size="9" color="{self.theme.grey_dark.hexval()}">
+      {'[MODE DÉMO - Configurez STRIPE_PRIVATE_KEY pour activer les paiements réels]' if not self.stripe_private_key else '[Lien de paiement en cours de création - il vous sera transmis par email]' if self._payment_pending else '[Erreur de configuration Stripe]'}<br/><br/>
       
       <b>💳 Moyens de paiement disponibles :</b><br/>
       • Cartes bancaires (Visa, Mastercard, American Express)<br/>
@@ -1074,7 +2197,7 @@ class ModernInvoiceTemplate:
       # Organisation en tableau
       payment_data = [[
         qr_image,
-        Paragraph(payment_text, self.styles['SophisticatedNormal'])
+        markup_template(payment_text, self.styles['SophisticatedNormal']).fill()
       ]]
       
       payment_table = Table(payment_data, colWidths=[35*mm, 145*mm])
@@ -1082,13 +2205,13 @@ class ModernInvoiceTemplate:
         ('ALIGN', (0, 0), (0, 0), 'CENTER'),
         ('ALIGN', (1, 0), (1, 0), 'LEFT'),
         ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BACKGROUND', (0, 0), (-1, -1), self.SECONDARY_COLOR),
+        ('BACKGROUND', (0, 0), (-1, -1), self.theme.secondary_color),
         ('LEFTPADDING', (0, 0), (-1, -1), 15),
         ('RIGHTPADDING', (0, 0), (-1, -1), 15),
         ('TOPPADDING', (0, 0), (-1, -1), 15),
         ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
         ('ROUNDEDCORNERS', (0, 0), (-1, -1), [8, 8, 8, 8]),
-        ('LINEABOVE', (0, 0), (-1, -1), 3, self.PRIMARY_COLOR),
+        ('LINEABOVE', (0, 0), (-1, -1), 3, self.theme.primary_color),
       ]))
       
       elements.append(payment_table)
@@ -1097,10 +2220,10 @@ class ModernInvoiceTemplate:
       # Instructions de configuration
       if not self.stripe_private_key:
         config_text = f"""
-        <font size="9" color="{self.PRIMARY_COLOR.hexval()}"><b>
+        <font size="9" color="{self.theme.primary_color.hexval()}"><b>
         📋 Configuration requise :<br/>
         </b></font>
-        <font size="8" color="{self.GREY_DARK.hexval()}">
+        <font size="8" color="{self.theme.grey_dark.hexval()}">
         1. Créez un compte Stripe sur stripe.com<br/>
         2. Récupérez votre clé privée (sk_test_... ou sk_live_...)<br/>
         3. Copiez example.env vers .env et ajoutez votre clé<br/>
@@ -1108,10 +2231,10 @@ class ModernInvoiceTemplate:
         </font>
         """
         
-        config_data = [[Paragraph(config_text, self.styles['SophisticatedNormal'])]]
+        config_data = [[markup_template(config_text, self.styles['SophisticatedNormal']).fill()]]
         config_table = Table(config_data, colWidths=[180*mm])
         config_table.setStyle(TableStyle([
-          ('BACKGROUND', (0, 0), (-1, -1), self.GREY_LIGHT),
+          ('BACKGROUND', (0, 0), (-1, -1), self.theme.grey_light),
           ('LEFTPADDING', (0, 0), (-1, -1), 15),
           ('RIGHTPADDING', (0, 0), (-1, -1), 15),
           ('TOPPADDING', (0, 0), (-1, -1), 12),
@@ -1122,20 +2245,17 @@ class ModernInvoiceTemplate:
         elements.append(config_table)
       
       elements.append(Spacer(1, 20))
-      
-      # Note : on ne supprime plus automatiquement le QR de démo
-      # car il peut être utile de le garder pour debug
                 
     except Exception as e:
       print(f"⚠️ Erreur dans payment fallback : {e}")
       # Super fallback - juste du texte
       simple_text = f"""
-      <font size="11" color="{self.ACCENT_COLOR.hexval()}"><b>🔒 PAIEMENT SÉCURISÉ</b></font><br/>
-      <font size="10" color="{self.GREY_DARK.hexval()}">
+      <font size="11" color="{self.theme.accent_color.hexval()}"><b>🔒 PAIEMENT SÉCURISÉ</b></font><br/>
+      <font size="10" color="{self.theme.grey_dark.hexval()}">
       Section de paiement - Configurez STRIPE_PRIVATE_KEY pour activer les fonctionnalités complètes.
       </font>
       """
-      elements.append(Paragraph(simple_text, self.styles['SophisticatedNormal']))
+      elements.append(markup_template(simple_text, self.styles['SophisticatedNormal']).fill())
       elements.append(Spacer(1, 15))
     
     return elements
@@ -1149,32 +2269,32 @@ class ModernInvoiceTemplate:
     rib_section_elements = []  # Éléments à garder ensemble
     
     # Titre de la section RIB
-    rib_title = Paragraph("◆ COORDONNÉES BANCAIRES", self.styles['ElegantSubtitle'])
+    rib_title = markup_template("◆ COORDONNÉES BANCAIRES", self.styles['ElegantSubtitle']).fill()
     rib_section_elements.append(rib_title)
     rib_section_elements.append(Spacer(1, 8))
     
     # Contenu RIB
     rib_content = ""
     if self.company_info.rib_bank:
-      rib_content += f"<b>Banque :</b> {self.company_info.rib_bank}<br/>"
+      rib_content += f"<b>Banque :</b> {escape_markup(self.company_info.rib_bank)}<br/>"
     if self.company_info.rib_iban:
-      rib_content += f"<b>IBAN :</b> {self.company_info.rib_iban}<br/>"
+      rib_content += f"<b>IBAN :</b> {escape_markup(self.company_info.rib_iban)}<br/>"
     if self.company_info.rib_bic:
-      rib_content += f"<b>BIC :</b> {self.company_info.rib_bic}<br/>"
+      rib_content += f"<b>BIC :</b> {escape_markup(self.company_info.rib_bic)}<br/>"
     
-    rib_content += f"<br/><i>Domiciliation : {self.company_info.name}</i>"
+    rib_content += f"<br/><i>Domiciliation : {escape_markup(self.company_info.name)}</i>"
     
     # Encadré RIB élégant
-    rib_data = [[Paragraph(rib_content, self.styles['BoxedContent'])]]
+    rib_data = [[fallback_paragraph(rib_content, self.styles['BoxedContent'])]]
     rib_table = Table(rib_data, colWidths=[180*mm])
     rib_table.setStyle(TableStyle([
-      ('BACKGROUND', (0, 0), (-1, -1), self.SECONDARY_COLOR),
+      ('BACKGROUND', (0, 0), (-1, -1), self.theme.secondary_color),
       ('LEFTPADDING', (0, 0), (-1, -1), 20),
       ('RIGHTPADDING', (0, 0), (-1, -1), 20),
       ('TOPPADDING', (0, 0), (-1, -1), 12),
       ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
       ('ROUNDEDCORNERS', (0, 0), (-1, -1), [8, 8, 8, 8]),
-      ('LINEABOVE', (0, 0), (-1, -1), 2, self.PRIMARY_COLOR),
+      ('LINEABOVE', (0, 0), (-1, -1), 2, self.theme.primary_color),
     ]))
     
     rib_section_elements.append(rib_table)
@@ -1197,15 +2317,15 @@ class ModernInvoiceTemplate:
       # Éléments à garder ensemble (titre + début du contenu)
       footer_section_elements = []
       
-      notes_title = Paragraph("◆ CONDITIONS & MENTIONS", self.styles['ElegantSubtitle'])
+      notes_title = markup_template("◆ CONDITIONS & MENTIONS", self.styles['ElegantSubtitle']).fill()
       footer_section_elements.append(notes_title)
       footer_section_elements.append(Spacer(1, 8))
       
       # Encadré pour les notes
-      notes_data = [[Paragraph(self.notes, self.styles['SophisticatedNormal'])]]
+      notes_data = [[fallback_paragraph(self.notes, self.styles['SophisticatedNormal'])]]
       notes_table = Table(notes_data, colWidths=[180*mm])
       notes_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), self.GREY_LIGHT),
+        ('BACKGROUND', (0, 0), (-1, -1), self.theme.grey_light),
         ('LEFTPADDING', (0, 0), (-1, -1), 15),
         ('RIGHTPADDING', (0, 0), (-1, -1), 15),
         ('TOPPADDING', (0, 0), (-1, -1), 12),
@@ -1218,6 +2338,17 @@ class ModernInvoiceTemplate:
       elements.append(KeepTogether(footer_section_elements))
     
     # Informations légales sophistiquées
+    if self.cached_chrome:
+      elements.extend(CHROME_CACHE.get(self._chrome_key("legal"), self._create_legal_mentions))
+    else:
+      elements.extend(self._create_legal_mentions())
+    
+    return elements
+  
+  def _create_legal_mentions(self) -> List[Any]:
+    """Mentions légales de l'entreprise (SIRET et TVA)"""
+    elements = []
+    
     if self.company_info.siret:
       elements.append(Spacer(1, 10))  # Réduction de l'espace
       
@@ -1228,15 +2359,17 @@ class ModernInvoiceTemplate:
         if self.company_info.vat_number:
           vat_text = f"N° TVA intracommunautaire : {self.company_info.vat_number}"
         else:
-          vat_text = "TVA en sus au taux en vigueur (20%)"
+          # Taux réellement appliqués aux lignes du devis
+          rates = ", ".join(format_rate(line.rate, self.locale) for line in self.totals.vat_breakdown)
+          vat_text = f"TVA en sus ({rates})" if rates else "TVA en sus au taux en vigueur"
       elif self.company_info.vat_status == "company_exempt":
         vat_text = "TVA non applicable - Exonération"
       else:
         vat_text = "TVA non applicable - Article 293B du CGI"  # Fallback
       
       legal_info = f"SIRET : {self.company_info.siret} • {vat_text}"
-      legal_paragraph = Paragraph(
-        f'<font size="8" color="{self.GREY_MEDIUM.hexval()}"><i>{legal_info}</i></font>',
+      legal_paragraph = fallback_paragraph(
+        f'<font size="8" color="{self.theme.grey_medium.hexval()}"><i>{escape_markup(legal_info)}</i></font>',
         self.styles['SophisticatedNormal']
       )
       elements.append(legal_paragraph)
@@ -1244,82 +2377,219 @@ class ModernInvoiceTemplate:
     
     return elements
   
-  def generate_pdf(self, filename: str) -> str:
+  def content_hash(self) -> str:
+    """
+    Empreinte stable de tout ce qui détermine le contenu du PDF
+
+    Couvre les informations du devis, les items, les notes, le contenu du logo,
+    le thème, le lien de paiement et les options de rendu. Les dates n'entrent
+    que par leur jour, tel qu'il est affiché ; les sections ajoutées par
+    add_section, par leur nom seulement.
+    """
+    def day(value: Optional[datetime]) -> Optional[str]:
+      return value.strftime('%Y-%m-%d') if value else None
+    
+    inputs = {
+      "version": RENDER_VERSION,
+      "company": self.company_info,
+      "client": self.client_info,
+      "project": self.project_info,
+      "item_groups": self.item_groups,
+      "invoice_number": self.invoice_number,
+      "invoice_date": day(self.invoice_date),
+      "due_date": day(self.due_date),
+      "invoice_title": self.invoice_title,
+      "document": (self.document_kind, self.quote_reference, str(self.deposit_paid), self.credited_invoice),
+      "notes": self.notes,
+      "payment_percentage": self.payment_percentage,
+      "payment_link": self.payment_link,
+      "rounding": self.rounding,
+      "currency": (self.currency, self.locale, self.price_currency, str(self.exchange_rate)),
+      "vat_rate": self.default_vat_rate,
+      "theme": self.theme,
+      "qr_code": (self.qr_code_vector, self.qr_code_error_correction),
+      "assets": (self.asset_cache.dpi, self.asset_cache.quality),
+      "large_table": (self.large_table_threshold, self.table_chunk_size),
+      "margins": (self.margin_left, self.margin_right, self.margin_top, self.margin_bottom),
+      "sections": self.enabled_sections,
+      "recurring_plans": self.recurring_plans,
+    }
+    # Les dataclasses (gelées ou non) sont décrites par leur repr, qui liste tous leurs champs
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True, default=repr).encode())
+    if self.logo_path and os.path.exists(self.logo_path):
+      digest.update(_read_asset(self.logo_path))
+    return digest.hexdigest()
+  
+  def is_up_to_date(self, filename: str) -> bool:
+    """Indique si le PDF existant a été généré à partir des mêmes données (voir content_hash)"""
+    try:
+      with open(filename, "rb") as f:
+        content = f.read()
+    except OSError:
+      return False
+    return f"{CONTENT_HASH_PREFIX}{self.content_hash()}".encode() in content
+  
+  def generate_pdf(self, filename: str, incremental: bool = False) -> str:
     """
     Génère le PDF du devis ultra-professionnel
     
     Args:
       filename: Nom du fichier PDF à créer
+      incremental: Si True, le PDF n'est pas régénéré lorsque le fichier existant
+        a été produit à partir des mêmes données
         
     Returns:
       Chemin vers le fichier créé
     """
-    if not self.company_info or not self.client_info:
-      raise ValueError("Les informations de l'entreprise et du client doivent être définies")
+    if incremental and self.is_up_to_date(filename):
+      print(f"⏭️ Devis inchangé, PDF conservé : {filename}")
+    else:
+      self.write_pdf(filename)
+    return os.path.abspath(filename)
+  
+  def render_pdf(self) -> bytes:
+    """Génère le PDF du devis en mémoire et retourne son contenu"""
+    buffer = BytesIO()
+    self.write_pdf(buffer)
+    return buffer.getvalue()
+  
+  def write_pdf(self, output: Union[str, BinaryIO]):
+    """
+    Génère le PDF du devis dans un fichier ou un flux
     
-    if not self.item_groups:
-      raise ValueError("Au moins un groupe d'items doit être ajouté")
+    Args:
+      output: Chemin du fichier ou flux binaire inscriptible (BytesIO, réponse HTTP...)
+    """
+    self._check_ready()
     
-    # Configuration automatique du paiement Stripe si la clé est disponible
-    if self.stripe_private_key and not self.payment_link:
-      print("🔄 Configuration automatique du paiement Stripe...")
-      self.setup_stripe_payment()
+    start = perf_counter()
+    report = self.render_report = RenderReport() if self.profiling else None
+    
+    # Empreinte calculée avant la création éventuelle du lien Stripe, comme lors de la vérification
+    content_hash = self.content_hash()
     
     # Utilisation du template personnalisé avec texte en marge
     doc = InvoiceTemplate(
-      filename,
+      output,
       invoice_number=self.invoice_number,
       pagesize=A4,
       leftMargin=self.margin_left,
       rightMargin=self.margin_right,
       topMargin=self.margin_top,
       bottomMargin=self.margin_bottom,
-      title=f"Devis Professionnel {self.invoice_number}",
+      title=f"{self.document.pdf_title} {self.invoice_number}",
       author=self.company_info.name,
-      subject=f"Devis {self.invoice_number} - {self.client_info.name}",
-      creator="Template Devis Ultra-Professionnel"
+      subject=f"{self.document.name} {self.invoice_number} - {self.client_info.name}",
+      creator="Template Devis Ultra-Professionnel",
+      chrome_form=self.cached_chrome,
+      margin_font=self.theme.margin_font,
+      margin_label=self.document.margin_label
     )
+    doc.report = report
+    story = self._build_story()
     
-    # Construction du document sophistiqué
-    story = []
-    
-    # En-tête sophistiqué
-    story.extend(self._create_header())
-    
-    # Titre et informations
-    story.extend(self._create_invoice_title_and_info())
-    
-    # Section projet avec lorem ipsum
-    story.extend(self._create_project_section())
-    
-    # Tableau des items ultra-stylé
-    story.extend(self._create_items_table())
-    
-    # Tableau des frais de gestion récurrents
-    story.extend(self._create_recurring_payments_table())
-    
-    # Section paiement avec QR code
-    story.extend(self._create_payment_section())
-    
-    # Section RIB
-    story.extend(self._create_rib_section())
-    
-    # Pied de page sophistiqué
-    story.extend(self._create_footer())
+    # Lien Stripe attendu mais non obtenu (délai dépassé, erreur) : PDF incomplet,
+    # sans empreinte, pour être régénéré avec le lien au prochain rendu incrémental
+    doc.keywords = "" if self._needs_stripe_payment() else f"{CONTENT_HASH_PREFIX}{content_hash}"
     
     # Génération du PDF
-    doc.build(story)
-    
-    # Nettoyage sélectif des fichiers QR code temporaires
-    if self.qr_code_path and os.path.exists(self.qr_code_path):
-      # On ne supprime que si c'est un QR code de paiement réel (avec payment_link)
-      if self.payment_link and "example.com" not in self.payment_link:
-        try:
-          os.unlink(self.qr_code_path)
-          print("🧹 Fichier QR code temporaire supprimé")
-        except:
-          pass
-      else:
-        print(f"📄 QR code de démo conservé : {self.qr_code_path}")
+    output_start = output.tell() if report and not isinstance(output, str) else 0
+    with self._phase("build"):
+      doc.build(story)
+    
+    if report:
+      report.pages = doc.page
+      report.bytes = os.path.getsize(output) if isinstance(output, str) else output.tell() - output_start
+      report.total = perf_counter() - start
+  
+  def _check_ready(self):
+    """Vérifie que le devis peut être généré"""
+    if not self.company_info or not self.client_info:
+      raise ValueError("Les informations de l'entreprise et du client doivent être définies")
+    
+    if not self.item_groups:
+      raise ValueError("Au moins un groupe d'items doit être ajouté")
+  
+  def _build_story(self) -> List[Any]:
+    """Construit les éléments du devis, dans l'ordre de la page"""
+    report = self.render_report if self.profiling else None
     
-    return os.path.abspath(filename)
\ No newline at end of file
+    # Configuration automatique du paiement Stripe si la clé est disponible,
+    # en arrière-plan pendant la construction des autres sections
+    if self._needs_stripe_payment():
+      print("🔄 Configuration automatique du paiement Stripe...")
+      self.prefetch_stripe_payment()
+    
+    # Seules les sections activées sont construites
+    sections = [(name, build) for name, build in self.sections if name not in self.disabled_sections]
+    
+    # Construction du document sophistiqué, section paiement en dernier
+    # pour laisser au lien Stripe le temps d'être créé
+    built = {}
+    with self._phase("story"):
+      for name, create_section in sorted(sections, key=lambda section: section[0] == "payment"):
+        with report.section(name) if report else nullcontext():
+          built[name] = create_section()
+        if report:
+          for element in built[name]:
+            element._devis_section = name
+    return [element for name, _ in sections for element in built[name]]
+
+
+def render_combined(templates: List[ModernInvoiceTemplate], output: Union[str, BinaryIO], title: str = "Devis") -> int:
+  """
+  Génère plusieurs devis dans un seul PDF (publipostage, impression)
+
+  Chaque devis commence sur une nouvelle page avec son propre modèle de page
+  (numéro en marge), un signet et une entrée dans le sommaire du PDF. Le
+  document étant unique, les polices et les images identiques (logo de
+  l'entreprise) n'y sont intégrées qu'une fois.
+
+  Args:
+    templates: Devis à assembler, dans l'ordre d'impression
+    output: Chemin du fichier ou flux binaire inscriptible
+    title: Titre du document PDF
+
+  Returns:
+    Nombre de pages du PDF
+  """
+  if not templates:
+    raise ValueError("Au moins un devis doit être fourni")
+  for template in templates:
+    template._check_ready()
+  
+  # Liens Stripe de tous les devis créés en parallèle pendant la construction
+  for template in templates:
+    template.render_report = RenderReport() if template.profiling else None
+    if template._needs_stripe_payment():
+      template.prefetch_stripe_payment()
+  
+  first = templates[0]
+  doc = InvoiceTemplate(
+    output,
+    invoice_number=first.invoice_number,
+    pagesize=A4,
+    leftMargin=first.margin_left,
+    rightMargin=first.margin_right,
+    topMargin=first.margin_top,
+    bottomMargin=first.margin_bottom,
+    title=title,
+    author=first.company_info.name,
+    subject=f"{len(templates)} devis",
+    creator="Template Devis Ultra-Professionnel",
+    chrome_form=all(template.cached_chrome for template in templates),
+    margin_font=first.theme.margin_font,
+    margin_label=first.document.margin_label
+  )
+  
+  story = []
+  for index, template in enumerate(templates):
+    if index:
+      template_id = f"devis{index + 1}"
+      doc.add_quote_page_template(template_id, template.invoice_number, template.document.margin_label)
+      story += [NextPageTemplate(template_id), PageBreak()]
+    story.append(QuoteBookmark(f"devis{index + 1}", f"{template.document.name} {template.invoice_number} - {template.client_info.name}"))
+    story.extend(template._build_story())
+  
+  doc.build(story)
+  return doc.page
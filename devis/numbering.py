@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Numérotation des factures et avoirs : séquences chronologiques et sans trou
+
+Utilisation:
+  numbering = InvoiceNumbering("invoice_numbers.sqlite3")
+  number = numbering.allocate("invoice", "facture_DEV-2024-001.pdf")  # 'FA-2024-00001'
+  template.convert_to_invoice(number, deposit_paid=True)
+"""
+
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Optional
+
+# Préfixes des séquences par type de document (une séquence par préfixe et par année)
+NUMBER_PREFIXES = {
+  "invoice": "FA",
+  "credit_note": "AV",
+}
+
+# Format des numéros attribués
+NUMBER_FORMAT = "{prefix}-{year}-{number:05d}"
+
+
+class InvoiceNumbering:
+  """
+  Séquences de numéros partagées entre threads et processus, dans une base SQLite locale
+
+  Chaque attribution est une transaction BEGIN IMMEDIATE : SQLite n'a pas de
+  verrou par ligne, le verrou d'écriture de la base sérialise les attributions
+  des workers concurrents. Le numéro est enregistré avec la clé du document
+  dans la même transaction : une attribution interrompue ne consomme aucun
+  numéro, et un document régénéré (même clé) retrouve le sien, si bien que la
+  séquence ne présente ni doublon ni trou.
+  """
+
+  def __init__(self, path: str = "invoice_numbers.sqlite3", number_format: str = NUMBER_FORMAT,
+               prefixes: Optional[Dict[str, str]] = None):
+    self.path = path
+    self.number_format = number_format
+    self.prefixes = prefixes or NUMBER_PREFIXES
+    with closing(self._connect()) as conn:
+      conn.execute("""
+        CREATE TABLE IF NOT EXISTS sequences (
+          name TEXT PRIMARY KEY,
+          last_number INTEGER NOT NULL
+        )
+      """)
+      conn.execute("""
+        CREATE TABLE IF NOT EXISTS allocations (
+          document_key TEXT PRIMARY KEY,
+          sequence TEXT NOT NULL,
+          number INTEGER NOT NULL,
+          formatted TEXT NOT NULL UNIQUE,
+          allocated_at TEXT NOT NULL
+        )
+      """)
+
+  def _connect(self) -> sqlite3.Connection:
+    # Une connexion par opération, transactions gérées explicitement
+    return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+  def sequence_name(self, kind: str, date: Optional[datetime] = None) -> str:
+    """Séquence d'un type de document pour l'année de la date (année courante par défaut)"""
+    try:
+      prefix = self.prefixes[kind]
+    except KeyError:
+      raise ValueError(f"Type de document sans numérotation : {kind}")
+    return f"{prefix}-{(date or datetime.now()).year}"
+
+  def allocate(self, kind: str, document_key: str, date: Optional[datetime] = None) -> str:
+    """
+    Attribue le numéro suivant de la séquence à un document
+
+    Args:
+      kind: Type de document ("invoice" ou "credit_note")
+      document_key: Identifiant stable du document ; une nouvelle demande pour la
+        même clé retourne le numéro déjà attribué
+      date: Date du document, qui détermine l'année de la séquence
+    """
+    sequence = self.sequence_name(kind, date)
+    prefix, year = sequence.rsplit("-", 1)
+    conn = self._connect()
+    try:
+      conn.execute("BEGIN IMMEDIATE")
+      row = conn.execute("SELECT formatted FROM allocations WHERE document_key = ?", (document_key,)).fetchone()
+      if row:
+        conn.execute("COMMIT")
+        return row[0]
+      conn.execute("INSERT OR IGNORE INTO sequences VALUES (?, 0)", (sequence,))
+      conn.execute("UPDATE sequences SET last_number = last_number + 1 WHERE name = ?", (sequence,))
+      number = conn.execute("SELECT last_number FROM sequences WHERE name = ?", (sequence,)).fetchone()[0]
+      formatted = self.number_format.format(prefix=prefix, year=year, number=number)
+      conn.execute(
+        "INSERT INTO allocations VALUES (?, ?, ?, ?, ?)",
+        (document_key, sequence, number, formatted, datetime.now().isoformat())
+      )
+      conn.execute("COMMIT")
+      return formatted
+    except BaseException:
+      if conn.in_transaction:
+        conn.execute("ROLLBACK")
+      raise
+    finally:
+      conn.close()
+
+  def get(self, document_key: str) -> Optional[str]:
+    """Retourne le numéro déjà attribué à un document"""
+    with closing(self._connect()) as conn:
+      row = conn.execute("SELECT formatted FROM allocations WHERE document_key = ?", (document_key,)).fetchone()
+    return row[0] if row else None
+
+  def last_number(self, kind: str, date: Optional[datetime] = None) -> int:
+    """Dernier numéro attribué dans la séquence (0 si aucun)"""
+    with closing(self._connect()) as conn:
+      row = conn.execute("SELECT last_number FROM sequences WHERE name = ?", (self.sequence_name(kind, date),)).fetchone()
+    return row[0] if row else 0
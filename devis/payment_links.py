@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registre des liens de paiement Stripe : un seul lien par devis et par montant
+
+Utilisation:
+  registry = PaymentLinkRegistry("payment_links.sqlite3")
+  template.set_payment_link_registry(registry)
+  provision_payment_links(templates, max_workers=8)  # Provisionnement concurrent d'un lot
+"""
+
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import List, Optional, Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+import stripe
+
+
+class PaymentLinkRegistry:
+  """
+  Registre local des liens de paiement, indexé par (numéro de devis, montant en centimes, pourcentage)
+
+  Les liens sont conservés dans une base SQLite locale. En l'absence d'entrée
+  locale, le produit Stripe correspondant est recherché par ses métadonnées
+  avant toute création, ce qui évite les doublons même sans la base locale.
+  """
+
+  def __init__(self, path: str = "payment_links.sqlite3"):
+    self.path = path
+    with closing(self._connect()) as conn, conn:
+      conn.execute("""
+        CREATE TABLE IF NOT EXISTS payment_links (
+          registry_key TEXT PRIMARY KEY,
+          url TEXT NOT NULL,
+          invoice_number TEXT NOT NULL,
+          amount_in_cents INTEGER NOT NULL,
+          percentage TEXT NOT NULL,
+          created_at TEXT NOT NULL
+        )
+      """)
+
+  def _connect(self) -> sqlite3.Connection:
+    # Une connexion par opération, fermée ensuite : le registre peut être partagé entre threads
+    return sqlite3.connect(self.path, timeout=30)
+
+  @staticmethod
+  def key(invoice_number: str, amount_in_cents: int, percentage: float, currency: str = "EUR") -> str:
+    """Clé d'un lien (montant en unités mineures de la devise ; les liens en euros gardent leur clé d'origine)"""
+    suffix = "" if currency.upper() == "EUR" else f":{currency.upper()}"
+    return f"{invoice_number}:{amount_in_cents}:{percentage}{suffix}"
+
+  def get(self, registry_key: str) -> Optional[str]:
+    """Retourne l'URL enregistrée localement pour cette clé"""
+    with closing(self._connect()) as conn, conn:
+      row = conn.execute("SELECT url FROM payment_links WHERE registry_key = ?", (registry_key,)).fetchone()
+    return row[0] if row else None
+
+  def put(self, registry_key: str, url: str, invoice_number: str, amount_in_cents: int, percentage: float):
+    """Enregistre le lien de paiement d'un devis"""
+    with closing(self._connect()) as conn, conn:
+      conn.execute(
+        "INSERT OR REPLACE INTO payment_links VALUES (?, ?, ?, ?, ?, ?)",
+        (registry_key, url, invoice_number, amount_in_cents, str(percentage), datetime.now().isoformat())
+      )
+
+  def find_in_stripe(self, registry_key: str) -> Optional[str]:
+    """
+    Recherche un lien déjà créé sur Stripe via les métadonnées du produit
+
+    Une recherche en échec (Search indisponible, erreur réseau) retourne None :
+    la création du lien se poursuit, protégée des doublons par les clés d'idempotence.
+    """
+    query = "metadata['registry_key']:'{}'".format(registry_key.replace("'", "\\'"))
+    try:
+      products = stripe.Product.search(query=query).data
+    except stripe.StripeError as e:
+      print(f"⚠️ Recherche du lien de paiement sur Stripe impossible : {e}")
+      return None
+    for product in products:
+      metadata = product.metadata.to_dict() if product.metadata else {}
+      url = metadata.get("payment_link_url")
+      if url:
+        return url
+    return None
+
+
+def provision_payment_links(templates: Iterable, max_workers: int = 8) -> List[Optional[str]]:
+  """
+  Crée en parallèle les liens de paiement d'un lot de devis (ModernInvoiceTemplate)
+
+  Returns:
+    Les URLs dans l'ordre des templates (None en cas d'échec)
+  """
+  def provision(template) -> Optional[str]:
+    if not template.payment_link:
+      template.setup_stripe_payment()
+    return template.payment_link
+
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    return list(executor.map(provision, templates))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rapport de rendu des devis : durée de chaque étape, pages et taille du PDF
+
+Utilisation:
+  template.set_profiling()
+  template.generate_pdf("devis.pdf")
+  print(template.render_report.format())
+
+  # Sur un lot (QuoteSpec(profile=True)) :
+  print(RenderReport.aggregate(result.report for result in results).format())
+"""
+
+from time import perf_counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Tuple, Iterable
+
+
+@dataclass
+class RenderReport:
+  """Durées (en secondes) des étapes du rendu d'un devis"""
+  phases: Dict[str, float] = field(default_factory=dict)  # Stripe, QR code, construction, mise en page...
+  sections: Dict[str, float] = field(default_factory=dict)  # Construction des éléments de chaque section
+  layout: Dict[str, float] = field(default_factory=dict)  # Mise en page et dessin ReportLab par section
+  flowables: List[Tuple[str, str, float]] = field(default_factory=list)  # (section, type d'élément, durée)
+  pages: int = 0
+  bytes: int = 0
+  total: float = 0.0
+  documents: int = 1
+
+  @staticmethod
+  def _add(bucket: Dict[str, float], name: str, seconds: float):
+    bucket[name] = bucket.get(name, 0.0) + seconds
+
+  @contextmanager
+  def phase(self, name: str):
+    """Chronomètre une étape (les durées d'une même étape s'additionnent)"""
+    start = perf_counter()
+    try:
+      yield
+    finally:
+      self._add(self.phases, name, perf_counter() - start)
+
+  @contextmanager
+  def section(self, name: str):
+    """Chronomètre la construction des éléments d'une section"""
+    start = perf_counter()
+    try:
+      yield
+    finally:
+      self._add(self.sections, name, perf_counter() - start)
+
+  def add_flowable(self, section: str, kind: str, seconds: float):
+    """Enregistre la mise en page d'un élément par ReportLab"""
+    self.flowables.append((section, kind, seconds))
+    self._add(self.layout, section, seconds)
+
+  def slowest_flowables(self, count: int = 5) -> List[Tuple[str, str, float]]:
+    return sorted(self.flowables, key=lambda flowable: flowable[2], reverse=True)[:count]
+
+  def to_dict(self) -> dict:
+    """Rapport sérialisable (journalisation JSON, transfert entre processus)"""
+    return asdict(self)
+
+  @classmethod
+  def from_dict(cls, data: dict) -> "RenderReport":
+    return cls(**{**data, "flowables": [tuple(flowable) for flowable in data.get("flowables", [])]})
+
+  @classmethod
+  def aggregate(cls, reports: Iterable["RenderReport"]) -> "RenderReport":
+    """Additionne les rapports d'un lot (les détails par élément ne sont pas conservés)"""
+    total = cls(documents=0)
+    for report in reports:
+      if report is None:
+        continue
+      if isinstance(report, dict):
+        report = cls.from_dict(report)
+      for bucket in ("phases", "sections", "layout"):
+        for name, seconds in getattr(report, bucket).items():
+          cls._add(getattr(total, bucket), name, seconds)
+      total.pages += report.pages
+      total.bytes += report.bytes
+      total.total += report.total
+      total.documents += report.documents
+    return total
+
+  def format(self) -> str:
+    """Rapport lisible, étapes triées par durée décroissante"""
+    def block(title: str, bucket: Dict[str, float]) -> List[str]:
+      lines = [f"  {title}"]
+      for name, seconds in sorted(bucket.items(), key=lambda item: item[1], reverse=True):
+        share = seconds / self.total * 100 if self.total else 0
+        lines.append(f"    {name:<32} {seconds * 1000:9.1f} ms  {share:5.1f} %")
+      return lines
+
+    lines = [
+      f"📊 {self.documents} document(s), {self.pages} page(s), {self.bytes / 1024:.1f} Ko, {self.total * 1000:.1f} ms"
+    ]
+    lines += block("Étapes", self.phases)
+    lines += block("Construction des sections", self.sections)
+    lines += block("Mise en page par section", self.layout)
+    if self.flowables:
+      lines.append("  Éléments les plus lents")
+      for section, kind, seconds in self.slowest_flowables():
+        lines.append(f"    {section + ' / ' + kind:<32} {seconds * 1000:9.1f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Format déclaratif des devis (JSON ou YAML) validé par schéma
+
+Exemple (YAML):
+  number: DEV-2024-001
+  company: {name: Digital Solutions SARL, address: 42 Avenue des Technologies,
+            postal_code: "75008", city: Paris, phone: 01 42 85 96 47, email: contact@example.com}
+  client: {name: Entreprise ModaStyle, address: 156 Rue du Commerce, postal_code: "69002", city: Lyon}
+  groups:
+    - title: Conception
+      items:
+        - {description: Maquettes, quantity: 3, unit: jour, unit_price: "650.00"}
+
+Utilisation:
+  for loaded in iter_documents("devis/"):
+    spec = loaded.document.to_spec(loaded.base_dir) if loaded.ok else None
+"""
+
+import os
+import sys
+import json
+import hashlib
+from datetime import date as Date, datetime, time
+from decimal import Decimal
+from typing import List, Optional, Literal, Iterator
+from dataclasses import dataclass
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+from invoice import ModernInvoiceTemplate, CompanyInfo, ClientInfo, ProjectInfo, ItemGroup, InvoiceItem, RecurringPlan, DOCUMENT_KINDS
+from bulk import QuoteSpec
+from currency import CURRENCIES, LOCALE_CONVENTIONS
+
+# Extensions reconnues lors du parcours d'un dossier
+DOCUMENT_EXTENSIONS = (".json", ".jsonl", ".yaml", ".yml")
+
+# Séparateurs de chemin remplacés dans les noms de fichier dérivés du numéro
+PATH_SEPARATORS = ("/", "\\")
+
+# Noms des sections pouvant être omises
+SectionName = Literal[tuple(name for name, _ in ModernInvoiceTemplate.SECTIONS)]
+
+# Types de document : devis, facture ou avoir
+DocumentKindName = Literal[tuple(DOCUMENT_KINDS)]
+
+# Devises et langues prises en charge
+CurrencyCode = Literal[tuple(CURRENCIES)]
+LocaleName = Literal[tuple(LOCALE_CONVENTIONS)]
+
+
+class _Model(BaseModel):
+  # Les champs inconnus sont refusés : une faute de frappe ne doit pas passer inaperçue
+  model_config = ConfigDict(extra="forbid")
+
+
+class CompanyModel(_Model):
+  name: str
+  address: str
+  postal_code: str
+  city: str
+  phone: str
+  email: str
+  siret: Optional[str] = None
+  website: Optional[str] = None
+  rib_iban: Optional[str] = None
+  rib_bic: Optional[str] = None
+  rib_bank: Optional[str] = None
+  vat_status: Literal["auto_entrepreneur", "company_with_vat", "company_exempt"] = "auto_entrepreneur"
+  vat_number: Optional[str] = None
+
+
+class ClientModel(_Model):
+  name: str
+  address: str
+  postal_code: str
+  city: str
+  email: Optional[str] = None
+
+
+class ProjectModel(_Model):
+  title: str
+  description: str = ""
+
+
+class ItemModel(_Model):
+  description: str
+  quantity: Decimal = Field(..., gt=0)
+  unit_price: Decimal
+  unit: str = "unité"
+  vat_rate: Optional[Decimal] = Field(None, ge=0, le=1)  # Taux propre à la ligne (0.055)
+
+
+class GroupModel(_Model):
+  title: str = ""
+  items: List[ItemModel] = Field(..., min_length=1)
+
+
+class RecurringPlanModel(_Model):
+  name: str
+  monthly_price: Decimal = Field(..., ge=0)
+  months: int = Field(1, ge=1)
+
+
+class QuoteDocument(_Model):
+  """Document décrivant un devis complet"""
+  number: str
+  filename: Optional[str] = None  # Nom du PDF, "<number>.pdf" par défaut
+  title: Optional[str] = None
+  date: Optional[Date] = None
+  due_date: Optional[Date] = None
+  company: CompanyModel
+  client: ClientModel
+  project: Optional[ProjectModel] = None
+  groups: List[GroupModel] = Field(..., min_length=1)
+  notes: str = ""
+  logo: Optional[str] = None  # Chemin relatif au document
+  payment_percentage: float = Field(1.0, ge=0.0, le=1.0)
+  payment_link: Optional[str] = None
+  rounding: Literal["line", "total"] = "line"
+  recurring_plans: Optional[List[RecurringPlanModel]] = None  # Formules par défaut si absent, aucune si []
+  currency: CurrencyCode = "EUR"
+  locale: Optional[LocaleName] = None
+  price_currency: Optional[CurrencyCode] = None  # Devise des prix des items si elle diffère de currency
+  vat_rate: Optional[Decimal] = Field(None, ge=0, le=1)  # Taux des lignes sans taux propre
+  disabled_sections: List[SectionName] = []
+  kind: DocumentKindName = "quote"
+  quote_reference: Optional[str] = None  # Devis d'origine d'une facture ou d'un avoir
+  deposit_paid: bool = False  # Acompte du devis versé, déduit de la facture
+  credited_invoice: Optional[str] = None  # Facture annulée par un avoir
+
+  @field_validator("filename")
+  @classmethod
+  def _check_filename(cls, value: Optional[str]) -> Optional[str]:
+    # Le PDF est écrit dans le dossier de sortie, jamais ailleurs
+    if value is not None and (value in (".", "..") or any(sep in value for sep in PATH_SEPARATORS)):
+      raise ValueError("nom de fichier sans chemin attendu (ni séparateur, ni '..')")
+    return value
+
+  @property
+  def output_filename(self) -> str:
+    if self.filename:
+      return self.filename
+    number = self.number
+    for separator in PATH_SEPARATORS:
+      number = number.replace(separator, "_")
+    return f"{number}.pdf"
+
+  def logo_path(self, base_dir: str) -> Optional[str]:
+    return os.path.join(base_dir, self.logo) if self.logo else None
+
+  def content_hash(self, base_dir: str = ".") -> str:
+    """Empreinte du document (et du logo) : identique tant que le devis ne change pas"""
+    digest = hashlib.sha256(self.model_dump_json().encode())
+    logo_path = self.logo_path(base_dir)
+    if logo_path and os.path.exists(logo_path):
+      with open(logo_path, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+  def to_spec(self, base_dir: str = ".") -> QuoteSpec:
+    """Convertit le document en QuoteSpec pour la génération en lot"""
+    def as_datetime(value: Optional[Date]) -> Optional[datetime]:
+      return datetime.combine(value, time()) if value else None
+
+    return QuoteSpec(
+      filename=self.output_filename,
+      company=CompanyInfo(**self.company.model_dump()),
+      client=ClientInfo(**self.client.model_dump()),
+      item_groups=[
+        ItemGroup(group.title, [InvoiceItem(**item.model_dump()) for item in group.items])
+        for group in self.groups
+      ],
+      invoice_number=self.number,
+      invoice_date=as_datetime(self.date),
+      due_date=as_datetime(self.due_date),
+      project=ProjectInfo(**self.project.model_dump()) if self.project else None,
+      notes=self.notes,
+      logo_path=self.logo_path(base_dir),
+      payment_percentage=self.payment_percentage,
+      invoice_title=self.title,
+      payment_link=self.payment_link,
+      rounding=self.rounding,
+      recurring_plans=(
+        [RecurringPlan(**plan.model_dump()) for plan in self.recurring_plans]
+        if self.recurring_plans is not None else None
+      ),
+      disabled_sections=tuple(self.disabled_sections),
+      currency=self.currency,
+      locale=self.locale,
+      price_currency=self.price_currency,
+      vat_rate=self.vat_rate,
+      document_kind=self.kind,
+      quote_reference=self.quote_reference,
+      deposit_paid=self.deposit_paid,
+      credited_invoice=self.credited_invoice
+    )
+
+
+@dataclass
+class LoadedDocument:
+  """Document lu depuis un fichier (ou erreur de lecture/validation)"""
+  source: str
+  base_dir: str
+  document: Optional[QuoteDocument] = None
+  error: Optional[str] = None
+
+  @property
+  def ok(self) -> bool:
+    return self.error is None
+
+
+def _load_yaml(text: str):
+  try:
+    import yaml
+  except ImportError:
+    raise ValueError("PyYAML est requis pour lire les devis YAML (pip install pyyaml)")
+  try:
+    return yaml.safe_load(text)
+  except yaml.YAMLError as e:
+    raise ValueError(str(e))
+
+def _validate(source: str, base_dir: str, data) -> LoadedDocument:
+  try:
+    return LoadedDocument(source, base_dir, document=QuoteDocument.model_validate(data))
+  except ValidationError as e:
+    return LoadedDocument(source, base_dir, error=str(e))
+
+def _iter_lines(source: str, lines, base_dir: str) -> Iterator[LoadedDocument]:
+  """Un devis JSON par ligne (JSONL)"""
+  for line_number, line in enumerate(lines, 1):
+    if not line.strip():
+      continue
+    try:
+      data = json.loads(line)
+    except ValueError as e:
+      yield LoadedDocument(f"{source}:{line_number}", base_dir, error=f"JSON invalide : {e}")
+      continue
+    yield _validate(f"{source}:{line_number}", base_dir, data)
+
+def _iter_file(path: str) -> Iterator[LoadedDocument]:
+  base_dir = os.path.dirname(os.path.abspath(path))
+  extension = os.path.splitext(path)[1].lower()
+  try:
+    with open(path, encoding="utf-8") as f:
+      if extension == ".jsonl":
+        yield from _iter_lines(path, f, base_dir)
+        return
+      text = f.read()
+    data = _load_yaml(text) if extension in (".yaml", ".yml") else json.loads(text)
+  except (OSError, ValueError) as e:
+    yield LoadedDocument(path, base_dir, error=f"Lecture impossible : {e}")
+    return
+  yield _validate(path, base_dir, data)
+
+def iter_documents(path: str) -> Iterator[LoadedDocument]:
+  """
+  Lit les devis d'un fichier (JSON, YAML ou JSONL), d'un dossier ou de l'entrée standard ("-", JSONL)
+
+  Les erreurs de lecture ou de validation sont rapportées dans le LoadedDocument
+  correspondant sans interrompre la lecture des autres devis.
+  """
+  if path == "-":
+    yield from _iter_lines("<stdin>", sys.stdin, os.getcwd())
+  elif os.path.isdir(path):
+    for name in sorted(os.listdir(path)):
+      if name.lower().endswith(DOCUMENT_EXTENSIONS):
+        yield from _iter_file(os.path.join(path, name))
+  else:
+    yield from _iter_file(path)
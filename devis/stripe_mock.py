@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serveur local imitant l'API Stripe (produits, prix, liens de paiement) pour les tests
+
+Utilisation:
+  server, api_base = start_stripe_mock()
+  stripe.api_base = api_base
+  ...
+  server.delay = 0.5          # Latence simulée des créations
+  server.search_error = True  # Recherche de produits en échec
+  print(server.created)       # Nombre d'objets créés par type
+  server.shutdown()
+"""
+
+import re
+import json
+import time
+import threading
+from itertools import count
+from urllib.parse import urlparse, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _decode_form(body: str) -> dict:
+  """Décode les paramètres Stripe (metadata[cle]=valeur) en dictionnaire imbriqué"""
+  params = {}
+  for raw_key, value in parse_qsl(body, keep_blank_values=True):
+    parts = re.findall(r'[^\[\]]+', raw_key)
+    target = params
+    for part in parts[:-1]:
+      target = target.setdefault(part, {})
+    target[parts[-1]] = value
+  return params
+
+
+class StripeMockHandler(BaseHTTPRequestHandler):
+  def _reply(self, payload: dict, status: int = 200):
+    data = json.dumps(payload).encode()
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def do_GET(self):
+    url = urlparse(self.path)
+    if url.path == "/v1/products/search" and self.server.search_error:
+      self._reply({"error": {"type": "api_error", "message": "Search unavailable"}}, 500)
+    elif url.path == "/v1/products/search":
+      query = dict(parse_qsl(url.query)).get("query", "")
+      match = re.match(r"metadata\['([^']+)'\]:'(.*)'$", query)
+      with self.server.lock:
+        data = [
+          product for product in self.server.objects.values()
+          if match and product["object"] == "product" and product["metadata"].get(match.group(1)) == match.group(2)
+        ]
+      self._reply({"object": "search_result", "url": url.path, "has_more": False, "data": data})
+    else:
+      self._reply({"error": {"type": "invalid_request_error", "message": "Unknown route"}}, 404)
+
+  def do_POST(self):
+    time.sleep(self.server.delay)
+    params = _decode_form(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+    idempotency_key = self.headers.get("Idempotency-Key")
+
+    with self.server.lock:
+      if idempotency_key and idempotency_key in self.server.idempotent_responses:
+        self._reply(self.server.idempotent_responses[idempotency_key])
+        return
+
+      path = urlparse(self.path).path
+      update = re.match(r"/v1/products/([^/]+)$", path)
+      if update and update.group(1) in self.server.objects:
+        product = self.server.objects[update.group(1)]
+        product["metadata"].update(params.get("metadata", {}))
+        payload = product
+      elif path in ("/v1/products", "/v1/prices", "/v1/payment_links"):
+        object_type = path.rsplit("/", 1)[1].rstrip("s")
+        object_id = f"{object_type[:4]}_{next(self.server.ids)}"
+        payload = {"id": object_id, "object": object_type, "metadata": params.get("metadata", {}), **{
+          key: value for key, value in params.items() if key != "metadata"
+        }}
+        if object_type == "payment_link":
+          payload["url"] = f"https://buy.stripe.com/test_{object_id}"
+        self.server.objects[object_id] = payload
+        self.server.created[object_type] = self.server.created.get(object_type, 0) + 1
+      else:
+        self._reply({"error": {"type": "invalid_request_error", "message": "Unknown route"}}, 404)
+        return
+
+      if idempotency_key:
+        self.server.idempotent_responses[idempotency_key] = payload
+    self._reply(payload)
+
+  def log_message(self, format, *args):
+    pass
+
+
+def start_stripe_mock(host: str = "127.0.0.1", port: int = 0):
+  """Démarre le serveur dans un thread et renvoie (server, api_base)"""
+  server = ThreadingHTTPServer((host, port), StripeMockHandler)
+  server.lock = threading.Lock()
+  server.ids = count(1)
+  server.objects = {}
+  server.created = {}
+  server.idempotent_responses = {}
+  server.delay = 0.0  # Latence simulée de chaque création (secondes)
+  server.search_error = False  # Recherche de produits en échec
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server, f"http://{host}:{server.server_address[1]}"
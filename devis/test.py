@@ -0,0 +1,570 @@
+import os
+import json
+import time
+import tempfile
+from unittest.mock import patch
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import stripe
+
+from invoice import (
+  ModernInvoiceTemplate, Theme, CompanyInfo, ClientInfo, ItemGroup, InvoiceItem,
+  ProjectInfo, QuoteTotals, AssetCache, QRCodeCache, CHROME_CACHE, CONTENT_HASH_PREFIX, markup_template, fallback_paragraph, render_combined, RecurringPlan, ROUNDING_PER_LINE, ROUNDING_PER_TOTAL
+)
+from PIL import Image as PILImage
+from io import BytesIO, StringIO
+from contextlib import redirect_stdout
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, Table
+from payment_links import PaymentLinkRegistry, provision_payment_links
+from stripe_mock import start_stripe_mock
+from cli import render
+from profiling import RenderReport
+from currency import ExchangeRates, money_formatter, format_money, to_minor_units
+from fonts import FONT_REGISTRY, FontRegistry, find_font
+from numbering import InvoiceNumbering
+from bulk import QuoteSpec, generate_many
+
+def create_template(invoice_number: str, registry: PaymentLinkRegistry = None) -> ModernInvoiceTemplate:
+  """Crée un devis minimal pour les tests"""
+  template = ModernInvoiceTemplate()
+  template.set_company_info(CompanyInfo("Société", "1 rue de Paris", "75001", "Paris", "0100000000", "contact@societe.fr"))
+  template.set_client_info(ClientInfo("Client", "2 rue de Lyon", "69001", "Lyon"))
+  template.add_item_group(ItemGroup("Prestations", [InvoiceItem("Développement", 2, Decimal("500"))]))
+  template.set_invoice_details(invoice_number)
+  if registry:
+    template.set_payment_link_registry(registry)
+  return template
+
+def test_payment_link_registry():
+  """Test du registre des liens de paiement (mock local de l'API Stripe, ne nécessite pas de clé API)"""
+  server, api_base = start_stripe_mock()
+  previous_api_base, stripe.api_base = stripe.api_base, api_base
+  previous_api_key = stripe.api_key
+  # Clé factice limitée à ce test : les tests suivants restent en mode démo, sans appel réseau
+  environment = patch.dict(os.environ, {"STRIPE_PRIVATE_KEY": "sk_test_mock"})
+  environment.start()
+  try:
+    with tempfile.TemporaryDirectory() as tmp:
+      registry = PaymentLinkRegistry(os.path.join(tmp, "payment_links.sqlite3"))
+
+      # Régénérer le même devis ne crée pas de doublons
+      first = create_template("DEV-001", registry)
+      first.setup_stripe_payment()
+      second = create_template("DEV-001", registry)
+      second.setup_stripe_payment()
+      assert first.payment_link == second.payment_link
+      assert server.created == {"product": 1, "price": 1, "payment_link": 1}, server.created
+
+      # Sans registre local, le lien est retrouvé sur Stripe par les métadonnées
+      other_registry = PaymentLinkRegistry(os.path.join(tmp, "other.sqlite3"))
+      third = create_template("DEV-001", other_registry)
+      third.setup_stripe_payment()
+      assert third.payment_link == first.payment_link
+      assert server.created["payment_link"] == 1
+
+      # Recherche Stripe en échec : le lien est tout de même créé
+      server.search_error = True
+      fourth = create_template("DEV-SEARCH-001", PaymentLinkRegistry(os.path.join(tmp, "search.sqlite3")))
+      fourth.setup_stripe_payment()
+      assert fourth.payment_link and server.created["payment_link"] == 2
+      server.search_error = False
+
+      # Provisionnement concurrent d'un lot
+      templates = [create_template(f"DEV-{n:03d}", registry) for n in range(2, 7)]
+      links = provision_payment_links(templates)
+      assert all(links) and len(set(links)) == len(templates)
+      assert server.created["payment_link"] == 7
+      print("✅ Registre des liens de paiement :", server.created)
+  finally:
+    environment.stop()
+    stripe.api_base, stripe.api_key = previous_api_base, previous_api_key
+    server.shutdown()
+
+def test_stripe_timeout():
+  """Test du lien Stripe créé en arrière-plan avec délai maximal (mock lent de l'API Stripe)"""
+  server, api_base = start_stripe_mock()
+  server.delay = 0.3
+  previous_api_base, stripe.api_base = stripe.api_base, api_base
+  previous_api_key = stripe.api_key
+  environment = patch.dict(os.environ, {"STRIPE_PRIVATE_KEY": "sk_test_mock"})
+  environment.start()
+  try:
+    # Délai dépassé : devis généré sans attendre le lien, et sans empreinte
+    template = create_template("DEV-TIMEOUT-001")
+    template.set_stripe_timeout(0.1)
+    start = time.perf_counter()
+    pdf = template.render_pdf()
+    assert time.perf_counter() - start < 0.9 and template._payment_pending
+    assert b"buy.stripe.com" not in pdf and CONTENT_HASH_PREFIX.encode() not in pdf
+
+    # Le lien obtenu ensuite sert au rendu suivant
+    template._payment_future.result()
+    assert b"buy.stripe.com" in template.render_pdf() and not template._payment_pending
+    print("✅ Lien Stripe en arrière-plan :", template.payment_link)
+  finally:
+    environment.stop()
+    stripe.api_base, stripe.api_key = previous_api_base, previous_api_key
+    server.shutdown()
+
+def test_quote_totals():
+  """Test des totaux arrondis au centime selon la règle d'arrondi"""
+  item = InvoiceItem("Article", 1.1, Decimal("0.105"))
+  assert item.quantity == Decimal("1.1") and item.total_price == Decimal("0.1155")
+  group = ItemGroup("Groupe", [item, item, item])
+
+  per_line = QuoteTotals.compute([group], rounding=ROUNDING_PER_LINE)
+  assert per_line.line_totals == ((Decimal("0.12"),) * 3,) and per_line.total_ht == Decimal("0.36")
+  per_total = QuoteTotals.compute([group], Decimal("0.20"), rounding=ROUNDING_PER_TOTAL)
+  assert per_total.total_ht == Decimal("0.35") and per_total.vat_amount == Decimal("0.07")
+
+  # Les totaux du template sont mis en cache jusqu'à l'ajout d'un groupe
+  template = create_template("DEV-TOTAL")
+  totals = template.totals
+  assert template.totals is totals
+  template.add_item_group(group)
+  assert template.totals is not totals and template.totals.total_ht == Decimal("1000.36")
+
+  # Groupes remplacés : les totaux suivent le nouveau contenu
+  for price in range(1, 50):
+    template.item_groups.clear()
+    template.add_item_group(ItemGroup("Prestations", [InvoiceItem("Développement", 1, Decimal(price))]))
+    assert template.totals.total_ht == Decimal(price)
+  print("✅ Totaux :", template.totals.total_ht)
+
+def test_currency_and_vat():
+  """Test des taux de TVA par ligne, du formatage par langue et des montants Stripe en unités mineures"""
+  group = ItemGroup("Mixte", [
+    InvoiceItem("Livre", 3, Decimal("19.90"), vat_rate=Decimal("0.055")),
+    InvoiceItem("Formation", 1, Decimal("1200")),
+  ])
+  totals = QuoteTotals.compute([group], Decimal("0.20"))
+  assert [(line.rate, line.base, line.amount) for line in totals.vat_breakdown] == [
+    (Decimal("0.055"), Decimal("59.70"), Decimal("3.28")), (Decimal("0.20"), Decimal("1200"), Decimal("240.00"))
+  ]
+  assert totals.total_ttc == Decimal("1502.98")
+  assert QuoteTotals.compute([group], None).vat_breakdown == ()  # TVA non applicable
+
+  assert money_formatter("fr_FR") is money_formatter("fr_FR")
+  assert format_money(Decimal("1920"), "EUR", "fr_FR") == "1\u00a0920,00\u00a0€"
+  assert format_money(Decimal("-1920.5"), "USD", "en_US") == "-$1,920.50"
+  assert to_minor_units(Decimal("19.995"), "EUR") == 2000 and to_minor_units(Decimal("1920.4"), "JPY") == 1920
+
+  # Prix saisis en euros, devis en yens
+  template = create_template("DEV-JPY-001")
+  template.set_currency("JPY", "en_US", price_currency="EUR", rates=ExchangeRates("EUR", {"JPY": Decimal("160")}))
+  assert template.totals.total_ht == Decimal("160000") and template.format_amount(template.totals.total_ht) == "¥160,000"
+
+  # Mentions légales : taux réellement appliqués
+  taxed = create_template("DEV-TVA-001")
+  taxed.company_info.siret = "12345678900011"
+  taxed.configure_vat_status("company_with_vat")
+  taxed.set_vat_rate(Decimal("0.10"))
+  taxed.add_item_group(ItemGroup("Livres", [InvoiceItem("Livre", 1, Decimal("20"), vat_rate=Decimal("0.055"))]))
+  legal_text = taxed._create_legal_mentions()[-1].text
+  assert "TVA en sus (5,5\u00a0%, 10\u00a0%)" in legal_text and "(20%)" not in legal_text, legal_text
+
+  # Montant Stripe en yens (devise sans décimales), clé Stripe limitée à ce test
+  server, api_base = start_stripe_mock()
+  previous_api_base, stripe.api_base = stripe.api_base, api_base
+  previous_api_key, stripe.api_key = stripe.api_key, "sk_test_mock"
+  try:
+    template.stripe_private_key = stripe.api_key
+    template.set_payment_percentage(0.3)
+    assert template.setup_stripe_payment()
+    price = next(item for item in server.objects.values() if item["object"] == "price")
+    assert price["currency"] == "jpy" and price["unit_amount"] == "48000", price
+  finally:
+    stripe.api_base, stripe.api_key = previous_api_base, previous_api_key
+    server.shutdown()
+  print("✅ Devises et TVA par ligne :", template.format_amount(template.totals.total_ht))
+
+def test_theme_styles():
+  """Test des styles construits une fois par thème et partagés entre templates"""
+  first, second = create_template("DEV-THEME-001"), create_template("DEV-THEME-002")
+  assert first.styles is second.styles and first.theme.items_table_base_style is second.theme.items_table_base_style
+
+  violet = Theme().with_colors(primary_color=colors.HexColor("#a900d4"))
+  same_violet = Theme().with_colors(primary_color=colors.HexColor("#a900d4"))
+  first.set_theme(violet)
+  second.set_theme(same_violet)
+  assert first.styles is second.styles  # Thèmes égaux : mêmes styles, construits une seule fois
+  assert first.styles is not create_template("DEV-THEME-003").styles
+  assert first.styles['UltraTitle'].textColor == colors.HexColor("#a900d4")
+  print("✅ Styles partagés par thème")
+
+def test_qr_code_cache():
+  """Test des QR codes vectoriels (sans image) et du cache disque des QR codes matriciels"""
+  url = "https://buy.stripe.com/test_qr_code"
+  vector = create_template("DEV-QR-001")
+  vector.set_qr_code_options(vector=True, cache=QRCodeCache())
+  assert vector.set_payment_link(url)
+  raster = create_template("DEV-QR-001")
+  raster.set_qr_code_options(cache=QRCodeCache())
+  assert raster.set_payment_link(url)
+  assert b"/Subtype /Image" not in vector.render_pdf() and b"/Subtype /Image" in raster.render_pdf()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    image = QRCodeCache(tmp).get_image(url, "#19376d")
+    stored = [name for name in os.listdir(tmp) if name.endswith(".png")]
+    assert len(stored) == 1
+    # Nouveau cache (autre exécution) : le PNG est relu, le QR code n'est pas régénéré
+    with patch("invoice.qrcode.QRCode", side_effect=AssertionError("QR code régénéré")):
+      reused = QRCodeCache(tmp).get_image(url, "#19376d")
+    assert reused.size == image.size and list(reused.getdata()) == list(image.getdata())
+    assert os.listdir(tmp) == stored
+  print("✅ QR codes vectoriels et cache disque")
+
+def test_asset_cache():
+  """Test du cache des logos : lecture unique et réduction à la taille imprimée"""
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "logo.png")
+    PILImage.new("RGBA", (2000, 1000), (169, 0, 212, 128)).save(path)
+
+    cache = AssetCache(dpi=150)
+    data = cache.get_image(path, 25*mm, 25*mm)
+    assert cache.get_image(path, 25*mm, 25*mm) is data
+    with PILImage.open(BytesIO(data)) as logo:
+      assert logo.format == "JPEG" and logo.size == (148, 148)
+    print("✅ Cache des logos :", len(data), "octets")
+
+def test_markup_template():
+  """Test des balisages compilés : valeurs insérées sans interprétation"""
+  template = create_template("DEV-<1>")
+  style = template.styles['SophisticatedNormal']
+  compiled = markup_template("<b>Client :</b> {name}<br/>{city}", style)
+  assert markup_template("<b>Client :</b> {name}<br/>{city}", style) is compiled
+  paragraph = compiled.fill(name="Dupont & Fils <SARL>", city="Lyon")
+  assert "".join(frag.text for frag in paragraph.frags) == "Client : Dupont & Fils <SARL>Lyon"
+
+  template.set_client_info(ClientInfo("R&D <Labs>", "1 <rue>", "69001", "Lyon & Co"))
+  template.render_pdf()
+  print("✅ Balisages compilés et échappement")
+
+def test_cached_chrome():
+  """Test du décor de page en Form XObject et de l'en-tête partagé entre devis"""
+  first = create_template("DEV-CHROME-1")
+  first.set_cached_chrome()
+  pdf = first.render_pdf()
+  assert b"DevisPageChrome" in pdf
+
+  second = create_template("DEV-CHROME-2")
+  second.set_cached_chrome()
+  assert CHROME_CACHE.get(second._chrome_key("header"), list) is CHROME_CACHE.get(first._chrome_key("header"), list)
+  assert b"DEV-CHROME-2" in second.render_pdf()
+  print("✅ Décor de page mis en cache")
+
+def test_render_report():
+  """Test du rapport de rendu (étapes, sections, pages et taille)"""
+  template = create_template("DEV-PROFIL-001")
+  template.set_profiling()
+  pdf = template.render_pdf()
+  report = template.render_report
+  assert report.pages >= 1 and report.bytes == len(pdf)
+  assert {"story", "build"} <= set(report.phases)
+  assert {"header", "items", "footer"} <= set(report.sections) and "items" in report.layout
+
+  total = RenderReport.aggregate([report, report.to_dict()])
+  assert total.documents == 2 and total.bytes == 2 * len(pdf)
+  print("✅ Rapport de rendu")
+
+def test_render_combined():
+  """Test de l'assemblage de plusieurs devis dans un seul PDF"""
+  templates = [create_template(f"DEV-LOT-{n}") for n in range(1, 4)]
+  for template in templates:
+    template.set_logo("logo.png")
+  separate = sum(len(template.render_pdf()) for template in templates)
+
+  buffer = BytesIO()
+  pages = render_combined(templates, buffer)
+  pdf = buffer.getvalue()
+  assert pages >= 3 and b"/Outlines" in pdf and b"DEV-LOT-3" in pdf
+  assert len(pdf) < separate  # Logo et polices intégrés une seule fois
+  print(f"✅ Devis assemblés : {pages} pages, {len(pdf) / 1024:.0f} Ko au lieu de {separate / 1024:.0f} Ko")
+
+def test_sections():
+  """Test des sections activables et des formules récurrentes construites à partir des données"""
+  template = create_template("DEV-SECTIONS-001")
+  template.set_profiling()
+  template.set_section_enabled("recurring_payments", False)
+  template.add_section("conditions", lambda: [Paragraph("Conditions particulières", template.styles['SophisticatedNormal'])], before="footer")
+  default_hash = create_template("DEV-SECTIONS-001").content_hash()
+  assert template.content_hash() != default_hash
+  template.render_pdf()
+  assert "recurring_payments" not in template.render_report.sections and "conditions" in template.render_report.sections
+  assert template.enabled_sections[-2:] == ["conditions", "footer"]
+
+  monthly, yearly = RecurringPlan("Support", Decimal("100"), 1), RecurringPlan("Support annuel", Decimal("75"), 12)
+  assert yearly.total == Decimal("900") and yearly.monthly_savings(monthly) == Decimal("25") and yearly.savings_rate(monthly) == Decimal("0.25")
+
+  # Sans formule, la section est omise
+  template = create_template("DEV-SECTIONS-002")
+  template.set_recurring_plans([])
+  assert template._create_recurring_payments_table() == []
+  print("✅ Sections activables et formules récurrentes")
+
+def test_fonts():
+  """Test du registre de polices TrueType et des caractères absents des polices"""
+  regular, bold = find_font("DejaVuSerif.ttf"), find_font("DejaVuSerif-Bold.ttf")
+  fonts = FONT_REGISTRY.register_family("DejaVuSerif", regular, bold=bold)
+  assert FONT_REGISTRY.register_family("DejaVuSerif", regular, bold=bold) == fonts  # Enregistrement unique
+  assert FONT_REGISTRY.supports(fonts.regular, "◆") and not FONT_REGISTRY.supports("Times-Roman", "◆")
+
+  standard = create_template("DEV-FONTS-001")
+  template = create_template("DEV-FONTS-001")
+  template.set_theme(template.theme.with_fonts(fonts))
+  pdf = template.render_pdf()
+  assert b"DejaVuSerif" in pdf and b"Times-Roman" not in pdf
+  assert len(pdf) < os.path.getsize(regular)  # Seuls les glyphes utilisés sont intégrés
+  assert standard.render_pdf() != pdf
+
+  # Sans police de secours, les emoji sont omis ; avec, ils passent par la police qui les contient
+  style = template.styles['SophisticatedNormal']
+  assert "".join(frag.text for frag in markup_template("🌐 Paiement ◆", style).fill().frags) == "Paiement ◆"
+  standard_style = standard.styles['SophisticatedNormal']
+  assert "".join(frag.text for frag in markup_template("{title}", standard_style).fill(title="◆ Projet").frags) == "Projet"
+  registry = FontRegistry()
+  output = StringIO()
+  with redirect_stdout(output):
+    registry.apply_fallbacks(Paragraph("◆ Projet", standard_style).frags)
+    registry.apply_fallbacks(Paragraph("◆ Suite", standard_style).frags)
+  assert output.getvalue().count("⚠️") == 1 and "◆" in output.getvalue()  # Caractère omis signalé une fois
+  registry.add_fallback("DejaVuSans", find_font("DejaVuSans.ttf"))
+  frags = registry.apply_fallbacks(Paragraph("◆ Projet 🌐", standard_style).frags)
+  assert [(frag.fontName, frag.text) for frag in frags] == [("DejaVuSans", "◆"), ("Times-Roman", " Projet ")]
+
+  # Police de secours ajoutée après la compilation du balisage : appliquée aux valeurs et aux notes
+  FONT_REGISTRY.add_fallback("DejaVuSans", find_font("DejaVuSans.ttf"))
+  try:
+    filled = markup_template("{title}", standard_style).fill(title="◆ Projet")
+    assert [(frag.fontName, frag.text) for frag in filled.frags] == [("DejaVuSans", "◆"), ("Times-Roman", " Projet")]
+    notes = fallback_paragraph("◆ Conditions <b>particulières</b>", standard_style)
+    assert [frag.fontName for frag in notes.frags] == ["DejaVuSans", "Times-Roman", "Times-Bold"]
+    with_symbols = create_template("DEV-FONTS-002")
+    with_symbols.set_project_info(ProjectInfo("◆ Refonte", "Description"))
+    with_symbols.add_notes("◆ Conditions particulières")
+    assert b"DejaVuSans" in with_symbols.render_pdf()
+
+    # Cellules du tableau des items : police de secours si nécessaire, texte simple sinon
+    with_cells = create_template("DEV-FONTS-003")
+    with_cells.add_item_group(ItemGroup("◆ Options", [InvoiceItem("◆ Hébergement", 1, Decimal("10"))]))
+    rows = with_cells._items_table_rows()[0]
+    cells = [row[0] for row in rows if isinstance(row[0], Paragraph)]
+    assert [[frag.fontName for frag in cell.frags] for cell in cells] == [["DejaVuSans", "Times-Bold"], ["DejaVuSans", "Times-Roman"]]
+    assert isinstance(rows[0][0], str) and isinstance(rows[1][0], str)  # Groupe par défaut, sans symbole
+    with_cells.render_pdf()
+  finally:
+    FONT_REGISTRY.fallbacks.remove("DejaVuSans")
+  print("✅ Polices TrueType et caractères de secours")
+
+def test_generate_many():
+  """Test de la génération de devis en lot, sur plusieurs processus et dans le processus courant"""
+  company = CompanyInfo("Société", "1 rue de Paris", "75001", "Paris", "0100000000", "contact@societe.fr")
+  client = ClientInfo("Client", "2 rue de Lyon", "69001", "Lyon")
+  groups = [ItemGroup("Prestations", [InvoiceItem("Développement", 2, Decimal("500"))])]
+  specs = [QuoteSpec(f"devis_{n}.pdf", company, client, groups, invoice_number=f"DEV-LOT-{n}") for n in range(5)]
+  specs.append(QuoteSpec("invalide.pdf", company, client, groups, rounding="inconnu"))
+
+  with tempfile.TemporaryDirectory() as tmp:
+    for workers in (3, 1):
+      out_dir = os.path.join(tmp, f"workers_{workers}")
+      results = sorted(generate_many(specs, out_dir, workers=workers), key=lambda result: result.index)
+      assert [result.filename for result in results] == [spec.filename for spec in specs]
+      # Une erreur est rapportée dans son résultat sans interrompre les autres devis
+      assert all(result.ok and os.path.getsize(result.path) > 0 for result in results[:-1])
+      assert not results[-1].ok and "ValueError" in results[-1].error
+      assert results[2].invoice_number == "DEV-LOT-2"
+      assert sorted(os.listdir(out_dir)) == sorted(spec.filename for spec in specs[:-1])
+  print("✅ Génération en lot")
+
+def test_invoice_numbering():
+  """Test de la numérotation sans trou partagée entre threads et processus"""
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "numbers.sqlite3")
+    numbering = InvoiceNumbering(path)
+    date = datetime(2024, 3, 1)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+      numbers = list(executor.map(lambda n: InvoiceNumbering(path).allocate("invoice", f"doc-{n}", date), range(40)))
+    assert sorted(numbers) == [f"FA-2024-{n:05d}" for n in range(1, 41)]
+    assert numbering.allocate("invoice", "doc-7", date) == numbers[7]  # Document régénéré : même numéro
+    assert numbering.allocate("credit_note", "avoir-1", date) == "AV-2024-00001"
+    assert numbering.allocate("invoice", "doc-2025", datetime(2025, 1, 2)) == "FA-2025-00001"
+    assert numbering.last_number("invoice", date) == 40
+
+    # Factures d'un lot numérotées par des processus concurrents
+    company = CompanyInfo("Société", "1 rue de Paris", "75001", "Paris", "0100000000", "contact@societe.fr")
+    client = ClientInfo("Client", "2 rue de Lyon", "69001", "Lyon")
+    groups = [ItemGroup("Prestations", [InvoiceItem("Développement", 2, Decimal("500"))])]
+    specs = [
+      QuoteSpec(f"facture_{n}.pdf", company, client, groups, invoice_date=datetime(2026, 1, 5), document_kind="invoice",
+                quote_reference=f"DEV-{n}", numbering=path, recurring_plans=[])
+      for n in range(6)
+    ]
+    results = list(generate_many(specs, os.path.join(tmp, "out"), workers=3))
+    assert all(result.ok for result in results), [result.error for result in results]
+    assert sorted(result.invoice_number for result in results) == [f"FA-2026-{n:05d}" for n in range(1, 7)]
+  print("✅ Numérotation des factures sans trou ni doublon")
+
+def test_invoice_mode():
+  """Test de la facture finale (acompte déduit) et de l'avoir issus d'un devis"""
+  template = create_template("DEV-FACT-001")
+  template.set_payment_percentage(0.3)
+  quote_hash = template.content_hash()
+  template.set_profiling()
+  template.convert_to_invoice("FA-2024-00001", datetime(2024, 2, 1), deposit_paid=True)
+  assert template.invoice_title == "FACTURE" and template.quote_reference == "DEV-FACT-001"
+  assert template.deposit_paid == Decimal("300.00") and template.balance_due == Decimal("700.00")
+  assert "payment" not in template.enabled_sections and not template._needs_stripe_payment()
+  assert template.content_hash() != quote_hash
+  template.render_pdf()
+  assert "settlement" in template.render_report.sections
+
+  template.convert_to_credit_note("AV-2024-00001")
+  assert template.invoice_title == "AVOIR" and template.credited_invoice == "FA-2024-00001"
+  template.render_pdf()
+  try:
+    template.convert_to_invoice("FA-2024-00002")
+    assert False, "Un avoir ne peut pas devenir une facture"
+  except ValueError:
+    pass
+
+  # Société soumise à TVA : acompte et reste à payer calculés sur le total TTC
+  taxed = create_template("DEV-FACT-TVA")
+  taxed.configure_vat_status("company_with_vat")
+  taxed.set_payment_percentage(0.3)
+  assert taxed.deposit_amount == Decimal("360.00")
+  taxed.convert_to_invoice("FA-2024-00004", deposit_paid=True)
+  assert taxed.balance_due == Decimal("840.00") and taxed.deposit_paid + taxed.balance_due == taxed.totals.total_ttc
+
+  # Un devis n'a pas de section de règlement ; sans acompte, la facture non plus
+  assert create_template("DEV-FACT-002")._create_settlement_section() == []
+  invoice = create_template("DEV-FACT-003")
+  invoice.convert_to_invoice("FA-2024-00003")
+  assert invoice._create_settlement_section() == [] and invoice.balance_due == Decimal("1000")
+  print("✅ Factures et avoirs")
+
+def test_large_table_chunks():
+  """Test du découpage des grands tableaux d'items en tables d'environ une page"""
+  def create_large(threshold):
+    template = create_template("DEV-CHUNK-001")
+    for group in range(3):
+      template.add_item_group(ItemGroup(f"Lot {group + 1}", [
+        InvoiceItem(f"Prestation {group + 1}.{n + 1}", 1, Decimal("10")) for n in range(60)
+      ]))
+    template.set_large_table_options(threshold=threshold, chunk_size=40)
+    template.set_profiling()
+    return template
+
+  chunked, single = create_large(50), create_large(10_000)
+  rows, kinds = chunked._items_table_rows()
+  chunks = chunked._items_table_chunks(kinds)
+  assert len(chunks) > 1 and chunks[0][0] == 0 and chunks[-1][1] == len(rows)
+  assert all(end == next_start for (_, end), (next_start, _) in zip(chunks, chunks[1:]))
+  assert all(end - start <= 40 and kinds[end - 1] != 'title' for start, end in chunks)
+  assert all(kinds[start] not in ('subtotal', 'total') for start, _ in chunks)
+
+  # Petits morceaux : sous-totaux et total jamais isolés de leurs items, titres jamais en fin de morceau
+  small = create_template("DEV-CHUNK-002")
+  for size in (1, 2, 3, 1, 4):
+    small.add_item_group(ItemGroup(f"Lot {size}", [InvoiceItem(f"Prestation {n}", 1, Decimal("10")) for n in range(size)]))
+  small_kinds = small._items_table_rows()[1]
+  for chunk_size in (3, 4, 5):
+    small.set_large_table_options(threshold=0, chunk_size=chunk_size)
+    small_chunks = small._items_table_chunks(small_kinds)
+    assert small_chunks[-1][1] == len(small_kinds)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(small_chunks, small_chunks[1:]))
+    assert all(small_kinds[start] not in ('subtotal', 'total') for start, _ in small_chunks), small_chunks
+    assert all(small_kinds[end - 1] != 'title' for _, end in small_chunks), small_chunks
+
+  # Une table par morceau, alternance des fonds par bandes
+  tables = [element for element in chunked._create_items_table() if isinstance(element, Table)]
+  assert len(tables) == len(chunks)
+  style = chunked._items_table_style(kinds[40:80]).getCommands()
+  assert any(command[0] == 'ROWBACKGROUNDS' for command in style)
+
+  chunked.render_pdf()
+  single.render_pdf()
+  assert 1 < chunked.render_report.pages <= single.render_report.pages
+  print("✅ Grands tableaux découpés :", len(chunks), "tables,", chunked.render_report.pages, "pages")
+
+def test_incremental_render():
+  """Test du mode incrémental : un devis inchangé n'est pas régénéré"""
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "devis.pdf")
+    create_template("DEV-INC").generate_pdf(path, incremental=True)
+    modified = os.path.getmtime(path)
+
+    assert create_template("DEV-INC").is_up_to_date(path)
+    create_template("DEV-INC").generate_pdf(path, incremental=True)
+    assert os.path.getmtime(path) == modified
+
+    changed = create_template("DEV-INC")
+    changed.add_notes("Nouvelle condition")
+    assert not changed.is_up_to_date(path)
+
+    # Logo remplacé pendant l'exécution : le devis est régénéré
+    logo_path = os.path.join(tmp, "logo.png")
+    PILImage.new("RGB", (200, 100), (169, 0, 212)).save(logo_path)
+    with_logo = create_template("DEV-INC")
+    with_logo.set_logo(logo_path)
+    with_logo.generate_pdf(path)
+    assert with_logo.is_up_to_date(path)
+    PILImage.new("RGB", (300, 100), (0, 0, 0)).save(logo_path)
+    assert not with_logo.is_up_to_date(path)
+    print("✅ Mode incrémental : devis inchangé conservé")
+
+def test_cli_render():
+  """Test du rendu en ligne de commande d'un flux JSONL avec saut des devis inchangés"""
+  document = {
+    "company": {"name": "Société", "address": "1 rue de Paris", "postal_code": "75001", "city": "Paris", "phone": "0100000000", "email": "contact@societe.fr"},
+    "client": {"name": "Client", "address": "2 rue de Lyon", "postal_code": "69001", "city": "Lyon"},
+    "groups": [{"title": "Prestations", "items": [{"description": "Développement", "quantity": 2, "unit_price": "500"}]}]
+  }
+  with tempfile.TemporaryDirectory() as tmp:
+    source = os.path.join(tmp, "devis.jsonl")
+    with open(source, "w") as f:
+      for number in ("DEV-A", "DEV-B"):
+        f.write(json.dumps(dict(document, number=number)) + "\n")
+      f.write(json.dumps(dict(document, number="DEV-C", unknown_field=1)) + "\n")
+
+    out_dir = os.path.join(tmp, "sortie")
+    assert render(source, out_dir, workers=1) == 1  # Champ inconnu refusé
+    assert sorted(name for name in os.listdir(out_dir) if name.endswith(".pdf")) == ["DEV-A.pdf", "DEV-B.pdf"]
+    modified = os.path.getmtime(os.path.join(out_dir, "DEV-A.pdf"))
+    render(source, out_dir, workers=1)
+    assert os.path.getmtime(os.path.join(out_dir, "DEV-A.pdf")) == modified  # Inchangé : pas de nouveau rendu
+
+    # Noms de fichier : séparateurs du numéro remplacés, chemins refusés
+    with open(source, "w") as f:
+      f.write(json.dumps(dict(document, number="DEV/2024\\001")) + "\n")
+      for filename in ("../evasion.pdf", os.path.join(tmp, "absolu.pdf"), "..\\evasion.pdf", ".."):
+        f.write(json.dumps(dict(document, number="DEV-D", filename=filename)) + "\n")
+    assert render(source, out_dir, workers=1) == 4
+    assert os.path.exists(os.path.join(out_dir, "DEV_2024_001.pdf"))
+    assert not any(name.endswith(".pdf") for name in os.listdir(tmp))
+    print("✅ Ligne de commande : devis inchangés ignorés")
+
+if __name__ == "__main__":
+  # Tests sans clé API (mock local de l'API Stripe)
+  test_quote_totals()
+  test_currency_and_vat()
+  test_theme_styles()
+  test_qr_code_cache()
+  test_asset_cache()
+  test_markup_template()
+  test_cached_chrome()
+  test_render_report()
+  test_render_combined()
+  test_sections()
+  test_fonts()
+  test_generate_many()
+  test_invoice_numbering()
+  test_invoice_mode()
+  test_large_table_chunks()
+  test_incremental_render()
+  test_cli_render()
+  test_payment_link_registry()
+  test_stripe_timeout()